@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.synthetic_data import generate_market_data, STOCKS
+from utils.csv_merge import merge_market_data_in_periods
+from utils.downsampling import process_all_csv_files
+from utils.feature_engineering import process_and_merge_csv_files
+from utils.seperate_data_by_stock import split_csv_by_stock
+
+STAGES = ["merge", "downsample", "feature_engineering", "split", "preprocess", "batch_predict"]
+
+
+def _peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_pipeline(work_dir, args, stage_hook):
+    """
+    在 work_dir 下生成数据并依次执行各阶段，每个阶段通过 stage_hook(name, func) 执行并计量。
+    """
+    data_root = os.path.join(work_dir, "TestData")
+    generate_market_data(data_root, args.periods, args.stocks, args.files, args.rows, seed=args.seed)
+
+    featured_file = os.path.join(work_dir, "featured_test_data.csv")
+    stage_hook("merge", lambda: merge_market_data_in_periods(data_root))
+    stage_hook("downsample", lambda: process_all_csv_files(data_root))
+    stage_hook("feature_engineering", lambda: process_and_merge_csv_files(data_root, featured_file))
+
+    stage_hook("split", lambda: split_csv_by_stock(featured_file, work_dir))
+
+    # 推理阶段需要已保存的模型，缺失时跳过
+    stock = args.stocks[0]
+    model_dir = os.path.join(args.model_root, f"XGBoost{stock}")
+    if not os.path.isdir(model_dir):
+        return
+    from inference import load_artifacts, preprocess_test_data, batch_predict
+
+    model, scaler, ohe = load_artifacts(
+        os.path.join(model_dir, f"xgb_model_{stock}.json"),
+        os.path.join(model_dir, f"scaler_{stock}.pkl"),
+        os.path.join(model_dir, f"ohe_{stock}.pkl"),
+    )
+    df_test = pd.read_csv(os.path.join(work_dir, f"{stock}_stock.csv"))
+    result = {}
+    stage_hook("preprocess", lambda: result.update(X=preprocess_test_data(df_test, scaler, ohe, args.seq_length)[0]))
+    stage_hook("batch_predict", lambda: batch_predict(model, result["X"], args.batch_size))
+
+
+def benchmark(args):
+    times = {stage: [] for stage in STAGES}
+    peaks = {}
+    rss = {}
+
+    def timed_hook(name, func):
+        start = time.perf_counter()
+        func()
+        times[name].append(time.perf_counter() - start)
+
+    def memory_hook(name, func):
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[name] = peak / 1024 / 1024
+        # ru_maxrss 是整个进程的峰值，只能反映到该阶段为止的最高占用
+        rss[name] = _peak_rss_mb()
+
+    # 每次都在全新的数据上运行（downsampling 会原地覆盖 merged_data 文件）；
+    # 内存单独跑一轮，避免 tracemalloc 的开销影响计时
+    runs = [timed_hook] * args.repeats + ([memory_hook] if args.memory else [])
+    for hook in runs:
+        work_dir = tempfile.mkdtemp(prefix="onlytrades_bench_")
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        try:
+            with quiet:
+                run_pipeline(work_dir, args, hook)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    stages = {}
+    for stage in STAGES:
+        if not times[stage]:
+            continue
+        stages[stage] = {
+            "times": times[stage],
+            "min": min(times[stage]),
+            "median": statistics.median(times[stage]),
+            "peak_traced_mb": peaks.get(stage),
+            "peak_rss_mb": rss.get(stage),
+        }
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, current_path, threshold=0.1):
+    """
+    对比两次基准测试结果的中位耗时和峰值内存，变慢超过 threshold 的阶段标记为 REGRESSION。
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["stages"]
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)["stages"]
+
+    regressions = []
+    for stage in STAGES:
+        if stage not in baseline or stage not in current:
+            continue
+        old, new = baseline[stage], current[stage]
+        change = (new["median"] - old["median"]) / old["median"] if old["median"] else 0.0
+        line = f"{stage:<20} {old['median']:.3f}s -> {new['median']:.3f}s ({change:+.1%})"
+        if old.get("peak_traced_mb") is not None and new.get("peak_traced_mb") is not None:
+            line += f"  peak {old['peak_traced_mb']:.1f}MB -> {new['peak_traced_mb']:.1f}MB"
+        if change > threshold:
+            line += "  REGRESSION"
+            regressions.append(stage)
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    # 用法: python benchmark.py --periods 2 --files 3 --rows 20000 --out bench.json
+    #       python benchmark.py --compare old.json new.json
+    parser = argparse.ArgumentParser(description="OnlyTrades 端到端基准测试（合成数据）")
+    parser.add_argument("--periods", type=int, default=2)
+    parser.add_argument("--stocks", nargs="+", default=STOCKS)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=20000)                  # 每个 market_data 文件的行数
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-memory", dest="memory", action="store_false")  # 跳过 tracemalloc 内存测量
+    parser.add_argument("--model-root", default="saved_model")
+    parser.add_argument("--seq-length", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--verbose", action="store_true")                    # 显示各阶段自身的输出
+    args = parser.parse_args()
+
+    if args.compare:
+        raise SystemExit(1 if compare(*args.compare, args.threshold) else 0)
+
+    stages = benchmark(args)
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("compare", "out", "verbose")},
+        },
+        "stages": stages,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    for stage, s in stages.items():
+        peak = f"{s['peak_traced_mb']:.1f}MB" if s["peak_traced_mb"] is not None else "-"
+        print(f"{stage:<20} median {s['median']:.3f}s  min {s['min']:.3f}s  peak {peak}")
+    print(f">>> 结果已保存到: {args.out}")
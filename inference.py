@@ -1,11 +1,35 @@
 import numpy as np
-import pandas as pd
 import xgboost as xgb
 import joblib
 import matplotlib.pyplot as plt
 import time
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import sys
+from utils.windowing import supervised_windows
+from instrumentation import METRICS
+from utils.storage import read_table
+
+# 与训练时一致的数值列顺序，MidpointPrice 在第 6 列（从0开始）
+NUMERIC_COLS = [
+    "bidVolume",
+    "bidPrice",
+    "askVolume",
+    "askPrice",
+    "OrderFlowImbalance",
+    "WeightedSpread",
+    "MidpointPrice"
+]
+MID_PRICE_IDX = 6
+
+def load_artifacts(model_path, scaler_path, ohe_path):
+    """
+    加载一组推理所需的模型、Scaler 和 OneHotEncoder，出错时直接抛出异常。
+    """
+    model = xgb.XGBRegressor()
+    model.load_model(model_path)
+    scaler = joblib.load(scaler_path)
+    ohe = joblib.load(ohe_path)
+    return model, scaler, ohe
 
 def preprocess_test_data(df_test, scaler, ohe, seq_length=60):
     """
@@ -20,15 +44,7 @@ def preprocess_test_data(df_test, scaler, ohe, seq_length=60):
         df_test["MidpointPrice"] = (df_test["bidPrice"] + df_test["askPrice"]) / 2
 
     # 2. 数值列和分类列
-    numeric_cols = [
-        "bidVolume",
-        "bidPrice",
-        "askVolume",
-        "askPrice",
-        "OrderFlowImbalance",
-        "WeightedSpread",
-        "MidpointPrice"
-    ]
+    numeric_cols = NUMERIC_COLS
 
     # 确保所有必要的列都存在
     missing_cols = [col for col in numeric_cols + ['stock'] if col not in df_test.columns]
@@ -45,57 +61,78 @@ def preprocess_test_data(df_test, scaler, ohe, seq_length=60):
     # 5. 拼接数值特征和 One-Hot 特征
     data_combined = np.hstack([data_numeric, ohe_feats])  # shape: (N, 7 + onehot_dim)
 
-    # 6. 构造滑动窗口
-    def create_supervised_data(data_combined, seq_length):
-        """
-        构造滑动窗口特征
-        """
-        X_out, y_out = [], []
-        mid_price_idx = 6  # numeric_cols 中 MidpointPrice 的索引（从0开始）
-        N = len(data_combined)
-        for i in range(seq_length, N):
-            # 过去 seq_length 行 => flatten 到一维
-            x_i = data_combined[i-seq_length:i].flatten()
-            # 目标 => 当前行(i) 的 MidpointPrice
-            y_i = data_combined[i, mid_price_idx]
-            X_out.append(x_i)
-            y_out.append(y_i)
-        return np.array(X_out), np.array(y_out)
-
-    X_test, y_test = create_supervised_data(data_combined, seq_length)
+    # 6. 构造滑动窗口（基于 stride 的只读视图，不逐行复制）
+    X_test, y_test = supervised_windows(data_combined, seq_length, MID_PRICE_IDX)
     return X_test, y_test
 
-def simulate_realtime_prediction(test_csv: str, model_path: str, scaler_path: str, ohe_path: str, seq_length=60, delay=0.1):
+def inverse_transform_mid(scaler, values):
+    """
+    把缩放后的 MidpointPrice 还原为原始价格：放进 dummy 数组的第 MID_PRICE_IDX 列再 inverse_transform。
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    dummy = np.zeros((len(values), len(NUMERIC_COLS)))
+    dummy[:, MID_PRICE_IDX] = values
+    return scaler.inverse_transform(dummy)[:, MID_PRICE_IDX]
+
+def batch_predict(model, X_test, batch_size=8192):
+    """
+    按块批量预测，结果写入预分配数组。
+
+    X_test 可以是 preprocess_test_data 返回的只读窗口视图，每次只把一个块交给模型，
+    避免一次性物化整个 (N, seq_length * n_features) 矩阵。
+
+    Returns:
+        preds (np.ndarray): shape (N,) 的缩放后预测值
+        rows_per_sec (float): 吞吐量
+    """
+    n_samples = len(X_test)
+    preds = np.empty(n_samples, dtype=np.float64)
+    start = time.perf_counter()
+    for lo in range(0, n_samples, batch_size):
+        hi = min(lo + batch_size, n_samples)
+        with METRICS.timer("predict"):
+            preds[lo:hi] = model.predict(X_test[lo:hi])
+    elapsed = time.perf_counter() - start
+    rows_per_sec = n_samples / elapsed if elapsed > 0 else float("inf")
+    return preds, rows_per_sec
+
+def simulate_realtime_prediction(test_csv: str, model_path: str, scaler_path: str, ohe_path: str, seq_length=60, delay=0.1,
+                                 mode="realtime", batch_size=8192, metrics_out=None, stock=None, plot=None):
     """
     逐步预测 test.csv 的数据，模拟实时预测过程。
     最后与真实值对比。
+
+    mode:
+        "realtime": 逐行预测，每次预测后打印并 sleep(delay)
+        "batch":    按 batch_size 分块批量预测，只输出吞吐量和整体误差，用于离线打分
+
+    各阶段（load / read_csv / preprocess / predict / inverse_transform）的耗时记录在
+    instrumentation.METRICS 中，指定 metrics_out 时导出为 JSON（.prom/.txt 为 Prometheus 文本格式）。
+
+    test_csv 也可以是 Parquet 文件或分区数据集目录，此时只读取需要的列，指定 stock 时只读取该股票的分区。
+
+    plot: 是否最后画出真实值与预测值的对比图（plt.show() 会阻塞到窗口关闭），默认只在 realtime 模式下画。
     """
-    # 1. 加载模型和预处理器
-    try:
-        model = xgb.XGBRegressor()
-        model.load_model(model_path)
-        print(f">>> 已加载模型: {model_path}")
-    except Exception as e:
-        print(f"加载模型时出错: {e}")
+    if mode not in ("realtime", "batch"):
+        print(f"未知的预测模式: {mode}，可选 'realtime' 或 'batch'")
         sys.exit(1)
 
+    # 1. 加载模型和预处理器
     try:
-        scaler = joblib.load(scaler_path)
+        with METRICS.timer("load"):
+            model, scaler, ohe = load_artifacts(model_path, scaler_path, ohe_path)
+        print(f">>> 已加载模型: {model_path}")
         print(f">>> 已加载 Scaler: {scaler_path}")
-    except Exception as e:
-        print(f"加载 Scaler 时出错: {e}")
-        sys.exit(1)
-
-    try:
-        ohe = joblib.load(ohe_path)
         print(f">>> 已加载 OneHotEncoder: {ohe_path}")
     except Exception as e:
-        print(f"加载 OneHotEncoder 时出错: {e}")
+        print(f"加载模型 / Scaler / OneHotEncoder 时出错: {e}")
         sys.exit(1)
 
     # 2. 读取 test.csv
     try:
-        df_test = pd.read_csv(test_csv)
+        with METRICS.timer("read_csv"):
+            df_test = read_table(test_csv, columns=NUMERIC_COLS + ["stock"],
+                                 filters=[("stock", "==", stock)] if stock else None)
         if df_test.empty:
             print(f"警告: {test_csv} 文件是空的，无法预测。")
             sys.exit(1)
@@ -105,50 +142,50 @@ def simulate_realtime_prediction(test_csv: str, model_path: str, scaler_path: st
 
     # 3. 预处理 test 数据
     try:
-        X_test, y_test = preprocess_test_data(df_test, scaler, ohe, seq_length)
+        with METRICS.timer("preprocess"):
+            X_test, y_test = preprocess_test_data(df_test, scaler, ohe, seq_length)
         print(">>> Data Preprocess finished.")
     except Exception as e:
         print(f"Error when proprocess: {e}")
         sys.exit(1)
 
-    # 4. 模拟逐步预测
-    preds = []
+    # 4. 预测
     print(">>> Prediction starting...")
-    for i in range(len(X_test)):
-        X_i = X_test[i].reshape(1, -1)  # shape: (1, 60 * (7 + onehot_dim))
+    if mode == "batch":
         try:
-            pred_i = model.predict(X_i)[0]
-            preds.append(pred_i)
-            print(f"Predict {i + 1} Samples: MidpointPrice = {pred_i:.4f}")
-            time.sleep(delay)  # 模拟延迟
+            preds, rows_per_sec = batch_predict(model, X_test, batch_size)
+            print(f">>> Batch prediction finished: {len(preds)} rows, {rows_per_sec:.0f} rows/sec")
         except Exception as e:
-            print(f"Error when Predict {i + 1} sample: {e}")
-            preds.append(np.nan)
+            print(f"批量预测时出错: {e}")
+            sys.exit(1)
+    else:
+        # 模拟逐步预测
+        preds = np.full(len(X_test), np.nan)
+        for i in range(len(X_test)):
+            X_i = X_test[i].reshape(1, -1)  # shape: (1, 60 * (7 + onehot_dim))
+            try:
+                with METRICS.timer("predict"):
+                    pred_i = model.predict(X_i)[0]
+                preds[i] = pred_i
+                print(f"Predict {i + 1} Samples: MidpointPrice = {pred_i:.4f}")
+                time.sleep(delay)  # 模拟延迟
+            except Exception as e:
+                print(f"Error when Predict {i + 1} sample: {e}")
 
     # 5. 逆缩放预测结果和真实值
     try:
-        mid_price_idx = 6
-        numeric_size = 7  # numeric_cols 有7列
-
-        # 创建 dummy 数组用于逆缩放预测结果
-        y_pred_scaled = np.array(preds).reshape(-1, 1)
-        dummy_pred = np.zeros((len(y_pred_scaled), numeric_size))
-        dummy_pred[:, mid_price_idx] = y_pred_scaled[:, 0]
-        y_pred_inv = scaler.inverse_transform(dummy_pred)[:, mid_price_idx]
-
-        # 创建 dummy 数组用于逆缩放真实值
-        y_test_scaled = y_test.reshape(-1, 1)
-        dummy_true = np.zeros((len(y_test_scaled), numeric_size))
-        dummy_true[:, mid_price_idx] = y_test_scaled[:, 0]
-        y_true_inv = scaler.inverse_transform(dummy_true)[:, mid_price_idx]
+        with METRICS.timer("inverse_transform"):
+            y_pred_inv = inverse_transform_mid(scaler, preds)
+            y_true_inv = inverse_transform_mid(scaler, y_test)
     except Exception as e:
         print(f"逆缩放时出错: {e}")
         sys.exit(1)
 
-    # 6. 显示对比
-    print("\n>>> Prediction Finished! True vs Predict Price:")
-    for i in range(len(y_true_inv)):
-        print(f"The No. {i + 1} Sample: True = {y_true_inv[i]:.4f}, Predict = {y_pred_inv[i]:.4f}")
+    # 6. 显示对比（batch 模式下样本太多，跳过逐条打印）
+    if mode == "realtime":
+        print("\n>>> Prediction Finished! True vs Predict Price:")
+        for i in range(len(y_true_inv)):
+            print(f"The No. {i + 1} Sample: True = {y_true_inv[i]:.4f}, Predict = {y_pred_inv[i]:.4f}")
 
     # 7. 计算误差
     try:
@@ -160,7 +197,18 @@ def simulate_realtime_prediction(test_csv: str, model_path: str, scaler_path: st
         print(f"计算误差时出错: {e}")
         sys.exit(1)
 
-    # 8. 可视化
+    # 各阶段耗时
+    METRICS.report()
+    if metrics_out:
+        METRICS.export(metrics_out, extra={"test_csv": test_csv, "model_path": model_path,
+                                           "mode": mode, "batch_size": batch_size, "rows": len(X_test)})
+        print(f">>> 各阶段耗时已导出到: {metrics_out}")
+
+    # 8. 可视化（batch 模式默认跳过，避免离线打分卡在图形窗口上）
+    if plot is None:
+        plot = mode == "realtime"
+    if not plot:
+        return
     try:
         plt.figure(figsize=(12,6))
         plt.plot(y_true_inv, label='True Price')
@@ -174,12 +222,23 @@ def simulate_realtime_prediction(test_csv: str, model_path: str, scaler_path: st
 
 if __name__ == "__main__":
     # 用法: python inference.py [test_csv_path] [model_path] [scaler_path] [ohe_path] [seq_length=60] [delay=0.1]
-
-    test_csv_path = "data/TestData/merged/A_stock.csv"
-    model_path    = "saved_model/XGBoostA/xgb_model_A.json"
-    scaler_path   = "saved_model/XGBoostA/scaler_A.pkl"           # 第三个参数：保存的 scaler 文件路径
-    ohe_path      = "saved_model/XGBoostA/ohe_A.pkl"           # 第四个参数：保存的 OneHotEncoder 文件路径
-    seq_length    = 60       # 可选参数：滑动窗口长度，默认为60
-    delay         = 0.1     # 可选参数：预测间延迟时间，默认为0.1秒
-
-    simulate_realtime_prediction(test_csv_path, model_path, scaler_path, ohe_path, seq_length, delay)
+    #       python inference.py ... --mode batch --batch-size 8192   离线批量打分整个文件
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OnlyTrades XGBoost 推理")
+    parser.add_argument("test_csv_path", nargs="?", default="data/TestData/merged/A_stock.csv")
+    parser.add_argument("model_path", nargs="?", default="saved_model/XGBoostA/xgb_model_A.json")
+    parser.add_argument("scaler_path", nargs="?", default="saved_model/XGBoostA/scaler_A.pkl")   # 保存的 scaler 文件路径
+    parser.add_argument("ohe_path", nargs="?", default="saved_model/XGBoostA/ohe_A.pkl")         # 保存的 OneHotEncoder 文件路径
+    parser.add_argument("seq_length", nargs="?", type=int, default=60)    # 滑动窗口长度，默认为60
+    parser.add_argument("delay", nargs="?", type=float, default=0.1)      # 预测间延迟时间，默认为0.1秒
+    parser.add_argument("--mode", choices=["realtime", "batch"], default="realtime")
+    parser.add_argument("--batch-size", type=int, default=8192)           # batch 模式下每块的行数
+    parser.add_argument("--metrics-out", default=None)                    # 分阶段耗时导出路径（.json 或 .prom）
+    parser.add_argument("--stock", default=None)                          # 只预测该股票（用于 Parquet 数据集）
+    parser.add_argument("--plot", action=argparse.BooleanOptionalAction, default=None)  # 默认只在 realtime 模式下画图
+    args = parser.parse_args()
+
+    simulate_realtime_prediction(args.test_csv_path, args.model_path, args.scaler_path, args.ohe_path,
+                                 args.seq_length, args.delay, mode=args.mode, batch_size=args.batch_size,
+                                 metrics_out=args.metrics_out, stock=args.stock, plot=args.plot)
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+import numpy as np
+
+# 设置环境变量 ONLYTRADES_METRICS=0 可以关闭计时
+METRICS_ENABLED = os.environ.get("ONLYTRADES_METRICS", "1") != "0"
+QUANTILES = (50, 95, 99)
+
+
+class StageHistogram:
+    """
+    单个阶段的耗时统计：总次数/总时间/最值是精确的，
+    分位数基于最近 window 个样本计算（长时间运行的服务不会无限增长）。
+    """
+
+    def __init__(self, name, window=100000):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.samples.append(seconds)
+
+    def percentiles(self, quantiles=QUANTILES):
+        if not self.samples:
+            return {f"p{q}": float("nan") for q in quantiles}
+        values = np.percentile(np.fromiter(self.samples, dtype=np.float64), quantiles)
+        return {f"p{q}": float(v) for q, v in zip(quantiles, values)}
+
+    def summary(self):
+        result = {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else float("nan"),
+            "min": self.min if self.count else float("nan"),
+            "max": self.max,
+        }
+        result.update(self.percentiles())
+        return result
+
+
+class _StageTimer:
+    """timer() 返回的上下文管理器，用类实现比 contextmanager 生成器开销更低。"""
+
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    按阶段汇总耗时（单位：秒），支持导出 JSON 和 Prometheus 文本格式。
+
+    用法:
+        with METRICS.timer("predict"):
+            model.predict(X)
+
+        @METRICS.timed("preprocess")
+        def preprocess(...): ...
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, window=100000):
+        self.enabled = enabled
+        self.window = window
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        hist = self.stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.stages.setdefault(stage, StageHistogram(stage, self.window))
+        return hist
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            self.histogram(stage).record(seconds)
+
+    def timer(self, stage):
+        return _StageTimer(self, stage) if self.enabled else _NULL_TIMER
+
+    def timed(self, stage=None):
+        def decorator(func):
+            name = stage or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def summary(self):
+        return {stage: hist.summary() for stage, hist in self.stages.items()}
+
+    def to_prometheus(self, prefix="onlytrades"):
+        """
+        以 Prometheus summary 的文本格式输出，每个阶段一个 stage 标签。
+        """
+        metric = f"{prefix}_stage_seconds"
+        lines = [
+            f"# HELP {metric} Per-stage latency in seconds.",
+            f"# TYPE {metric} summary",
+        ]
+        for stage, hist in self.stages.items():
+            for q, value in zip(QUANTILES, hist.percentiles().values()):
+                lines.append(f'{metric}{{stage="{stage}",quantile="{q / 100}"}} {value:.9g}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {hist.total:.9g}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path, extra=None):
+        """
+        按扩展名导出：.prom / .txt 为 Prometheus 文本格式，其余为 JSON。
+        extra 会作为附加信息（例如模型路径、数据文件）写入 JSON。
+        """
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps({"meta": extra or {}, "stages": self.summary()}, indent=2)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def report(self):
+        """打印每个阶段的耗时表（毫秒）。"""
+        print(f"{'stage':<20}{'count':>8}{'total':>12}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for stage, s in self.summary().items():
+            print(f"{stage:<20}{s['count']:>8}{s['total'] * 1000:>12.2f}"
+                  f"{s['p50'] * 1000:>10.3f}{s['p95'] * 1000:>10.3f}{s['p99'] * 1000:>10.3f}")
+
+
+def compare(baseline_path, current_path, threshold=0.1):
+    """
+    对比两次运行导出的 JSON，打印每个阶段 p50/p95/p99 的变化，
+    变慢超过 threshold（比例）的阶段标记为 REGRESSION，并返回这些阶段名。
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["stages"]
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)["stages"]
+
+    regressions = []
+    for stage in sorted(set(baseline) | set(current)):
+        if stage not in baseline or stage not in current:
+            print(f"{stage:<20} 只在一次运行中出现，跳过")
+            continue
+        parts = []
+        regressed = False
+        for q in QUANTILES:
+            key = f"p{q}"
+            old, new = baseline[stage][key], current[stage][key]
+            change = (new - old) / old if old else 0.0
+            parts.append(f"{key} {old * 1000:.3f} -> {new * 1000:.3f} ms ({change:+.1%})")
+            regressed = regressed or change > threshold
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{stage:<20} " + ", ".join(parts) + flag)
+        if regressed:
+            regressions.append(stage)
+    return regressions
+
+
+# 进程内默认的全局统计
+METRICS = Metrics()
+timer = METRICS.timer
+timed = METRICS.timed
+
+
+if __name__ == "__main__":
+    # 用法: python instrumentation.py baseline.json current.json [--threshold 0.1]
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="对比两次运行的分阶段延迟")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+    sys.exit(1 if compare(args.baseline, args.current, args.threshold) else 0)
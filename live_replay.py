@@ -0,0 +1,111 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+LIVE_COLUMNS = ["timestamp", "bidPrice", "askPrice", "MidpointPrice", "predicted"]
+
+
+class LiveReplay:
+    """
+    按时间戳节奏回放一个 (stock, period) 的 tick，并用 StreamingPredictor 逐 tick 预测。
+
+    只保留最近 window 个点（deque），每次推进只处理新到的 tick，
+    页面刷新时重画的是这个有界窗口，而不是整段历史。
+    predicted 列是上一个 tick 对当前 tick 中间价的预测，可以直接和 MidpointPrice 对比。
+    """
+
+    def __init__(self, ticks, predictor=None, window=2000, max_ticks_per_step=500):
+        self.ticks = ticks.reset_index(drop=True)
+        self.predictor = predictor
+        self.window = window
+        self.max_ticks_per_step = max_ticks_per_step
+        # 预先取出 numpy 数组，逐 tick 处理时不走 pandas
+        self._ts = self.ticks["timestamp"].to_numpy()
+        self._ts_ns = self._ts.astype("datetime64[ns]").view(np.int64)
+        self._bid_volume = self.ticks["bidVolume"].to_numpy(dtype=np.float64)
+        self._bid_price = self.ticks["bidPrice"].to_numpy(dtype=np.float64)
+        self._ask_volume = self.ticks["askVolume"].to_numpy(dtype=np.float64)
+        self._ask_price = self.ticks["askPrice"].to_numpy(dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self._pending = np.nan
+        self._clock = None
+        self.lag_seconds = 0.0
+        self._abs_error = 0.0
+        self._sq_error = 0.0
+        self._n_errors = 0
+        self._columns = {name: deque(maxlen=self.window) for name in LIVE_COLUMNS}
+        if self.predictor is not None:
+            self.predictor.reset()
+
+    @property
+    def done(self):
+        return self.pos >= len(self._ts)
+
+    def advance(self, n):
+        """处理接下来的 n 个 tick，返回实际处理的个数。"""
+        end = min(self.pos + n, len(self._ts))
+        for i in range(self.pos, end):
+            mid = (self._bid_price[i] + self._ask_price[i]) / 2
+            predicted = self._pending
+            if not np.isnan(predicted):
+                self._abs_error += abs(predicted - mid)
+                self._sq_error += (predicted - mid) ** 2
+                self._n_errors += 1
+            self._columns["timestamp"].append(self._ts[i])
+            self._columns["bidPrice"].append(self._bid_price[i])
+            self._columns["askPrice"].append(self._ask_price[i])
+            self._columns["MidpointPrice"].append(mid)
+            self._columns["predicted"].append(predicted)
+            if self.predictor is not None:
+                pred = self.predictor.update(self._bid_volume[i], self._bid_price[i],
+                                             self._ask_volume[i], self._ask_price[i])
+                self._pending = np.nan if pred is None else pred
+        n_done = end - self.pos
+        self.pos = end
+        return n_done
+
+    def pause(self):
+        """暂停后再次推进时从当前位置重新对齐时钟，不会一下子追赶暂停期间的数据。"""
+        self._clock = None
+
+    def advance_to(self, wall_time, speed=1.0):
+        """
+        按回放速度推进到 wall_time 对应的数据时间：数据时间 = 起点 + (wall_time - 开始时刻) × speed。
+        第一次调用时以当前 tick 作为起点；单次最多处理 max_ticks_per_step 个 tick，避免页面卡顿。
+        达到上限时从处理到的位置重新对齐时钟（实际速度低于 speed，不会越积越多地落后），
+        这一步没追上的数据时间记在 lag_seconds 中，供页面提示。
+        """
+        if self.done:
+            return 0
+        if self._clock is None or self._clock[2] != speed:
+            # 开始或者调整速度时，以当前位置重新对齐时钟
+            self._clock = (wall_time, self._ts_ns[self.pos], speed)
+        wall_start, data_start, _ = self._clock
+        target = data_start + int((wall_time - wall_start) * speed * 1e9)
+        n = int(np.searchsorted(self._ts_ns, target, side="right")) - self.pos
+        capped = n > self.max_ticks_per_step
+        n_done = self.advance(min(max(n, 0), self.max_ticks_per_step))
+        if capped and not self.done:
+            self.lag_seconds = (target - self._ts_ns[self.pos]) / 1e9
+            self._clock = (wall_time, self._ts_ns[self.pos], speed)
+        else:
+            self.lag_seconds = 0.0
+        return n_done
+
+    def frame(self):
+        """当前窗口内的数据。"""
+        return pd.DataFrame({name: list(values) for name, values in self._columns.items()})
+
+    def metrics(self):
+        """到目前为止的预测误差（原始价格单位）。"""
+        if self._n_errors == 0:
+            return {"ticks": self.pos, "mae": None, "mse": None}
+        return {
+            "ticks": self.pos,
+            "mae": float(self._abs_error / self._n_errors),
+            "mse": float(self._sq_error / self._n_errors),
+        }
@@ -1,9 +1,12 @@
+import time
 from datetime import datetime
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
-from pathlib import Path
+from market_store import get_market_store
+from utils.chart_lod import lod_trace, lod_indices, WEBGL_THRESHOLD
+from live_replay import LiveReplay
+from model_registry import get_registry
+from prediction_cache import PredictionCache, prediction_metrics, rolling_rmse
 hide_decoration_bar_style = '''
     <style>
         header {visibility: hidden;}
@@ -64,49 +67,42 @@ hide_decoration_bar_style = '''
     <div class="centered-text">OnlyTrades</div>
 '''
 st.markdown(hide_decoration_bar_style, unsafe_allow_html=True) 
-def load_csv_data(csv_file):
-    df = pd.read_csv(csv_file)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], format='%H:%M:%S.%f')
-    min_time = df['timestamp'].min()
-    max_time = df['timestamp'].max()
-    
-    return df, min_time, max_time
-
-@st.cache_data
-def load_all_data():
-    data = {}
-    min_times = {}
-    max_times = {}
-    dataset_path = "./TrainingData"
-    stocks = ["A", "B", "C", "D", "E"]
-    periods = [idx for idx in range(1, 16)]
-    for stock in stocks:
-        data[stock] = {}
-        min_times[stock] = {}
-        max_times[stock] = {}
-        
-        for period in periods:
-            csv_files = (
-                Path(dataset_path)
-                .joinpath(f"Period{period}")
-                .joinpath(stock)
-            )
-            for csv_file in csv_files.iterdir():
-                if str(csv_file.stem)!=f"market_data_{stock}_0":
-                    continue
-                data[stock][period], min_times[stock][period], max_times[stock][period] = load_csv_data(csv_file)
-    
-    return data, min_times, max_times
+# 按需加载，LRU 缓存有内存预算（ONLYTRADES_CACHE_MB）；存在 TrainingData.parquet 时优先读取 Parquet 数据集
+# python -m utils.storage import-raw TrainingData TrainingData.parquet
+store = get_market_store("./TrainingData", "./TrainingData.parquet")
+periods = store.periods() or list(range(1, 16))
+# 批量预测结果按 (stock, period, shards, 模型版本, 数据版本) 缓存在磁盘上
+prediction_cache = PredictionCache(".prediction_cache", "saved_model")
+TIME_FORMAT = '%H:%M:%S.%f'
 
 
-def fetch_data(data, min_times, max_times):
+def fetch_data():
     stock = st.session_state.stock
     period = st.session_state.period
-    return data[stock][period], min_times[stock][period], max_times[stock][period]
-         
+    return store.get(stock, period, st.session_state.shards)
+
+
+def fetch_predictions():
+    # 整个 Period 的预测中间价（与 fetch_data() 的行对齐），没有模型时返回 None
+    stock = st.session_state.stock
+    if not prediction_cache.has_model(stock):
+        return None
+    ticks, _, _ = fetch_data()
+    sources = store.source_files(stock, st.session_state.period, st.session_state.shards)
+    return prediction_cache.get(stock, st.session_state.period, st.session_state.shards, ticks, sources)
+
 
+def prewarm_neighbours():
+    # 后台预热同一只股票的相邻 Period，切换时不必等待读取
+    period = st.session_state.period
+    if period not in periods:
+        return
+    idx = periods.index(period)
+    store.prewarm([
+        (st.session_state.stock, p, st.session_state.shards)
+        for p in periods[max(idx - 1, 0):idx + 2] if p != period
+    ])
 
-data, min_times, max_times = load_all_data()
 
 stock_col, time_col = st.columns(2)
 
@@ -114,45 +110,63 @@ stock_col, time_col = st.columns(2)
 if st.session_state.get("stock") is None:
     st.session_state.stock = "A"
 if st.session_state.get("period") is None:
-    st.session_state.period = 1
+    st.session_state.period = periods[0]
+if st.session_state.get("shards") is None:
+    st.session_state.shards = [0]
 stock = st.session_state.stock
 period = st.session_state.period
-st.session_state.display_data = data[stock][period]
-st.session_state.min_time = min_times[stock][period]
-st.session_state.max_time = max_times[stock][period]
+_, min_time, max_time = fetch_data()
+prewarm_neighbours()
 if st.session_state.get("start_time") is None:
-    st.session_state.start_time = st.session_state.min_time.strftime(format='%H:%M:%S.%f')
+    st.session_state.start_time = min_time.strftime(format=TIME_FORMAT)
 if st.session_state.get("end_time") is None:
-    st.session_state.end_time = st.session_state.max_time.strftime(format='%H:%M:%S.%f')
+    st.session_state.end_time = max_time.strftime(format=TIME_FORMAT)
+# 已确认的时间区间：只保存字符串，显示的数据在每次重跑时由 TimeIndex 切出
+if st.session_state.get("range_start") is None:
+    st.session_state.range_start = st.session_state.start_time
+if st.session_state.get("range_end") is None:
+    st.session_state.range_end = st.session_state.end_time
 if st.session_state.get("displayed_price") is None:
     st.session_state.displayed_price = ["bidPrice", "askPrice"]
 if st.session_state.get("displayed_volume") is None:
     st.session_state.displayed_volume = ["bidVolume", "askVolume"]
 
-def on_content_change():
-    st.session_state.display_data, st.session_state.min_time, st.session_state.max_time = fetch_data(data, min_times, max_times)
-    st.session_state.start_time = st.session_state.min_time.strftime(format='%H:%M:%S.%f')
-    st.session_state.end_time = st.session_state.max_time.strftime(format='%H:%M:%S.%f')
-    
-def on_time_change():
-    current_data, _, _ = fetch_data(data, min_times, max_times)
-    try:
-        start_time = datetime.strptime(st.session_state.start_time, '%H:%M:%S.%f')
-    except ValueError:
-        start_time = st.session_state.min_time
-        st.session_state.start_time = str(st.session_state.min_time)
+
+def parse_time(text, default):
     try:
-        end_time = datetime.strptime(st.session_state.end_time, '%H:%M:%S.%f')
+        return datetime.strptime(text, TIME_FORMAT)
     except ValueError:
-        end_time = st.session_state.max_time
-        st.session_state.end_time = str(st.session_state.max_time)
-        
-    st.session_state.display_data = current_data.loc(
-        current_data["timestamp"] >= start_time
-        and current_data["timestamp"] <= end_time
-    )
-    
-    
+        return default
+
+
+def fetch_display_data():
+    # 按时间排序的索引上二分查找，返回已确认区间的切片，不扫描整张表
+    _, min_time, max_time = fetch_data()
+    index = store.time_index(st.session_state.stock, st.session_state.period, st.session_state.shards)
+    return index.slice(parse_time(st.session_state.range_start, min_time),
+                       parse_time(st.session_state.range_end, max_time))
+
+
+def on_content_change():
+    # 换了股票或 Period 之后，只保留仍然存在的分片，时间区间重置为整段数据
+    available = store.shards(st.session_state.stock, st.session_state.period)
+    st.session_state.shards = [s for s in st.session_state.shards if s in available] or available[:1]
+    _, min_time, max_time = fetch_data()
+    st.session_state.start_time = st.session_state.range_start = min_time.strftime(format=TIME_FORMAT)
+    st.session_state.end_time = st.session_state.range_end = max_time.strftime(format=TIME_FORMAT)
+
+
+def on_time_change():
+    # 无法解析的输入恢复为整段数据的起止时间
+    _, min_time, max_time = fetch_data()
+    if parse_time(st.session_state.start_time, None) is None:
+        st.session_state.start_time = min_time.strftime(format=TIME_FORMAT)
+    if parse_time(st.session_state.end_time, None) is None:
+        st.session_state.end_time = max_time.strftime(format=TIME_FORMAT)
+    st.session_state.range_start = st.session_state.start_time
+    st.session_state.range_end = st.session_state.end_time
+
+
 def on_display_change():
     st.session_state.displayed_price = []
     st.session_state.displayed_volume = []
@@ -174,14 +188,18 @@ with stock_col:
     )
     period_option = st.selectbox(
         label='Period',
-        options=list(range(1, 16)),  # List of numbers from 1 to 15
+        options=periods,  # 从数据目录中发现的 Period
         key="period",
         on_change=on_content_change
     )
+    shard_option = st.multiselect(
+        label='Shards',
+        options=store.shards(st.session_state.stock, st.session_state.period),
+        key="shards",
+        on_change=on_content_change
+    )
 
 with time_col:
-    _, min_time, max_time = fetch_data(data, min_times, max_times)
-    
     start_time = st.text_input(
         label="Start time",
         key="start_time"
@@ -196,20 +214,55 @@ with time_col:
 
     )
 
+display_data = fetch_display_data()
+
 st.subheader("Bid Price & Ask Price")
 st.checkbox("Bid Price", key="show_bid_price", value=True, on_change=on_display_change)
 st.checkbox("Ask Price", key="show_ask_price", value=True, on_change=on_display_change)
+st.checkbox("Predicted Midpoint", key="show_predicted", value=True)
 price_figure = go.Figure()
 # Add traces for each line
 for column in st.session_state.displayed_price:
     price_figure.add_trace(
-        go.Scatter(
-            x=st.session_state.display_data["timestamp"], 
-            y=st.session_state.display_data[column], 
-            mode='lines', 
+        # 按图表宽度做 min/max 降采样，点多时自动改用 WebGL
+        lod_trace(
+            display_data["timestamp"], 
+            display_data[column], 
             name=column
         )
     )
+if st.session_state.show_predicted:
+    predictions = fetch_predictions()
+    if predictions is None:
+        st.caption(f"No saved model for stock {st.session_state.stock}, no predictions to show.")
+    else:
+        # display_data 是整段数据的 iloc 切片，索引就是在整段数据中的行号
+        full_data, _, _ = fetch_data()
+        full_mid = ((full_data["bidPrice"] + full_data["askPrice"]) / 2).to_numpy()
+        rows = display_data.index.to_numpy()
+        x = display_data["timestamp"].to_numpy()
+        predicted = predictions[rows]
+        # 误差带：预测值 ± 最近 500 个 tick 的滚动 RMSE，与预测线用同一组降采样点
+        band = rolling_rmse(full_mid, predictions)[rows]
+        idx = lod_indices(x, predicted)
+        trace_cls = go.Scattergl if len(idx) > WEBGL_THRESHOLD else go.Scatter
+        price_figure.add_trace(trace_cls(x=x[idx], y=(predicted + band)[idx], mode="lines",
+                                         line=dict(width=0), showlegend=False, hoverinfo="skip"))
+        price_figure.add_trace(trace_cls(x=x[idx], y=(predicted - band)[idx], mode="lines",
+                                         line=dict(width=0), fill="tonexty", fillcolor="rgba(200, 78, 17, 0.2)",
+                                         name="Error band"))
+        price_figure.add_trace(trace_cls(x=x[idx], y=predicted[idx], mode="lines", name="Predicted"))
+
+        period_metrics = prediction_metrics(full_mid, predictions)
+        range_metrics = prediction_metrics(full_mid[rows], predicted)
+        tiles = st.columns(4)
+        for tile, label, metrics, key in [
+            (tiles[0], "Period MSE", period_metrics, "mse"),
+            (tiles[1], "Period MAE", period_metrics, "mae"),
+            (tiles[2], "Range MSE", range_metrics, "mse"),
+            (tiles[3], "Range MAE", range_metrics, "mae"),
+        ]:
+            tile.metric(label, "-" if metrics[key] is None else f"{metrics[key]:.6f}")
 # Customize layout
 price_figure.update_layout(
     title="Price Chart",
@@ -236,10 +289,10 @@ volume_figure = go.Figure()
 # Add traces for each line
 for column in st.session_state.displayed_volume:
     volume_figure.add_trace(
-        go.Scatter(
-            x=st.session_state.display_data["timestamp"], 
-            y=st.session_state.display_data[column], 
-            mode='lines', 
+        # 按图表宽度做 min/max 降采样，点多时自动改用 WebGL
+        lod_trace(
+            display_data["timestamp"], 
+            display_data[column], 
             name=column
         )
     )
@@ -262,3 +315,75 @@ volume_figure.update_layout(
 # Display the chart in Streamlit
 st.plotly_chart(volume_figure)
 
+
+st.subheader("Live Replay")
+LIVE_REFRESH_SECONDS = 0.5  # 片段的刷新间隔
+
+
+def make_live_replay():
+    # 回放当前选择的 (stock, period, shards)；有模型时逐 tick 预测下一个中间价
+    stock = st.session_state.stock
+    ticks, _, _ = fetch_data()
+    registry = get_registry("saved_model")
+    predictor = registry.predictor(stock) if stock in registry.stocks else None
+    replay = LiveReplay(ticks, predictor, window=st.session_state.live_window)
+    replay.key = (stock, st.session_state.period, tuple(st.session_state.shards))
+    return replay
+
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_panel():
+    # 只有这个片段按固定间隔重跑：每次只处理新到的 tick，图里只画最近 live_window 个点
+    key = (st.session_state.stock, st.session_state.period, tuple(st.session_state.shards))
+    replay = st.session_state.get("live_replay")
+    if replay is None or replay.key != key or replay.window != st.session_state.live_window:
+        replay = st.session_state.live_replay = make_live_replay()
+    replay.advance_to(time.monotonic(), st.session_state.live_speed)
+
+    window = replay.frame()
+    live_figure = go.Figure()
+    for column in ["bidPrice", "askPrice", "predicted"]:
+        live_figure.add_trace(go.Scattergl(x=window["timestamp"], y=window[column], mode='lines', name=column))
+    live_figure.update_layout(
+        title=f"Live {key[0]} Period{key[1]}",
+        xaxis_title="Time",
+        yaxis_title="Price",
+        template="plotly_white",
+        paper_bgcolor="#2A264F",
+        plot_bgcolor="#2A264F",
+        title_font=dict(color="#C84E11"),
+        uirevision="live",  # 刷新时保留用户的缩放状态
+    )
+    st.plotly_chart(live_figure, key="live_chart")
+
+    metrics = replay.metrics()
+    tick_col, mae_col, mse_col = st.columns(3)
+    tick_col.metric("Ticks", f"{metrics['ticks']} / {len(replay.ticks)}")
+    mae_col.metric("MAE", "-" if metrics["mae"] is None else f"{metrics['mae']:.4f}")
+    mse_col.metric("MSE", "-" if metrics["mse"] is None else f"{metrics['mse']:.6f}")
+    if replay.lag_seconds > 0:
+        st.caption(f"Replay can't keep up at {st.session_state.live_speed}x: last refresh was "
+                   f"{replay.lag_seconds:.1f}s of data behind, running slower than requested.")
+    if replay.predictor is None:
+        st.caption(f"No saved model for stock {key[0]}, showing prices only.")
+
+
+def on_live_restart():
+    replay = st.session_state.get("live_replay")
+    if replay is not None:
+        replay.reset()
+
+
+live_on = st.toggle("Live", key="live_on")
+speed_col, window_col, restart_col = st.columns(3)
+with speed_col:
+    st.select_slider("Speed", options=[1, 2, 5, 10, 30, 60, 120], value=10, key="live_speed")
+with window_col:
+    st.select_slider("Window", options=[500, 1000, 2000, 5000], value=2000, key="live_window")
+with restart_col:
+    st.button("Restart", on_click=on_live_restart)
+
+if live_on:
+    live_panel()
+elif st.session_state.get("live_replay") is not None:
+    st.session_state.live_replay.pause()
@@ -0,0 +1,238 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.market_data import read_market_data, list_market_data_files, list_periods, PERIOD_PATTERN
+from utils.storage import read_table
+from utils.timeparse import to_datetime, parse_datetime_ns, NAT_NS
+
+SHARD_PATTERN = re.compile(r"_(?P<shard>\d+)\.csv$")
+
+MARKET_COLUMNS = ["bidVolume", "bidPrice", "askVolume", "askPrice", "timestamp"]
+
+# 默认内存预算，可以用环境变量 ONLYTRADES_CACHE_MB 覆盖
+DEFAULT_BUDGET_MB = int(os.environ.get("ONLYTRADES_CACHE_MB", "512"))
+
+
+class TimeIndex:
+    """
+    按时间排序的 DataFrame 上的区间索引：用二分查找定位 [start, end] 的行号，
+    返回 iloc 切片（不复制数据），每次查询 O(log N)。
+
+    column 可以是 datetime64 列，也可以是已排序的数值列（例如距午夜的秒数）。
+    """
+
+    def __init__(self, df, column="timestamp"):
+        if not df[column].is_monotonic_increasing:
+            df = df.sort_values(column, kind="stable").reset_index(drop=True)
+        self.df = df
+        self.column = column
+        values = df[column].to_numpy()
+        self.is_datetime = values.dtype.kind == "M"
+        self.keys = values.astype("datetime64[ns]").view(np.int64) if self.is_datetime else values
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _key(self, value):
+        if not self.is_datetime:
+            return value
+        if isinstance(value, str):
+            # "HH:MM:SS.ffffff" 与数据一样落在 1900-01-01
+            key = parse_datetime_ns([value])[0]
+            if key == NAT_NS:
+                raise ValueError(f"无法解析时间: {value}")
+            return key
+        return pd.Timestamp(value).value
+
+    def positions(self, start=None, end=None):
+        """[start, end]（两端都包含）对应的行号区间 [lo, hi)。"""
+        lo = 0 if start is None else int(np.searchsorted(self.keys, self._key(start), side="left"))
+        hi = len(self.keys) if end is None else int(np.searchsorted(self.keys, self._key(end), side="right"))
+        return lo, max(lo, hi)
+
+    def slice(self, start=None, end=None):
+        lo, hi = self.positions(start, end)
+        return self.df.iloc[lo:hi]
+
+    def count(self, start=None, end=None):
+        lo, hi = self.positions(start, end)
+        return hi - lo
+
+    @property
+    def min(self):
+        return self.df[self.column].iloc[0] if len(self) else None
+
+    @property
+    def max(self):
+        return self.df[self.column].iloc[-1] if len(self) else None
+
+
+class MarketStore:
+    """
+    Dashboard 用的按需加载行情数据存储。
+
+    以 (stock, period, shards) 为键，第一次访问时才读取对应的原始文件（或 Parquet 数据集分区），
+    结果放在有内存预算的 LRU 缓存中，超出预算时淘汰最久未使用的条目。
+    可以在后台线程中预热接下来可能访问的数据。
+    """
+
+    def __init__(self, root="TrainingData", parquet_root="TrainingData.parquet", budget_mb=DEFAULT_BUDGET_MB):
+        self.root = root
+        self.parquet_root = parquet_root if parquet_root and os.path.isdir(parquet_root) else None
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._cache = OrderedDict()   # key -> (df, min_time, max_time, nbytes, TimeIndex)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}          # 同一个键只加载一次，并发请求等待同一次加载
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="market-prewarm")
+        self.hits = 0
+        self.misses = 0
+
+    # ---- 目录发现 ----
+
+    def periods(self):
+        """所有存在的 Period 编号（按数字排序），不再写死为 1~15。"""
+        if self.parquet_root is not None:
+            names = os.listdir(self.parquet_root)
+            names = [name.split("=", 1)[1] for name in names if name.startswith("period=")]
+            return sorted(int(m.group("period")) for m in map(PERIOD_PATTERN.match, names) if m)
+        return list_periods(self.root)
+
+    def shards(self, stock, period):
+        """某个 (stock, period) 下可用的分片编号。"""
+        if self.parquet_root is not None:
+            df = read_table(self.parquet_root, columns=["shard"],
+                            filters=[("period", "==", f"Period{period}"), ("stock", "==", stock)])
+            return sorted(int(s) for s in df["shard"].unique())
+        folder = os.path.join(self.root, f"Period{period}", stock)
+        files = list_market_data_files(folder, stock)
+        return [int(SHARD_PATTERN.search(f).group("shard")) for f in files if SHARD_PATTERN.search(f)]
+
+    def source_files(self, stock, period, shards=(0,)):
+        """(stock, period, shards) 的数据来自哪些文件，供下游缓存计算数据指纹。"""
+        if self.parquet_root is not None:
+            folder = os.path.join(self.parquet_root, f"period=Period{period}", f"stock={stock}")
+            return sorted(os.path.join(dirpath, name) for dirpath, _, names in os.walk(folder) for name in names)
+        folder = os.path.join(self.root, f"Period{period}", stock)
+        shards = {int(s) for s in shards}
+        return [f for f in list_market_data_files(folder, stock)
+                if SHARD_PATTERN.search(f) and int(SHARD_PATTERN.search(f).group("shard")) in shards]
+
+    # ---- 加载与缓存 ----
+
+    @staticmethod
+    def _key(stock, period, shards):
+        return str(stock), int(period), tuple(sorted(int(s) for s in shards))
+
+    def _load(self, stock, period, shards):
+        if self.parquet_root is not None:
+            df = read_table(
+                self.parquet_root,
+                columns=MARKET_COLUMNS,
+                filters=[("period", "==", f"Period{period}"), ("stock", "==", stock), ("shard", "in", list(shards))],
+            )
+        else:
+            folder = os.path.join(self.root, f"Period{period}", stock)
+            frames = [read_market_data(os.path.join(folder, f"market_data_{stock}_{shard}.csv")) for shard in shards]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=MARKET_COLUMNS)
+        df["timestamp"] = to_datetime(df["timestamp"])
+        df = df.dropna(subset=["timestamp"])
+        if len(shards) > 1 or not df["timestamp"].is_monotonic_increasing:
+            df = df.sort_values("timestamp", kind="stable")
+        return df.reset_index(drop=True)
+
+    def _insert(self, key, entry, recent=True):
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = entry
+            self._nbytes += entry[3]
+            if not recent:
+                # 预热的数据最先被淘汰，不会挤掉正在显示的数据
+                self._cache.move_to_end(key, last=False)
+            while self._nbytes > self.budget and len(self._cache) > 1:
+                _, (_, _, _, nbytes, _) = self._cache.popitem(last=False)
+                self._nbytes -= nbytes
+
+    def get(self, stock, period, shards=(0,), recent=True):
+        """
+        返回 (df, min_time, max_time)。已缓存时直接返回，否则加载并放入缓存。
+        """
+        return self._entry(stock, period, shards, recent)[:3]
+
+    def time_index(self, stock, period, shards=(0,)):
+        """该 (stock, period, shards) 的 TimeIndex，与数据一起缓存。"""
+        return self._entry(stock, period, shards)[4]
+
+    def _entry(self, stock, period, shards=(0,), recent=True):
+        key = self._key(stock, period, shards)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if recent:
+                    self._cache.move_to_end(key)
+                self.hits += 1
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                df = self._load(*key)
+                nbytes = int(df.memory_usage(index=True, deep=False).sum())
+                entry = (df, df["timestamp"].min(), df["timestamp"].max(), nbytes, TimeIndex(df))
+                self._insert(key, entry, recent)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return entry
+
+    def prewarm(self, keys):
+        """
+        在后台线程中依次加载 [(stock, period, shards), ...]，已缓存的跳过。返回 Future 列表。
+        """
+        futures = []
+        for stock, period, shards in keys:
+            if self.is_cached(stock, period, shards):
+                continue
+            futures.append(self._executor.submit(self._prewarm_one, stock, period, shards))
+        return futures
+
+    def _prewarm_one(self, stock, period, shards):
+        try:
+            self.get(stock, period, shards, recent=False)
+        except Exception as e:
+            print(f"预热 {stock}/Period{period}/{shards} 失败: {e}")
+
+    def is_cached(self, stock, period, shards=(0,)):
+        with self._lock:
+            return self._key(stock, period, shards) in self._cache
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "memory_mb": self._nbytes / 1024 / 1024,
+                "budget_mb": self.budget / 1024 / 1024,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._nbytes = 0
+
+
+@lru_cache(maxsize=None)
+def get_market_store(root="TrainingData", parquet_root="TrainingData.parquet", budget_mb=DEFAULT_BUDGET_MB):
+    """进程内共享的 MarketStore（Streamlit 每次重跑脚本都拿到同一个实例）。"""
+    return MarketStore(root, parquet_root, budget_mb)
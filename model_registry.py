@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from inference import load_artifacts, preprocess_test_data, batch_predict, inverse_transform_mid
+from streaming_predictor import StreamingPredictor
+
+# saved_model/XGBoostA/{xgb_model_A.json, scaler_A.pkl, ohe_A.pkl}
+MODEL_DIR_PATTERN = re.compile(r"^XGBoost(?P<stock>\w+)$")
+
+
+class ModelRegistry:
+    """
+    多股票模型注册表。
+
+    扫描 root 下所有 XGBoost{stock} 目录，记录每只股票的 (模型, scaler, ohe) 路径；
+    第一次用到某只股票时才加载，加载后常驻内存，后续请求直接复用。
+    """
+
+    def __init__(self, root="saved_model", seq_length=60):
+        self.root = root
+        self.seq_length = seq_length
+        self._paths = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+        self.discover()
+
+    def discover(self):
+        """
+        重新扫描 root 目录，只登记三个文件都齐全的模型目录。
+        """
+        paths = {}
+        if not os.path.isdir(self.root):
+            print(f"模型目录不存在: {self.root}")
+        else:
+            for name in sorted(os.listdir(self.root)):
+                match = MODEL_DIR_PATTERN.match(name)
+                if match is None:
+                    continue
+                stock = match.group("stock")
+                model_dir = os.path.join(self.root, name)
+                triple = (
+                    os.path.join(model_dir, f"xgb_model_{stock}.json"),
+                    os.path.join(model_dir, f"scaler_{stock}.pkl"),
+                    os.path.join(model_dir, f"ohe_{stock}.pkl"),
+                )
+                if all(os.path.exists(p) for p in triple):
+                    paths[stock] = triple
+                else:
+                    print(f"模型目录 {model_dir} 缺少文件，跳过")
+        with self._lock:
+            self._paths = paths
+        return sorted(paths)
+
+    @property
+    def stocks(self):
+        return sorted(self._paths)
+
+    def paths(self, stock):
+        return self._paths[str(stock)]
+
+    def is_loaded(self, stock):
+        return str(stock) in self._loaded
+
+    def get(self, stock):
+        """
+        返回 (model, scaler, ohe)，第一次调用时加载。
+        """
+        stock = str(stock)
+        artifacts = self._loaded.get(stock)
+        if artifacts is not None:
+            return artifacts
+        with self._lock:
+            artifacts = self._loaded.get(stock)
+            if artifacts is None:
+                if stock not in self._paths:
+                    raise KeyError(f"没有股票 {stock} 的模型，可用: {self.stocks}")
+                artifacts = load_artifacts(*self._paths[stock])
+                self._loaded[stock] = artifacts
+        return artifacts
+
+    def warm_up(self, stocks=None):
+        """预先加载指定（默认全部）股票的模型。"""
+        for stock in (self.stocks if stocks is None else stocks):
+            self.get(stock)
+
+    def predictor(self, stock):
+        """为某只股票创建一个共享已加载模型的 StreamingPredictor。"""
+        model, scaler, ohe = self.get(stock)
+        return StreamingPredictor(model, scaler, ohe, stock, self.seq_length)
+
+    def predict(self, df, batch_size=8192):
+        """
+        对可能混合多只股票的 DataFrame 做批量预测。
+
+        按 stock 列分组，每组只构造一次窗口、调用一次分块批量预测，再按原始行序写回。
+        返回与 df 等长的数组：第 i 个值是用同一股票前 seq_length 行预测的第 i 行 MidpointPrice（原始价格），
+        每只股票前 seq_length 行以及没有模型的股票为 NaN。
+        """
+        if "stock" not in df.columns:
+            raise ValueError("数据中缺少 'stock' 列，无法路由到对应模型")
+        if "MidpointPrice" not in df.columns:
+            df = df.assign(MidpointPrice=(df["bidPrice"] + df["askPrice"]) / 2)
+
+        result = np.full(len(df), np.nan)
+        groups = df.groupby(df["stock"].astype(str), sort=False).indices
+        for stock, positions in groups.items():
+            if stock not in self._paths:
+                print(f"没有股票 {stock} 的模型，跳过 {len(positions)} 行")
+                continue
+            if len(positions) <= self.seq_length:
+                continue
+            model, scaler, ohe = self.get(stock)
+            X, _ = preprocess_test_data(df.iloc[positions], scaler, ohe, self.seq_length)
+            preds_scaled, _ = batch_predict(model, X, batch_size)
+            result[positions[self.seq_length:]] = inverse_transform_mid(scaler, preds_scaled)
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_registry(root="saved_model", seq_length=60):
+    """
+    进程内共享的注册表，同一个 root 只扫描、加载一次。
+    """
+    return ModelRegistry(root, seq_length)
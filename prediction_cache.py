@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+import numpy as np
+
+from model_registry import get_registry
+from utils.feature_engineering import add_features
+from utils.manifest import fingerprint
+
+
+def rolling_rmse(actual, predicted, window=500):
+    """
+    残差在最近 window 个有效点上的均方根（向量化，基于累积和），没有有效点时为 NaN。
+    """
+    residual = np.asarray(actual, dtype=np.float64) - np.asarray(predicted, dtype=np.float64)
+    valid = ~np.isnan(residual)
+    sq = np.where(valid, residual ** 2, 0.0)
+    csum = np.concatenate([[0.0], np.cumsum(sq)])
+    ccount = np.concatenate([[0], np.cumsum(valid)])
+    end = np.arange(1, len(residual) + 1)
+    start = np.maximum(end - window, 0)
+    count = ccount[end] - ccount[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, np.sqrt((csum[end] - csum[start]) / count), np.nan)
+
+
+def prediction_metrics(actual, predicted):
+    """有预测值的行上的 MSE / MAE。"""
+    residual = np.asarray(actual, dtype=np.float64) - np.asarray(predicted, dtype=np.float64)
+    residual = residual[~np.isnan(residual)]
+    if len(residual) == 0:
+        return {"n": 0, "mse": None, "mae": None}
+    return {"n": int(len(residual)), "mse": float(np.mean(residual ** 2)), "mae": float(np.mean(np.abs(residual)))}
+
+
+class PredictionCache:
+    """
+    每个 (stock, period, shards, 模型版本) 的批量预测结果缓存在磁盘上（.npy），
+    第二次打开同一个 Period 时直接读取，不再做推理。
+
+    模型版本由模型、scaler、ohe 三个文件的大小和修改时间决定，重新训练后自动失效；
+    数据版本由源文件的指纹（utils.manifest.fingerprint）决定，数据更新后即使行数不变也会重新计算。
+    没有给出源文件时用行情数据本身的哈希。
+    """
+
+    def __init__(self, cache_dir=".prediction_cache", model_root="saved_model", seq_length=60):
+        self.cache_dir = cache_dir
+        self.registry = get_registry(model_root, seq_length)
+
+    def has_model(self, stock):
+        return str(stock) in self.registry.stocks
+
+    def model_version(self, stock):
+        h = hashlib.sha1()
+        for path in self.registry.paths(stock):
+            st = os.stat(path)
+            h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+        return h.hexdigest()[:12]
+
+    @staticmethod
+    def data_version(ticks, sources=()):
+        h = hashlib.sha1()
+        if sources:
+            for path in sources:
+                h.update(f"{path}:{fingerprint(path)};".encode())
+        else:
+            for col in ["timestamp", "bidVolume", "bidPrice", "askVolume", "askPrice"]:
+                h.update(np.ascontiguousarray(ticks[col].to_numpy()).tobytes())
+        return h.hexdigest()[:12]
+
+    def path(self, stock, period, shards, data_version=""):
+        shard_tag = "-".join(str(s) for s in sorted(shards))
+        name = f"Period{period}_shards{shard_tag}_{self.model_version(stock)}_{data_version}.npy"
+        return os.path.join(self.cache_dir, str(stock), name)
+
+    def get(self, stock, period, shards, ticks, sources=()):
+        """
+        返回与 ticks 等长的预测中间价数组（前 seq_length 行为 NaN）。
+        ticks 为原始行情（bidVolume, bidPrice, askVolume, askPrice, ...），按时间排序；
+        sources 为 ticks 的源文件（MarketStore.source_files）。
+        """
+        path = self.path(stock, period, shards, self.data_version(ticks, sources))
+        if os.path.exists(path):
+            preds = np.load(path)
+            if len(preds) == len(ticks):
+                return preds
+
+        df = add_features(ticks[["bidVolume", "bidPrice", "askVolume", "askPrice"]].copy(), stock=str(stock))
+        preds = self.registry.predict(df)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, preds)
+        os.replace(tmp_path, path)
+        return preds
@@ -0,0 +1,110 @@
+import numpy as np
+
+from inference import NUMERIC_COLS, MID_PRICE_IDX, load_artifacts
+
+
+class StreamingPredictor:
+    """
+    单只股票的有状态实时预测器。
+
+    内部维护最近 seq_length 行已缩放特征的环形缓冲区，每来一个 bid/ask tick：
+    1. 现场计算 MidpointPrice / OrderFlowImbalance / WeightedSpread
+    2. 只对这一行做一次缩放，One-Hot 部分在构造时就写好（同一只股票不变）
+    3. 用最近 seq_length 行做一次模型预测，得到下一时刻的 MidpointPrice
+
+    特征布局、缩放和编码与 inference.preprocess_test_data 完全一致，
+    每个 tick 除了一次 model.predict 之外不分配新的数组。
+    """
+
+    def __init__(self, model, scaler, ohe, stock, seq_length=60):
+        self.model = model
+        self.scaler = scaler
+        self.stock = str(stock)
+        self.seq_length = seq_length
+
+        self.numeric_size = len(NUMERIC_COLS)
+        ohe_row = ohe.transform(np.array([[self.stock]], dtype=object))[0]
+        self.n_features = self.numeric_size + len(ohe_row)
+
+        # 双倍长度的环形缓冲：每行同时写到 pos 和 pos + seq_length，
+        # 这样最近 seq_length 行始终是一段连续内存，可以直接 reshape 成模型输入
+        self._buffer = np.zeros((2 * seq_length, self.n_features), dtype=np.float64)
+        self._buffer[:, self.numeric_size:] = ohe_row
+        self._pos = 0
+        self.n_ticks = 0
+        self._raw = np.empty(self.numeric_size, dtype=np.float64)
+
+        # MinMaxScaler 的 transform 就是 X * scale_ + min_，直接用系数避免每个 tick 的 sklearn 校验开销
+        self._scale = getattr(scaler, "scale_", None)
+        self._min = getattr(scaler, "min_", None)
+        self._clip = getattr(scaler, "clip", False)
+
+    @classmethod
+    def from_paths(cls, model_path, scaler_path, ohe_path, stock, seq_length=60):
+        model, scaler, ohe = load_artifacts(model_path, scaler_path, ohe_path)
+        return cls(model, scaler, ohe, stock, seq_length)
+
+    @property
+    def ready(self):
+        """缓冲区是否已经攒满 seq_length 行。"""
+        return self.n_ticks >= self.seq_length
+
+    def push(self, bid_volume, bid_price, ask_volume, ask_price):
+        """
+        写入一个新 tick（原始价格和挂单量），返回缓冲区是否已满。
+        """
+        raw = self._raw
+        mid = (bid_price + ask_price) / 2
+        raw[0] = bid_volume
+        raw[1] = bid_price
+        raw[2] = ask_volume
+        raw[3] = ask_price
+        raw[4] = bid_volume - ask_volume                    # OrderFlowImbalance
+        raw[5] = ((ask_price - bid_price) / mid) * 100      # WeightedSpread
+        raw[6] = mid                                        # MidpointPrice
+
+        row = self._buffer[self._pos, :self.numeric_size]
+        if self._scale is not None and self._min is not None:
+            np.multiply(raw, self._scale, out=row)
+            row += self._min
+            if self._clip:
+                np.clip(row, *self.scaler.feature_range, out=row)
+        else:
+            row[:] = self.scaler.transform(raw.reshape(1, -1))[0]
+        self._buffer[self._pos + self.seq_length, :self.numeric_size] = row
+
+        self._pos = (self._pos + 1) % self.seq_length
+        self.n_ticks += 1
+        return self.ready
+
+    def window(self):
+        """
+        最近 seq_length 行的展平视图，shape (1, seq_length * n_features)，
+        与 preprocess_test_data 中 X 的一行布局相同。
+        """
+        return self._buffer[self._pos:self._pos + self.seq_length].reshape(1, -1)
+
+    def inverse_transform_mid(self, pred_scaled):
+        """
+        把缩放后的 MidpointPrice 还原为原始价格（等价于 dummy 数组 + inverse_transform）。
+        """
+        if self._scale is not None and self._min is not None:
+            return (pred_scaled - self._min[MID_PRICE_IDX]) / self._scale[MID_PRICE_IDX]
+        dummy = np.zeros((np.size(pred_scaled), self.numeric_size))
+        dummy[:, MID_PRICE_IDX] = pred_scaled
+        return self.scaler.inverse_transform(dummy)[:, MID_PRICE_IDX]
+
+    def update(self, bid_volume, bid_price, ask_volume, ask_price):
+        """
+        写入一个 tick 并预测下一时刻的 MidpointPrice（原始价格）。
+        缓冲区未满时返回 None。
+        """
+        if not self.push(bid_volume, bid_price, ask_volume, ask_price):
+            return None
+        pred_scaled = self.model.predict(self.window())[0]
+        return float(np.ravel(self.inverse_transform_mid(pred_scaled))[0])
+
+    def reset(self):
+        """清空历史（例如换了一个交易时段）。"""
+        self._pos = 0
+        self.n_ticks = 0
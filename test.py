@@ -1,12 +1,10 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, time, timedelta
+from utils.timeparse import parse_time_ns, time_ns_to_datetime, NAT_NS
+from market_store import TimeIndex
 
 # Helper Functions
-def time_to_seconds(t: time) -> float:
-    """Convert a datetime.time object to total seconds since midnight."""
-    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1_000_000
-
 def seconds_to_time(seconds: float) -> time:
     """Convert total seconds since midnight to a datetime.time object."""
     return (datetime.min + timedelta(seconds=seconds)).time()
@@ -28,21 +26,19 @@ if uploaded_file is not None:
         
         # Check if 'timestamp' column exists
         if 'timestamp' in df.columns:
-            try:
-                # Attempt to parse 'timestamp' with fractional seconds
-                df['timestamp'] = pd.to_datetime(df['timestamp'], format='%H:%M:%S.%f').dt.time
-            except ValueError:
-                st.warning("Failed to parse 'timestamp' with format '%H:%M:%S.%f'. Attempting to parse without fractional seconds.")
-                try:
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], format='%H:%M:%S').dt.time
-                except ValueError as ve:
-                    st.error(f"Unable to parse 'timestamp' column: {ve}")
-                    st.stop()
+            # Parse 'HH:MM:SS[.ffffff]' straight from the raw strings (vectorized)
+            timestamp_ns = parse_time_ns(df['timestamp'])
+            if (timestamp_ns == NAT_NS).any():
+                st.error("Unable to parse 'timestamp' column: expected 'HH:MM:SS.ffffff' values.")
+                st.stop()
+            df['timestamp'] = pd.Series(time_ns_to_datetime(timestamp_ns), index=df.index).dt.time
             
-            # Convert to total seconds and update session state
-            df['timestamp_seconds'] = df['timestamp'].apply(time_to_seconds)
-            st.session_state.slider_min_seconds = df['timestamp_seconds'].min()
-            st.session_state.slider_max_seconds = df['timestamp_seconds'].max()
+            # Convert to total seconds and build a sorted index for range queries
+            df['timestamp_seconds'] = timestamp_ns / 1e9
+            time_index = TimeIndex(df, 'timestamp_seconds')
+            df = time_index.df
+            st.session_state.slider_min_seconds = time_index.min
+            st.session_state.slider_max_seconds = time_index.max
             
             st.success("CSV file loaded and 'timestamp' parsed successfully!")
         else:
@@ -95,6 +91,10 @@ if uploaded_file is not None and 'bidPrice' in df.columns:
         selected_max_time = seconds_to_time(selected_max)
         
         st.write(f"You selected a time range from {selected_min_time} to {selected_max_time}.")
+        
+        # Binary search on the sorted index, O(log N) per slider change
+        selected_data = time_index.slice(selected_min, selected_max)
+        st.write(f"{len(selected_data)} rows in the selected range.")
 
 # (Optional) Display the DataFrame for verification
 if uploaded_file is not None and 'timestamp_seconds' in df.columns:
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.csv_merge import merge_market_data
+
+
+@pytest.mark.parametrize("step_ms", [None, 1000])
+def test_streaming_merge_matches_in_memory(tmp_path, step_ms):
+    rng = np.random.default_rng(0)
+    stock_path = tmp_path / "A"
+    stock_path.mkdir()
+    for i in range(3):
+        # 毫秒精度，或全部为整秒（pandas 此时不写小数）；各分片之间有相同的时间戳
+        steps = rng.integers(1, 900, 2000) if step_ms is None else rng.integers(1, 3, 2000) * step_ms
+        ts = pd.Timestamp("1900-01-01 09:00") + pd.to_timedelta(np.cumsum(steps), unit="ms")
+        pd.DataFrame({
+            "bidVolume": rng.integers(1, 100, 2000), "bidPrice": rng.random(2000).round(3),
+            "askVolume": 7, "askPrice": 2.5, "timestamp": ts.strftime("%H:%M:%S.%f").str[:-3],
+        }).to_csv(stock_path / f"market_data_A_{i}.csv", index=False, header=False)
+
+    merge_market_data(str(stock_path), str(tmp_path / "memory.csv"))
+    merge_market_data(str(stock_path), str(tmp_path / "streaming.csv"), streaming=True, chunksize=300)
+    assert (tmp_path / "memory.csv").read_bytes() == (tmp_path / "streaming.csv").read_bytes()
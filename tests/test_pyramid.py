@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.pyramid import build_all_pyramids, build_pyramid
+
+
+def _write_shard(path, start, n, header):
+    ts = pd.Timestamp("1900-01-01 09:00") + pd.to_timedelta(start + np.arange(n) * 100, unit="ms")
+    pd.DataFrame({
+        "bidVolume": 1, "bidPrice": 1.0, "askVolume": 2, "askPrice": 2.0,
+        "timestamp": ts.strftime("%H:%M:%S.%f"),
+    }).to_csv(path, index=False, header=header)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_shard_with_header_row(tmp_path, streaming):
+    stock_path = tmp_path / "Period1" / "A"
+    stock_path.mkdir(parents=True)
+    _write_shard(stock_path / "market_data_A_0.csv", 0, 300, header=True)
+    _write_shard(stock_path / "market_data_A_1.csv", 30_000, 300, header=False)
+    sizes = build_pyramid(str(stock_path), fmt="csv", streaming=streaming)
+    assert sizes["1s"] == 60
+    level = pd.read_csv(stock_path / "pyramid" / "1s.csv")
+    assert level["count"].sum() == 600
+    assert (level["close"] == 1.5).all()
+
+
+def test_build_all_discovers_periods_and_stocks(tmp_path):
+    for period, stock in [("Period3", "A"), ("Period12", "F")]:
+        (tmp_path / period / stock).mkdir(parents=True)
+        _write_shard(tmp_path / period / stock / f"market_data_{stock}_0.csv", 0, 50, header=False)
+    (tmp_path / "Period12" / "empty").mkdir()
+    assert build_all_pyramids(str(tmp_path)) == []
+    assert (tmp_path / "Period3" / "A" / "pyramid").is_dir()
+    assert (tmp_path / "Period12" / "F" / "pyramid").is_dir()
+    assert not (tmp_path / "Period12" / "empty" / "pyramid").exists()
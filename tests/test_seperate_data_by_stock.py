@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from utils.seperate_data_by_stock import _partition_block, _partition_block_pandas, partition_csv
+
+HEADER = b"timestamp,stock,bidPrice,askPrice\n"
+
+
+def _rows(stocks, line_end=b"\n"):
+    return b"".join(f"09:00:{i:02d}.000,{s},{100 + i}.5,{101 + i}.25".encode() + line_end
+                    for i, s in enumerate(stocks))
+
+
+def _same_output(block, header=HEADER, key="stock"):
+    fast = _partition_block(block, header.decode().strip().split(",").index(key), len(header.split(b",")))
+    slow = _partition_block_pandas(block, header, key)
+    assert fast is not None
+    # pandas 路径按 \n 写回，比较前统一行尾
+    normalize = lambda parts: {k: (data.replace(b"\r\n", b"\n"), n) for k, (data, n) in parts.items()}
+    assert normalize(fast) == normalize(slow)
+
+
+@pytest.mark.parametrize("stocks", [
+    list("ABCDE") * 20,                              # 交错：gather 路径
+    ["A"] * 200 + ["B"] * 200 + ["C"] * 200,         # 已排序：按区间切片
+    ["LONG_STOCK_NAME_1", "S", "LONG_STOCK_NAME_22"] * 30,   # key 宽于 8 字节
+])
+@pytest.mark.parametrize("line_end", [b"\n", b"\r\n"])
+def test_fast_path_matches_pandas(stocks, line_end):
+    _same_output(_rows(stocks, line_end))
+
+
+def test_key_in_last_column_with_crlf():
+    header = b"timestamp,bidPrice,stock\r\n"
+    block = b"".join(f"09:00:{i:02d}.000,{i}.5,{s}\r\n".encode() for i, s in enumerate("ABAB" * 10))
+    _same_output(block, header)
+
+
+@pytest.mark.parametrize("bad", ["../escaped", "a/b", ""])
+def test_rejects_unsafe_partition_values(tmp_path, bad):
+    src = tmp_path / "in.csv"
+    src.write_bytes(HEADER + f"09:00:00.000,{bad},1,2\n".encode())
+    out = tmp_path / "out"
+    with pytest.raises(ValueError):
+        partition_csv(str(src), output_dir=str(out))
+    assert not (tmp_path / "escaped_stock.csv").exists()
+    assert not os.path.exists(out / "_stock.csv")
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from utils.storage import csv_to_dataset, read_table
+
+
+def test_reimport_with_different_chunksize_replaces_partitions(tmp_path):
+    src = tmp_path / "in.csv"
+    pd.DataFrame({
+        "bidVolume": [1, 2, 3, 4], "bidPrice": 1.0, "askVolume": 1, "askPrice": 2.0,
+        "timestamp": ["09:00:00.000"] * 4,
+        "period": ["Period1", "Period1", "Period2", "Period2"], "stock": ["A", "A", "B", "B"],
+    }).to_csv(src, index=False)
+    root = str(tmp_path / "ds")
+    # 第二次导入时 Period2 的分区在后面的块中才第一次出现
+    csv_to_dataset(str(src), root, chunksize=2)
+    csv_to_dataset(str(src), root, chunksize=1)
+    df = read_table(root)
+    assert len(df) == 4
+    assert sorted(df["bidVolume"]) == [1, 2, 3, 4]
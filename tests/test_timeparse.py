@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.timeparse import NAT_NS, parse_datetime_ns, parse_time_ns, to_datetime
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("09:30:00.000000", "1900-01-01 09:30:00"),
+    ("09:30:00.5", "1900-01-01 09:30:00.5"),
+    ("09:30:00", "1900-01-01 09:30:00"),
+    # 快速路径不接受、交给 pandas 的写法也必须落在 1900-01-01，而不是当天
+    ("9:30:01", "1900-01-01 09:30:01"),
+    ("09:30", "1900-01-01 09:30:00"),
+    ("12:00:00.", "1900-01-01 12:00:00"),
+    ("09:30:02 ", "1900-01-01 09:30:02"),
+    ("2024-03-01 09:30:00.25", "2024-03-01 09:30:00.25"),
+])
+def test_to_datetime(text, expected):
+    assert to_datetime(pd.Series([text]))[0] == pd.Timestamp(expected)
+
+
+def test_time_only_fallback_sorts_with_fast_path_rows():
+    ts = to_datetime(pd.Series(["09:30:00.000000", "9:30:01", "09:30:02 "]))
+    assert ts.is_monotonic_increasing
+    assert (ts.dt.normalize() == pd.Timestamp("1900-01-01")).all()
+
+
+def test_invalid_values_are_nat():
+    ns = parse_datetime_ns(np.array(["garbage", "nan", "25:00:00.000"], dtype=object))
+    assert (ns == NAT_NS).all()
+
+
+def test_parse_time_ns_matches_pandas():
+    values = ["00:00:00.000001", "09:30:01.250", "23:59:59.999999"]
+    expected = pd.to_datetime(values, format="%H:%M:%S.%f")
+    expected = (expected - expected.normalize()).to_numpy().view(np.int64)
+    assert (parse_time_ns(values) == expected).all()
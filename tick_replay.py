@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.market_data import read_market_data, list_market_data_files
+from utils.timeparse import seconds_since_midnight
+
+
+def load_replay_ticks(dataset_path, period, stock):
+    """
+    读取 {dataset_path}/Period{period}/{stock}/market_data_{stock}_*.csv，按时间排序后返回 DataFrame，
+    并附加 seconds 列（距午夜的秒数）用于控制回放节奏。
+    """
+    stock_folder = os.path.join(dataset_path, f"Period{period}", stock)
+    files = list_market_data_files(stock_folder, stock)
+    if not files:
+        return pd.DataFrame()
+    df = pd.concat([read_market_data(f) for f in files], ignore_index=True)
+    seconds = seconds_since_midnight(df["timestamp"])
+    df = df[~np.isnan(seconds)].copy()
+    df["seconds"] = seconds[~np.isnan(seconds)]
+    return df.sort_values("seconds", kind="stable").reset_index(drop=True)
+
+
+async def replay_stock(host, port, stock, ticks, speed, results):
+    """
+    用一条连接回放一只股票的 tick。发送端按时间戳节奏推送（不等待响应，便于服务端攒批），
+    接收端按 id 配对计算往返延迟。speed <= 0 表示不限速。
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    send_times = {}
+    rtts = []
+
+    async def receive():
+        while len(rtts) < len(ticks):
+            line = await reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            t_sent = send_times.pop(response.get("id"), None)
+            if t_sent is not None:
+                rtts.append(time.perf_counter() - t_sent)
+
+    receiver = asyncio.create_task(receive())
+    start_wall = time.perf_counter()
+    start_ts = ticks["seconds"].iloc[0] if len(ticks) else 0.0
+    columns = ["bidVolume", "bidPrice", "askVolume", "askPrice", "seconds"]
+    for i, (bid_volume, bid_price, ask_volume, ask_price, seconds) in enumerate(ticks[columns].itertuples(index=False)):
+        if speed > 0:
+            delay = (seconds - start_ts) / speed - (time.perf_counter() - start_wall)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        request = {
+            "id": i, "stock": stock,
+            "bidVolume": float(bid_volume), "bidPrice": float(bid_price),
+            "askVolume": float(ask_volume), "askPrice": float(ask_price),
+        }
+        send_times[i] = time.perf_counter()
+        writer.write((json.dumps(request) + "\n").encode())
+        if writer.transport.get_write_buffer_size() > 1 << 16:
+            await writer.drain()
+    await writer.drain()
+    await receiver
+    elapsed = time.perf_counter() - start_wall
+    writer.close()
+    results[stock] = {"sent": len(ticks), "received": len(rtts), "elapsed": elapsed, "rtts": rtts}
+
+
+async def fetch_server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"cmd": "stats"}\n')
+    await writer.drain()
+    line = await reader.readline()
+    writer.close()
+    return json.loads(line).get("stats")
+
+
+async def replay(host, port, dataset_path, period, stocks, speed, limit=None):
+    results = {}
+    tasks = []
+    for stock in stocks:
+        ticks = load_replay_ticks(dataset_path, period, stock)
+        if ticks.empty:
+            print(f"Period{period}/{stock} 没有可回放的数据，跳过")
+            continue
+        if limit:
+            ticks = ticks.iloc[:limit]
+        print(f">>> Replaying Period{period}/{stock}: {len(ticks)} ticks")
+        tasks.append(replay_stock(host, port, stock, ticks, speed, results))
+    await asyncio.gather(*tasks)
+
+    for stock, r in results.items():
+        rtt = np.array(r["rtts"]) * 1000
+        p50, p95, p99 = np.percentile(rtt, [50, 95, 99]) if len(rtt) else (np.nan, np.nan, np.nan)
+        print(f"{stock}: sent={r['sent']} received={r['received']} "
+              f"rate={r['sent'] / r['elapsed']:.0f} ticks/s  RTT p50={p50:.2f}ms p95={p95:.2f}ms p99={p99:.2f}ms")
+    print(f">>> Server stats: {json.dumps(await fetch_server_stats(host, port))}")
+    return results
+
+
+if __name__ == "__main__":
+    # 用法: python tick_replay.py --period 1 --stocks A B C D E --speed 10
+    parser = argparse.ArgumentParser(description="把 TrainingData 中的 market_data 文件回放给 tick_server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dataset-path", default="./TrainingData")
+    parser.add_argument("--period", type=int, default=1)
+    parser.add_argument("--stocks", nargs="+", default=["A", "B", "C", "D", "E"])
+    parser.add_argument("--speed", type=float, default=1.0)    # 1 为实时，10 为 10 倍速，0 为不限速
+    parser.add_argument("--limit", type=int, default=None)     # 每只股票最多回放多少条
+    args = parser.parse_args()
+
+    asyncio.run(replay(args.host, args.port, args.dataset_path, args.period, args.stocks, args.speed, args.limit))
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from model_registry import get_registry
+from instrumentation import StageHistogram
+
+# 协议：TCP 上逐行 JSON（每行一个请求/响应）
+#   请求: {"id": 1, "stock": "A", "bidVolume": 10, "bidPrice": 100.1, "askVolume": 5, "askPrice": 100.2}
+#   响应: {"id": 1, "stock": "A", "prediction": 100.15, "latency_ms": 1.2}   缓冲区未满时 prediction 为 null
+#   统计: {"cmd": "stats"}  ->  {"stats": {...}}
+
+
+class ServerStats:
+    """
+    记录队列深度、批大小、端到端延迟（收到请求 -> 写回响应）和每批 model.predict 的耗时。
+    分位数只基于最近 window 个样本计算。
+    """
+
+    def __init__(self, window=10000):
+        self.requests = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self.max_batch_size = 0
+        self.max_queue_depth = 0
+        self.latency = StageHistogram("end_to_end", window)
+        self.predict_time = StageHistogram("batch_predict", window)
+        self.batch_sizes = deque(maxlen=window)
+
+    def record_batch(self, size, queue_depth):
+        self.batches += 1
+        self.batched_rows += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        self.batch_sizes.append(size)
+
+    def record_latency(self, seconds):
+        self.latency.record(seconds)
+
+    def snapshot(self, queue_depths):
+        sizes = np.fromiter(self.batch_sizes, dtype=np.float64)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": float(sizes.mean()) if len(sizes) else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": queue_depths,
+            "max_queue_depth": self.max_queue_depth,
+            "latency_ms": {k: v * 1000 for k, v in self.latency.percentiles().items()},
+            "batch_predict_ms": {k: v * 1000 for k, v in self.predict_time.percentiles().items()},
+        }
+
+
+class StockBatcher:
+    """
+    单只股票（单个模型）的微批处理器。
+
+    tick 到达时立即按顺序写入该股票的 StreamingPredictor，并把当前窗口复制进队列；
+    后台任务把队列里的窗口攒成一批（最多 max_batch 条，或等待 max_wait 秒）后做一次 model.predict。
+    """
+
+    def __init__(self, predictor, max_batch, max_wait, stats):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = stats
+        self.queue = asyncio.Queue()
+        self._batch_X = np.empty((max_batch, predictor.seq_length * predictor.n_features))
+
+    def submit(self, tick):
+        """
+        写入一个 tick，返回一个 future；缓冲区未满时 future 直接完成，结果为 None。
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        ready = self.predictor.push(tick["bidVolume"], tick["bidPrice"], tick["askVolume"], tick["askPrice"])
+        if not ready:
+            future.set_result(None)
+        else:
+            self.queue.put_nowait((self.predictor.window()[0].copy(), future))
+        return future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch:
+                if not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            n = len(items)
+            self.stats.record_batch(n, self.queue.qsize() + n)
+            X = self._batch_X[:n]
+            for i, (window, _) in enumerate(items):
+                X[i] = window
+            try:
+                # xgboost 预测时会释放 GIL，放到线程池里避免阻塞事件循环
+                t_start = time.perf_counter()
+                preds = await loop.run_in_executor(None, self.predictor.model.predict, X)
+                self.stats.predict_time.record(time.perf_counter() - t_start)
+                mids = self.predictor.inverse_transform_mid(preds)
+                for (_, future), mid in zip(items, mids):
+                    if not future.done():
+                        future.set_result(float(mid))
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+class TickServer:
+    def __init__(self, registry, max_batch=64, max_wait=0.002, report_interval=5.0):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.report_interval = report_interval
+        self.stats = ServerStats()
+        self.batchers = {}
+        self._tasks = []
+
+    def batcher(self, stock):
+        batcher = self.batchers.get(stock)
+        if batcher is None:
+            batcher = StockBatcher(self.registry.predictor(stock), self.max_batch, self.max_wait, self.stats)
+            self.batchers[stock] = batcher
+            self._tasks.append(asyncio.create_task(batcher.run()))
+        return batcher
+
+    def queue_depths(self):
+        return {stock: b.queue.qsize() for stock, b in self.batchers.items()}
+
+    async def _respond(self, writer, request_id, stock, future, t_recv):
+        try:
+            prediction = await future
+            response = {"id": request_id, "stock": stock, "prediction": prediction}
+        except Exception as e:
+            response = {"id": request_id, "stock": stock, "error": str(e)}
+        latency = time.perf_counter() - t_recv
+        response["latency_ms"] = latency * 1000
+        writer.write((json.dumps(response) + "\n").encode())
+        self.stats.record_latency(latency)
+
+    async def handle_client(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                t_recv = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    writer.write((json.dumps({"error": f"invalid json: {e}"}) + "\n").encode())
+                    continue
+
+                if request.get("cmd") == "stats":
+                    stats = self.stats.snapshot(self.queue_depths())
+                    writer.write((json.dumps({"stats": stats}) + "\n").encode())
+                    continue
+
+                self.stats.requests += 1
+                stock = str(request.get("stock"))
+                try:
+                    future = self.batcher(stock).submit(request)
+                except Exception as e:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_exception(e)
+                task = asyncio.create_task(self._respond(writer, request.get("id"), stock, future, t_recv))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+            if pending:
+                await asyncio.gather(*pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print(f">>> stats: {json.dumps(self.stats.snapshot(self.queue_depths()))}")
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f">>> Tick server listening on {host}:{port}, models: {self.registry.stocks}")
+        if self.report_interval > 0:
+            self._tasks.append(asyncio.create_task(self.report_loop()))
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    # 用法: python tick_server.py --port 8765 --max-batch 64 --max-wait-ms 2
+    parser = argparse.ArgumentParser(description="OnlyTrades 实时 tick 预测服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model-root", default="saved_model")
+    parser.add_argument("--seq-length", type=int, default=60)
+    parser.add_argument("--max-batch", type=int, default=64)              # 单批最多条数
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)         # 攒批最长等待时间
+    parser.add_argument("--report-interval", type=float, default=5.0)     # 统计输出间隔（秒），0 关闭
+    parser.add_argument("--warm-up", action="store_true")                 # 启动时预加载所有模型
+    args = parser.parse_args()
+
+    registry = get_registry(args.model_root, args.seq_length)
+    if args.warm_up:
+        registry.warm_up()
+    server = TickServer(registry, args.max_batch, args.max_wait_ms / 1000, args.report_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(">>> Tick server stopped.")
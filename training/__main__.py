@@ -0,0 +1,29 @@
+import argparse
+import sys
+
+from training.train_all import train_all, STOCKS
+from training.xgb_train import NUM_BOOST_ROUND
+
+# 用法:
+#   python -m training --train featured_data --test test_data --out saved_model --workers 5
+#   python -m training --train featured_train_data.parquet --test featured_test_data.parquet --stocks A B
+# --train / --test 可以是包含 {stock}_stock.csv 的目录，也可以是包含所有股票的 CSV / Parquet 文件或数据集
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m training",
+                                     description="并行训练各只股票的 XGBoost 模型，输出到 saved_model/XGBoost{stock}/")
+    parser.add_argument("--train", required=True, help="训练数据目录或文件")
+    parser.add_argument("--test", required=True, help="验证数据目录或文件（用于早停和评估）")
+    parser.add_argument("--out", default="saved_model", help="模型输出根目录")
+    parser.add_argument("--stocks", nargs="+", default=STOCKS)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 min(CPU 核数, 股票数)")
+    parser.add_argument("--seq-length", type=int, default=60)
+    parser.add_argument("--chunk-rows", type=int, default=16384)
+    parser.add_argument("--rounds", type=int, default=NUM_BOOST_ROUND)
+    parser.add_argument("--in-memory", dest="external", action="store_false", help="使用 QuantileDMatrix 而不是外存缓存")
+    parser.add_argument("--cache-dir", default=None, help="外存缓存目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    manifest = train_all(args.train, args.test, args.out, args.stocks, args.workers, args.seq_length,
+                         args.chunk_rows, args.external, args.rounds, args.cache_dir)
+    sys.exit(1 if manifest["errors"] else 0)
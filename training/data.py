@@ -0,0 +1,86 @@
+import os
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+from inference import NUMERIC_COLS, MID_PRICE_IDX
+from utils.storage import read_table
+from utils.windowing import supervised_windows
+
+
+def read_frame(path, stock=None):
+    """
+    读取训练 / 测试数据（CSV、Parquet 文件或分区数据集），只保留数值列和 stock 列。
+    指定 stock 时只保留该股票（数据集只读取对应分区）。
+    """
+    filters = [("stock", "==", str(stock))] if stock is not None else None
+    df = read_table(path, columns=NUMERIC_COLS + ["stock"], filters=filters)
+    # 如果没有 MidpointPrice，则自行添加
+    if "MidpointPrice" not in df.columns:
+        df["MidpointPrice"] = (df["bidPrice"] + df["askPrice"]) / 2
+    df["stock"] = df["stock"].astype(str)
+    return df
+
+
+def fit_preprocessors(train_frames, test_frames=()):
+    """
+    与 notebook 一致：MinMaxScaler 只在训练数据的 NUMERIC_COLS 上拟合（逐个 frame partial_fit，不拼接），
+    OneHotEncoder 在训练 + 测试数据出现过的所有 stock 上拟合。
+    """
+    scaler = MinMaxScaler()
+    for df in train_frames:
+        scaler.partial_fit(df[NUMERIC_COLS].values)
+
+    stocks = set()
+    for df in list(train_frames) + list(test_frames):
+        stocks.update(df["stock"].astype(str).unique())
+    ohe = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+    ohe.fit(np.array(sorted(stocks), dtype=object).reshape(-1, 1))
+    return scaler, ohe
+
+
+def base_matrix(df, scaler, ohe, dtype=np.float64):
+    """
+    缩放后的数值列 + stock 的 One-Hot 编码，shape (N, 7 + onehot_dim)，C 连续。
+    窗口特征都是这个矩阵上的视图，不需要另外保存。
+    """
+    data_numeric = scaler.transform(df[NUMERIC_COLS].values)
+    ohe_feats = ohe.transform(df[['stock']].astype(str).values)
+    combined = np.empty((len(df), data_numeric.shape[1] + ohe_feats.shape[1]), dtype=dtype)
+    combined[:, :data_numeric.shape[1]] = data_numeric
+    combined[:, data_numeric.shape[1]:] = ohe_feats
+    return combined
+
+
+def load_data_for_xgb(train_path, test_path, seq_length=60, stock=None):
+    """
+    ModelTrain/XGBoost.ipynb 中 load_data_for_xgb 的移植：
+    输入是过去 seq_length 行的全部特征（展平），目标是下一行缩放后的 MidpointPrice。
+
+    X_train / X_test 是基础矩阵上的只读窗口视图，不物化 (N, seq_length * n_features) 的矩阵。
+
+    Returns:
+        X_train, y_train, X_test, y_test, scaler, ohe
+    """
+    train_df = read_frame(train_path, stock)
+    test_df = read_frame(test_path, stock)
+    scaler, ohe = fit_preprocessors([train_df], [test_df])
+    X_train, y_train = supervised_windows(base_matrix(train_df, scaler, ohe), seq_length, MID_PRICE_IDX)
+    X_test, y_test = supervised_windows(base_matrix(test_df, scaler, ohe), seq_length, MID_PRICE_IDX)
+    return X_train, y_train, X_test, y_test, scaler, ohe
+
+
+def save_artifacts(model, scaler, ohe, output_dir, stock):
+    """
+    按 saved_model/XGBoost{stock}/ 的布局保存 xgb_model_{stock}.json、scaler_{stock}.pkl、ohe_{stock}.pkl，
+    返回三个文件的路径（与 inference.load_artifacts 的参数顺序相同）。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, f"xgb_model_{stock}.json")
+    scaler_path = os.path.join(output_dir, f"scaler_{stock}.pkl")
+    ohe_path = os.path.join(output_dir, f"ohe_{stock}.pkl")
+    model.save_model(model_path)
+    joblib.dump(scaler, scaler_path)
+    joblib.dump(ohe, ohe_path)
+    return model_path, scaler_path, ohe_path
@@ -0,0 +1,298 @@
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from training.data import read_frame, fit_preprocessors, base_matrix, save_artifacts
+from training.train_all import split_threads
+from training.xgb_train import DEFAULT_PARAMS, WindowIter, evaluate
+from inference import MID_PRICE_IDX
+from utils.manifest import Manifest
+from utils.parallel import default_workers
+
+# 默认搜索空间：每个参数的候选值
+DEFAULT_SPACE = {
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1],
+    "subsample": [0.6, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 5, 10],
+}
+
+
+# ---- 特征缓存：缩放后的基础矩阵只构造一次，保存为 .npy，trial 以 memmap 方式只读打开 ----
+
+def _write_split(frames, scaler, ohe, path):
+    """把若干个 frame 的基础矩阵依次写入一个 .npy（memmap），返回各段起始行号（窗口不跨段）。"""
+    n_rows = sum(len(df) for df in frames)
+    boundaries, offset = [], 0
+    out = None
+    for df in frames:
+        block = base_matrix(df, scaler, ohe, dtype=np.float32)
+        if out is None:
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n_rows, block.shape[1]))
+        out[offset:offset + len(block)] = block
+        boundaries.append(offset)
+        offset += len(block)
+    out.flush()
+    del out
+    return boundaries
+
+
+def build_feature_cache(train_paths, test_paths, cache_dir, stock=None, seq_length=60):
+    """
+    读取训练 / 验证数据，拟合 scaler 和 ohe，把 float32 基础矩阵写入 {cache_dir}/train.npy、test.npy。
+    输入文件和参数没有变化时直接复用已有的缓存（utils.manifest 记录指纹）。
+
+    Returns:
+        meta (dict)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(cache_dir, ".manifest.json"))
+    inputs = list(train_paths) + list(test_paths)
+    params = {"train": list(train_paths), "test": list(test_paths), "stock": stock, "seq_length": seq_length}
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if manifest.is_fresh("features", inputs, params):
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    start = time.perf_counter()
+    train_frames = [read_frame(path, stock) for path in train_paths]
+    test_frames = [read_frame(path, stock) for path in test_paths]
+    scaler, ohe = fit_preprocessors(train_frames, test_frames)
+    meta = {
+        "stock": stock,
+        "seq_length": seq_length,
+        "train_boundaries": _write_split(train_frames, scaler, ohe, os.path.join(cache_dir, "train.npy")),
+        "test_boundaries": _write_split(test_frames, scaler, ohe, os.path.join(cache_dir, "test.npy")),
+    }
+    joblib.dump(scaler, os.path.join(cache_dir, "scaler.pkl"))
+    joblib.dump(ohe, os.path.join(cache_dir, "ohe.pkl"))
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    outputs = [os.path.join(cache_dir, name) for name in ("train.npy", "test.npy", "scaler.pkl", "ohe.pkl", "meta.json")]
+    manifest.record("features", inputs, params, outputs)
+    manifest.save()
+    print(f"特征缓存已写入 {cache_dir}，用时 {time.perf_counter() - start:.1f}s")
+    return meta
+
+
+def _split(array, boundaries):
+    edges = list(boundaries) + [len(array)]
+    return [array[lo:hi] for lo, hi in zip(edges[:-1], edges[1:])]
+
+
+def dmatrix_bytes(cache_dir):
+    """
+    一个 worker 中训练集 + 验证集 QuantileDMatrix 的大致内存：每个窗口特征分箱后占 1 字节，
+    即 窗口数 × seq_length × 特征数。只有基础矩阵的 memmap 在进程间共享，DMatrix 每个 worker 各有一份。
+    """
+    with open(os.path.join(cache_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    seq_length = meta["seq_length"]
+    total = 0
+    for name, boundaries in (("train.npy", meta["train_boundaries"]), ("test.npy", meta["test_boundaries"])):
+        n_rows, n_features = np.load(os.path.join(cache_dir, name), mmap_mode="r").shape
+        n_windows = sum(max(length - seq_length, 0) for length in np.diff(list(boundaries) + [n_rows]))
+        total += n_windows * seq_length * n_features
+    return total
+
+
+class _FeatureCache:
+    """
+    worker 进程内打开的特征缓存：memmap 基础矩阵和由它构造的 QuantileDMatrix，整个搜索过程中复用。
+    基础矩阵通过页缓存在进程间共享；QuantileDMatrix 是每个 worker 私有的，大小见 dmatrix_bytes。
+    """
+
+    def __init__(self, cache_dir, chunk_rows=16384, max_bin=256, nthread=None):
+        with open(os.path.join(cache_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        seq_length = self.meta["seq_length"]
+        # mmap_mode="r"：各个进程共享操作系统的页缓存，基础矩阵不复制
+        train = np.load(os.path.join(cache_dir, "train.npy"), mmap_mode="r")
+        test = np.load(os.path.join(cache_dir, "test.npy"), mmap_mode="r")
+        train_bases = _split(train, self.meta["train_boundaries"])
+        test_bases = _split(test, self.meta["test_boundaries"])
+        self.scaler = joblib.load(os.path.join(cache_dir, "scaler.pkl"))
+        self.dtrain = xgb.QuantileDMatrix(WindowIter(train_bases, seq_length, chunk_rows),
+                                          max_bin=max_bin, nthread=nthread)
+        self.dtest = xgb.QuantileDMatrix(WindowIter(test_bases, seq_length, chunk_rows),
+                                         max_bin=max_bin, ref=self.dtrain, nthread=nthread)
+        self.y_test = np.concatenate([base[seq_length:, MID_PRICE_IDX] for base in test_bases])
+
+
+_WORKER_CACHE = None
+
+
+def _init_worker(cache_dir, chunk_rows, max_bin, nthread):
+    global _WORKER_CACHE
+    _WORKER_CACHE = _FeatureCache(cache_dir, chunk_rows, max_bin, nthread)
+
+
+def run_trial(params, rounds, model=None, nthread=None):
+    """
+    在 worker 进程中训练（或在上一轮的模型上继续训练）到 rounds 棵树，返回验证集误差和模型字节。
+    """
+    start = time.perf_counter()
+    try:
+        cache = _WORKER_CACHE
+        booster = xgb.Booster(model_file=bytearray(model)) if model is not None else None
+        done = booster.num_boosted_rounds() if booster is not None else 0
+        train_params = {**DEFAULT_PARAMS, **params}
+        if nthread is not None:
+            train_params["nthread"] = nthread
+        booster = xgb.train(train_params, cache.dtrain, rounds - done, xgb_model=booster)
+        result = evaluate(booster, cache.dtest, cache.y_test, cache.scaler)
+        result["model"] = bytes(booster.save_raw())
+    except Exception as e:
+        result = {"rmse": float("inf"), "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# ---- 搜索空间 ----
+
+def grid_configs(space=DEFAULT_SPACE):
+    """搜索空间的全部组合。"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_configs(space=DEFAULT_SPACE, n_trials=27, seed=42):
+    """从全部组合中不放回地随机抽取 n_trials 个。"""
+    configs = grid_configs(space)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(configs), size=min(n_trials, len(configs)), replace=False)
+    return [configs[i] for i in sorted(picks)]
+
+
+# ---- successive halving ----
+
+def successive_halving(configs, cache_dir, min_rounds=25, max_rounds=300, eta=3, workers=None,
+                       chunk_rows=16384, max_bin=256):
+    """
+    所有配置先各训练 min_rounds 棵树，按验证集 RMSE 只保留前 1/eta，存活的配置在已有模型上继续训练到
+    eta 倍的树数，直到只剩一个配置或达到 max_rounds。被淘汰的配置不会再消耗训练时间。
+
+    worker 进程启动时各自以 memmap 方式打开特征缓存并构造一次 DMatrix，之后的 trial 都复用。
+    DMatrix 每个 worker 各有一份（约 dmatrix_bytes(cache_dir) 字节），内存紧张时减少 workers。
+    所有 trial 都失败时抛出 RuntimeError，附带各 trial 的 traceback。
+
+    Returns:
+        leaderboard (DataFrame，每个配置到达的最高一轮的结果，按轮次和 RMSE 排序), best (dict，含模型字节)
+    """
+    workers = min(workers or default_workers(), len(configs))
+    nthread = split_threads(workers)
+    init_args = (cache_dir, chunk_rows, max_bin, nthread)
+    print(f"{workers} 个 worker，每个 worker 的 DMatrix 约 {dmatrix_bytes(cache_dir) / 1024 ** 2:.0f} MB")
+
+    survivors = [(trial, params, None) for trial, params in enumerate(configs)]
+    latest = {}
+    rounds, rung = min_rounds, 0
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init_args) if workers > 1 else None
+    if executor is None:
+        _init_worker(*init_args)
+    try:
+        while True:
+            units = [(params, rounds, model, nthread) for _, params, model in survivors]
+            if executor is None:
+                results = [run_trial(*unit) for unit in units]
+            else:
+                results = [future.result() for future in [executor.submit(run_trial, *unit) for unit in units]]
+
+            ranked = []
+            for (trial, params, _), result in zip(survivors, results):
+                latest[trial] = {"trial": trial, "rung": rung, "rounds": rounds, **params, **result}
+                if "error" in result:
+                    print(f"trial {trial} 失败: {result['error']}")
+                ranked.append((result["rmse"], trial, params, result.get("model")))
+            ranked.sort(key=lambda item: (item[0], item[1]))
+            print(f"rung {rung}: {len(survivors)} 个配置 × {rounds} 棵树，最佳 RMSE {ranked[0][0]:.6f}")
+
+            if rounds >= max_rounds or len(ranked) <= 1:
+                break
+            keep = max(1, len(ranked) // eta)
+            survivors = [(trial, params, model) for _, trial, params, model in ranked[:keep] if model is not None]
+            if not survivors:
+                break
+            rounds, rung = min(rounds * eta, max_rounds), rung + 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    leaderboard = pd.DataFrame(latest.values())
+    leaderboard = leaderboard.sort_values(["rung", "rmse", "trial"], ascending=[False, True, True]).reset_index(drop=True)
+    succeeded = leaderboard["model"].notna() if "model" in leaderboard.columns else pd.Series(False, leaderboard.index)
+    if not succeeded.any():
+        details = "\n".join(f"trial {row.trial} ({row.error}):\n{row.traceback}" for row in leaderboard.itertuples())
+        raise RuntimeError(f"全部 {len(leaderboard)} 个 trial 都失败了:\n{details}")
+    # 最高一轮的 trial 都失败时，取之前轮次中成功的最好结果
+    best = leaderboard[succeeded].iloc[0].to_dict()
+    leaderboard = leaderboard.drop(columns=[c for c in ("model", "traceback") if c in leaderboard.columns])
+    return leaderboard, best
+
+
+def search(train_paths, test_paths, output_dir, stock=None, mode="random", space=DEFAULT_SPACE, n_trials=27,
+           min_rounds=25, max_rounds=300, eta=3, workers=None, cache_dir=None, seq_length=60, seed=42):
+    """
+    完整的搜索流程：构造（或复用）特征缓存 → 生成配置 → successive halving →
+    在 output_dir 下保存 leaderboard.csv、best_params.json 和最佳模型（xgb_model/scaler/ohe，与 saved_model 布局相同）。
+
+    Returns:
+        leaderboard, best_params
+    """
+    cache_dir = cache_dir or os.path.join(output_dir, "feature_cache")
+    build_feature_cache(train_paths, test_paths, cache_dir, stock, seq_length)
+    configs = grid_configs(space) if mode == "grid" else random_configs(space, n_trials, seed)
+
+    start = time.perf_counter()
+    leaderboard, best = successive_halving(configs, cache_dir, min_rounds, max_rounds, eta, workers)
+    elapsed = time.perf_counter() - start
+
+    best_params = {k: best[k] for k in space}
+    os.makedirs(output_dir, exist_ok=True)
+    leaderboard.to_csv(os.path.join(output_dir, "leaderboard.csv"), index=False)
+    with open(os.path.join(output_dir, "best_params.json"), "w", encoding="utf-8") as f:
+        json.dump({"params": best_params, "rounds": int(best["rounds"]), "rmse": best["rmse"],
+                   "mae": best["mae"], "trials": len(configs), "seconds": elapsed}, f, indent=2)
+
+    booster = xgb.Booster(model_file=bytearray(best["model"]))
+    scaler = joblib.load(os.path.join(cache_dir, "scaler.pkl"))
+    ohe = joblib.load(os.path.join(cache_dir, "ohe.pkl"))
+    save_artifacts(booster, scaler, ohe, output_dir, stock)
+    print(f"搜索完成：{len(configs)} 个配置，用时 {elapsed:.1f}s，最佳 RMSE {best['rmse']:.6f}，参数 {best_params}")
+    return leaderboard, best_params
+
+
+if __name__ == "__main__":
+    # 用法: python -m training.search --train featured_data/A_stock.csv --test test_data/A_stock.csv --stock A --out search/A
+    import argparse
+
+    parser = argparse.ArgumentParser(description="XGBoost 超参数搜索（grid / random + successive halving）")
+    parser.add_argument("--train", nargs="+", required=True)
+    parser.add_argument("--test", nargs="+", required=True)
+    parser.add_argument("--stock", required=True)
+    parser.add_argument("--out", required=True, help="leaderboard 和最佳模型的输出目录")
+    parser.add_argument("--mode", choices=["random", "grid"], default="random")
+    parser.add_argument("--trials", type=int, default=27, help="random 模式下的配置数")
+    parser.add_argument("--min-rounds", type=int, default=25)
+    parser.add_argument("--max-rounds", type=int, default=300)
+    parser.add_argument("--eta", type=int, default=3, help="每一轮只保留前 1/eta 的配置")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None, help="特征缓存目录，默认 {out}/feature_cache")
+    parser.add_argument("--seq-length", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    leaderboard, _ = search(args.train, args.test, args.out, args.stock, args.mode, DEFAULT_SPACE, args.trials,
+                            args.min_rounds, args.max_rounds, args.eta, args.workers, args.cache_dir,
+                            args.seq_length, args.seed)
+    print(leaderboard.head(10).to_string(index=False))
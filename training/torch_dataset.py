@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.preprocessing import MinMaxScaler
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
+
+from inference import NUMERIC_COLS, MID_PRICE_IDX
+
+
+def window_starts(n_rows, seq_length, pred_length, boundaries=()):
+    """
+    所有合法窗口的起点：窗口 [s, s + seq_length + pred_length) 不能越过数据末尾，也不能跨越 boundaries
+    （新分段开始的行号，例如不同 Period 拼接的位置）。
+    """
+    span = seq_length + pred_length
+    edges = [0] + sorted(b for b in boundaries if 0 < b < n_rows) + [n_rows]
+    starts = [np.arange(lo, hi - span + 1) for lo, hi in zip(edges[:-1], edges[1:]) if hi - lo >= span]
+    return np.concatenate(starts).astype(np.int64) if starts else np.empty(0, dtype=np.int64)
+
+
+class WindowDataset(Dataset):
+    """
+    LSTM / Transformer 训练用的惰性滑动窗口数据集，与 notebook 中的 create_sequences 一致：
+      X[i] = data[s : s + seq_length]                                      (seq_length, n_features)
+      Y[i] = data[s + seq_length : s + seq_length + pred_length, target_idx]  (pred_length, 1)
+
+    整个数据只保存一份 float32 连续张量（放在共享内存中，多进程 DataLoader 的 worker 直接读取，不复制），
+    每一行不再被复制 seq_length 次。按单个下标取样本时返回视图；按一组下标取时一次 gather 出整个 batch，
+    配合 make_loader 使用（BatchSampler 直接把一个 batch 的下标交给 __getitem__）。
+    """
+
+    def __init__(self, data, seq_length=60, pred_length=10, target_idx=MID_PRICE_IDX, boundaries=()):
+        self.data = torch.from_numpy(np.ascontiguousarray(data, dtype=np.float32)).share_memory_()
+        self.target = self.data[:, target_idx]
+        self.seq_length = seq_length
+        self.pred_length = pred_length
+        self.starts = torch.from_numpy(window_starts(len(self.data), seq_length, pred_length, boundaries))
+        self._x_offsets = torch.arange(seq_length)
+        self._y_offsets = torch.arange(seq_length, seq_length + pred_length)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            s = int(self.starts[index])
+            x = self.data[s:s + self.seq_length]
+            y = self.target[s + self.seq_length:s + self.seq_length + self.pred_length].unsqueeze(-1)
+            return x, y
+        starts = self.starts[torch.as_tensor(index, dtype=torch.int64)].unsqueeze(1)
+        x = self.data[starts + self._x_offsets]                   # (batch, seq_length, n_features)
+        y = self.target[starts + self._y_offsets].unsqueeze(-1)   # (batch, pred_length, 1)
+        return x, y
+
+
+def make_loader(dataset, batch_size=32, shuffle=False, num_workers=0, pin_memory=None, drop_last=False):
+    """
+    按 batch 取数的 DataLoader：sampler 产生整批下标，数据集一次 gather 出整批张量，不走逐样本 collate。
+    pin_memory 默认在有 CUDA 时开启。
+    """
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size, drop_last),
+        batch_size=None,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        persistent_workers=num_workers > 0,
+    )
+
+
+def map_categories(df, col_name):
+    """
+    将 col_name 列的类别值映射为整数 ID，从 1 开始编号，0 留给测试集中未见过的类别。
+    返回 (mapped_series, cat2id)。
+    """
+    cat2id = {cat: i + 1 for i, cat in enumerate(df[col_name].unique().tolist())}
+    return df[col_name].map(cat2id).fillna(0).astype(np.int64), cat2id
+
+
+def load_data(train_path, test_path, seq_length=60, pred_length=10, batch_size=32, num_workers=0, pin_memory=None):
+    """
+    ModelTrain/OnlyTrades.ipynb 中 load_data 的移植：数值列 MinMax 缩放后拼接 stock_id、period_id，
+    用 WindowDataset 代替 TensorDataset（不再物化 (N, seq_length, n_features) 的数组）。
+
+    Returns:
+        train_loader, test_loader, scaler, test_dataset, numeric_size, stock_vocab_size, period_vocab_size
+    """
+    train_df = pd.read_csv(train_path)
+    test_df = pd.read_csv(test_path)
+    for df in (train_df, test_df):
+        if "MidpointPrice" not in df.columns:
+            df["MidpointPrice"] = (df["bidPrice"] + df["askPrice"]) / 2
+
+    # stock、period 转为 ID，未见类别 => 0
+    train_df["stock_id"], stock2id = map_categories(train_df, "stock")
+    test_df["stock_id"] = test_df["stock"].map(stock2id).fillna(0).astype(np.int64)
+    train_df["period_id"], period2id = map_categories(train_df, "period")
+    test_df["period_id"] = test_df["period"].map(period2id).fillna(0).astype(np.int64)
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaler.fit(train_df[NUMERIC_COLS].values)
+
+    def combine(df):
+        combined = np.empty((len(df), len(NUMERIC_COLS) + 2), dtype=np.float32)
+        combined[:, :len(NUMERIC_COLS)] = scaler.transform(df[NUMERIC_COLS].values)
+        combined[:, len(NUMERIC_COLS)] = df["stock_id"].values
+        combined[:, len(NUMERIC_COLS) + 1] = df["period_id"].values
+        return combined
+
+    train_dataset = WindowDataset(combine(train_df), seq_length, pred_length)
+    test_dataset = WindowDataset(combine(test_df), seq_length, pred_length)
+    train_loader = make_loader(train_dataset, batch_size, shuffle=True, num_workers=num_workers, pin_memory=pin_memory)
+    test_loader = make_loader(test_dataset, batch_size, shuffle=False, num_workers=num_workers, pin_memory=pin_memory)
+    return (train_loader, test_loader, scaler, test_dataset,
+            len(NUMERIC_COLS), len(stock2id) + 1, len(period2id) + 1)
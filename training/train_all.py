@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+from training.data import save_artifacts
+from training.xgb_train import train_out_of_core, NUM_BOOST_ROUND
+from utils.parallel import run_units, report_errors, default_workers
+
+STOCKS = ["A", "B", "C", "D", "E"]
+MANIFEST_NAME = "train_manifest.json"
+
+
+def stock_path(path, stock):
+    """
+    path 是目录且其中有 {stock}_stock.csv（seperate_data_by_stock 的输出）时使用该文件，
+    否则把 path 当作包含所有股票的文件 / 数据集，读取时按 stock 过滤。
+    """
+    candidate = os.path.join(path, f"{stock}_stock.csv")
+    return candidate if os.path.isdir(path) and os.path.exists(candidate) else path
+
+
+def split_threads(workers, cpus=None):
+    """每个 worker 分到的 xgboost nthread，总线程数不超过 CPU 核数。"""
+    cpus = cpus or default_workers()
+    return max(1, cpus // max(1, workers))
+
+
+def train_stock(stock, train_path, test_path, output_root, nthread, seq_length=60, chunk_rows=16384,
+                external=True, num_boost_round=NUM_BOOST_ROUND, cache_dir=None):
+    """
+    训练一只股票并保存到 {output_root}/XGBoost{stock}/。
+    先写到临时目录，三个文件都写完后再替换，训练失败时不会留下不完整的模型目录。
+    """
+    start = time.perf_counter()
+    booster, scaler, ohe, report = train_out_of_core(
+        [stock_path(train_path, stock)], [stock_path(test_path, stock)], stock,
+        seq_length=seq_length, chunk_rows=chunk_rows, external=external,
+        cache_dir=os.path.join(cache_dir, stock) if cache_dir else None,
+        num_boost_round=num_boost_round, nthread=nthread, verbose_eval=False,
+    )
+    model_dir = os.path.join(output_root, f"XGBoost{stock}")
+    tmp_dir = os.path.join(output_root, f".XGBoost{stock}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_paths = save_artifacts(booster, scaler, ohe, tmp_dir, stock)
+    os.makedirs(model_dir, exist_ok=True)
+    paths = []
+    for tmp in tmp_paths:
+        path = os.path.join(model_dir, os.path.basename(tmp))
+        os.replace(tmp, path)
+        paths.append(path)
+    os.rmdir(tmp_dir)
+
+    report["nthread"] = nthread
+    report["paths"] = paths
+    report["seconds"] = time.perf_counter() - start
+    print(f"{stock}: {report['seconds']:.1f}s, best_iteration={report['best_iteration']}, test={report['test']}")
+    return report
+
+
+def _input_size(path):
+    return os.path.getsize(path) if os.path.isfile(path) else 0
+
+
+def train_all(train_path, test_path, output_root="saved_model", stocks=STOCKS, workers=None, seq_length=60,
+              chunk_rows=16384, external=True, num_boost_round=NUM_BOOST_ROUND, cache_dir=None):
+    """
+    在进程池中同时训练多只股票的模型，CPU 核数平均分给各个 worker（xgboost nthread），
+    总耗时约等于最慢的那只股票。数据量大的股票先提交，worker 少于股票数时也能尽量均衡。
+
+    运行记录（参数、每只股票的耗时/样本数/峰值内存/误差、失败信息）写入 {output_root}/train_manifest.json。
+
+    Returns:
+        manifest (dict)
+    """
+    workers = min(workers or default_workers(), len(stocks))
+    nthread = split_threads(workers)
+    order = sorted(stocks, key=lambda s: _input_size(stock_path(train_path, s)), reverse=True)
+    units = [(stock, train_path, test_path, output_root, nthread, seq_length, chunk_rows,
+              external, num_boost_round, cache_dir) for stock in order]
+
+    started = datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+    results, errors = run_units(train_stock, units, workers)
+    elapsed = time.perf_counter() - start
+    report_errors(errors)
+
+    manifest = {
+        "started": started,
+        "seconds": elapsed,
+        "workers": workers,
+        "nthread": nthread,
+        "cpus": default_workers(),
+        "train": train_path,
+        "test": test_path,
+        "seq_length": seq_length,
+        "num_boost_round": num_boost_round,
+        "external": external,
+        "stocks": {stock: result for stock, result in zip(order, results) if result is not None},
+        "errors": [{"stock": e["unit"][0], "error": e["error"]} for e in errors],
+    }
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = os.path.join(output_root, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+    slowest = max((r["seconds"] for r in manifest["stocks"].values()), default=0.0)
+    print(f"共训练 {len(manifest['stocks'])} 只股票，用时 {elapsed:.1f}s（最慢的单只股票 {slowest:.1f}s），"
+          f"记录已保存到 {manifest_path}")
+    return manifest
@@ -0,0 +1,194 @@
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import mean_squared_error, mean_absolute_error
+
+from inference import MID_PRICE_IDX, inverse_transform_mid
+from training.data import read_frame, fit_preprocessors, base_matrix, save_artifacts
+from utils.windowing import supervised_windows
+
+# 与 ModelTrain/XGBoost.ipynb 中 train_xgboost_regressor 相同的参数
+DEFAULT_PARAMS = {
+    "objective": "reg:squarederror",
+    "tree_method": "hist",
+    "max_depth": 6,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "seed": 42,
+    "eval_metric": "rmse",
+}
+NUM_BOOST_ROUND = 300
+EARLY_STOPPING_ROUNDS = 20
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，是整个进程到目前为止的峰值
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class WindowIter(xgb.DataIter):
+    """
+    把一个或多个基础矩阵（base_matrix 的结果）上的单步预测窗口按块交给 xgboost。
+
+    每次只把 chunk_rows 个窗口复制成连续数组，xgboost 读完这一块后就可以释放，
+    完整的 (N, seq_length * n_features) 设计矩阵始终不会出现在内存中。
+    多个基础矩阵之间的窗口不会跨越边界（例如不同的 Period 或股票）。
+    """
+
+    def __init__(self, bases, seq_length=60, chunk_rows=16384, target_idx=MID_PRICE_IDX, cache_prefix=None,
+                 min_cache_page_bytes=None):
+        super().__init__(cache_prefix=cache_prefix, release_data=True, min_cache_page_bytes=min_cache_page_bytes)
+        self.bases = bases
+        self.seq_length = seq_length
+        self.target_idx = target_idx
+        self._chunks = []
+        for i, base in enumerate(bases):
+            n_samples = max(len(base) - seq_length, 0)
+            self._chunks.extend((i, lo, min(lo + chunk_rows, n_samples)) for lo in range(0, n_samples, chunk_rows))
+        self._pos = 0
+
+    @property
+    def n_samples(self):
+        return sum(hi - lo for _, lo, hi in self._chunks)
+
+    def next(self, input_data):
+        if self._pos >= len(self._chunks):
+            return False
+        i, lo, hi = self._chunks[self._pos]
+        X, y = supervised_windows(self.bases[i], self.seq_length, self.target_idx)
+        input_data(data=np.ascontiguousarray(X[lo:hi]), label=np.ascontiguousarray(y[lo:hi]))
+        self._pos += 1
+        return True
+
+    def reset(self):
+        self._pos = 0
+
+
+def make_dmatrix(bases, seq_length=60, chunk_rows=16384, external=False, cache_dir=None,
+                 max_bin=256, ref=None, nthread=None):
+    """
+    external=False: QuantileDMatrix，按块读入后只保存分箱后的特征（每个值 1 字节）。
+    external=True:  ExtMemQuantileDMatrix，分箱后的页写到 cache_dir 下，内存占用与样本数基本无关。
+    验证集传入 ref=训练集，使用相同的分箱边界。
+    """
+    if external:
+        cache_dir = cache_dir or tempfile.mkdtemp(prefix="xgb_cache_")
+        os.makedirs(cache_dir, exist_ok=True)
+        it = WindowIter(bases, seq_length, chunk_rows, cache_prefix=os.path.join(cache_dir, "cache"))
+        return xgb.ExtMemQuantileDMatrix(it, max_bin=max_bin, ref=ref, nthread=nthread)
+    it = WindowIter(bases, seq_length, chunk_rows)
+    return xgb.QuantileDMatrix(it, max_bin=max_bin, ref=ref, nthread=nthread)
+
+
+def evaluate(booster, dmatrix, y_scaled, scaler):
+    """在原始价格上计算 MSE / RMSE / MAE。早停过的模型只用到 best_iteration 为止的树。"""
+    try:
+        iteration_range = (0, booster.best_iteration + 1)
+    except AttributeError:
+        iteration_range = (0, 0)
+    y_pred = inverse_transform_mid(scaler, booster.predict(dmatrix, iteration_range=iteration_range))
+    y_true = inverse_transform_mid(scaler, y_scaled)
+    mse = mean_squared_error(y_true, y_pred)
+    return {"mse": float(mse), "rmse": float(np.sqrt(mse)), "mae": float(mean_absolute_error(y_true, y_pred))}
+
+
+def _targets(bases, seq_length):
+    return np.concatenate([base[seq_length:, MID_PRICE_IDX] for base in bases]) if bases else np.empty(0)
+
+
+def train_out_of_core(train_paths, test_paths, stock=None, seq_length=60, chunk_rows=16384, external=True,
+                      cache_dir=None, params=None, num_boost_round=NUM_BOOST_ROUND,
+                      early_stopping_rounds=EARLY_STOPPING_ROUNDS, nthread=None, verbose_eval=True):
+    """
+    不物化设计矩阵的 XGBoost 训练流程：
+    1. 读取每个训练 / 测试文件，拟合 scaler 和 ohe，转成 float32 基础矩阵（每个文件一个，窗口不跨文件）
+    2. 用 WindowIter 按块构造训练集和验证集的 QuantileDMatrix / ExtMemQuantileDMatrix
+    3. xgb.train，验证集上早停
+
+    外存缓存默认放在临时目录，训练结束后删除。
+
+    Returns:
+        booster, scaler, ohe, report（各阶段耗时、样本数、峰值内存和验证集误差）
+    """
+    tmp_cache = None
+    if external and cache_dir is None:
+        cache_dir = tmp_cache = tempfile.mkdtemp(prefix="xgb_cache_")
+    try:
+        return _train_out_of_core(train_paths, test_paths, stock, seq_length, chunk_rows, external, cache_dir,
+                                  params, num_boost_round, early_stopping_rounds, nthread, verbose_eval)
+    finally:
+        if tmp_cache is not None:
+            shutil.rmtree(tmp_cache, ignore_errors=True)
+
+
+def _train_out_of_core(train_paths, test_paths, stock, seq_length, chunk_rows, external, cache_dir,
+                       params, num_boost_round, early_stopping_rounds, nthread, verbose_eval):
+    report = {"stock": stock, "external": external}
+    start = time.perf_counter()
+    train_frames = [read_frame(path, stock) for path in train_paths]
+    test_frames = [read_frame(path, stock) for path in test_paths]
+    scaler, ohe = fit_preprocessors(train_frames, test_frames)
+    train_bases = [base_matrix(df, scaler, ohe, dtype=np.float32) for df in train_frames]
+    test_bases = [base_matrix(df, scaler, ohe, dtype=np.float32) for df in test_frames]
+    del train_frames, test_frames
+    report["load_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dtrain = make_dmatrix(train_bases, seq_length, chunk_rows, external, cache_dir, nthread=nthread)
+    dtest = make_dmatrix(test_bases, seq_length, chunk_rows, external, cache_dir, ref=dtrain, nthread=nthread)
+    report["n_train"] = dtrain.num_row()
+    report["n_test"] = dtest.num_row()
+    report["n_features"] = dtrain.num_col()
+    report["dmatrix_seconds"] = time.perf_counter() - start
+    report["peak_rss_mb_after_dmatrix"] = peak_rss_mb()
+
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    if nthread is not None:
+        params["nthread"] = nthread
+    start = time.perf_counter()
+    booster = xgb.train(
+        params, dtrain, num_boost_round,
+        evals=[(dtest, "test")],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=verbose_eval,
+    )
+    report["train_seconds"] = time.perf_counter() - start
+    report["best_iteration"] = int(booster.best_iteration)
+    report["test"] = evaluate(booster, dtest, _targets(test_bases, seq_length), scaler)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return booster, scaler, ohe, report
+
+
+if __name__ == "__main__":
+    # 用法: python -m training.xgb_train --train featured_data/D_stock.csv --test test_data/D_stock.csv --stock D --out-dir saved_model/XGBoostD
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="用数据迭代器训练 XGBoost（不在内存中构造完整的窗口特征矩阵）")
+    parser.add_argument("--train", nargs="+", required=True, help="训练数据文件（CSV / Parquet / 分区数据集），可以多个")
+    parser.add_argument("--test", nargs="+", required=True, help="验证数据文件，用于早停和评估")
+    parser.add_argument("--stock", default=None, help="只使用这只股票的数据")
+    parser.add_argument("--seq-length", type=int, default=60)
+    parser.add_argument("--chunk-rows", type=int, default=16384)
+    parser.add_argument("--in-memory", dest="external", action="store_false", help="使用 QuantileDMatrix 而不是外存缓存")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--rounds", type=int, default=NUM_BOOST_ROUND)
+    parser.add_argument("--nthread", type=int, default=None)
+    parser.add_argument("--out-dir", default=None, help="保存 xgb_model/scaler/ohe 的目录，例如 saved_model/XGBoostD")
+    args = parser.parse_args()
+    if args.out_dir and args.stock is None:
+        parser.error("保存模型时需要指定 --stock（文件名为 xgb_model_{stock}.json）")
+
+    booster, scaler, ohe, report = train_out_of_core(
+        args.train, args.test, args.stock, args.seq_length, args.chunk_rows, args.external,
+        args.cache_dir, num_boost_round=args.rounds, nthread=args.nthread,
+    )
+    if args.out_dir:
+        save_artifacts(booster, scaler, ohe, args.out_dir, args.stock)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,108 @@
+import numpy as np
+
+# 默认按图表约 1200 像素宽度取点；点数超过阈值时改用 WebGL 渲染
+DEFAULT_WIDTH_PX = 1200
+WEBGL_THRESHOLD = 2000
+
+
+def _as_numeric(x):
+    """datetime64 转成 int64 纳秒，便于按时间等宽分桶。"""
+    x = np.asarray(x)
+    if x.dtype.kind == "M":
+        return x.astype("datetime64[ns]").view(np.int64)
+    return x.astype(np.float64)
+
+
+def minmax_indices(x, y, n_buckets):
+    """
+    把 x 轴（已排序）等宽分成 n_buckets 个桶，每个桶保留第一个、最后一个、最小值和最大值所在的点。
+    每个像素列画出的竖线范围与原始数据相同，峰值和尖刺不会丢失。
+
+    Returns:
+        升序的行号数组
+    """
+    xs = _as_numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= 4 * n_buckets:
+        return valid
+    xs, yv = xs[valid], y[valid]
+
+    span = xs[-1] - xs[0]
+    if span <= 0:
+        bucket = (np.arange(len(xs)) * n_buckets // len(xs))
+    else:
+        bucket = np.minimum(((xs - xs[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(xs)] - 1
+
+    # 每个桶内第一个等于桶最小值 / 最大值的位置
+    bucket_min = np.minimum.reduceat(yv, starts)
+    bucket_max = np.maximum.reduceat(yv, starts)
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(xs)]))
+    is_min = np.flatnonzero(yv == bucket_min[seg])
+    is_max = np.flatnonzero(yv == bucket_max[seg])
+    argmin = is_min[np.r_[True, seg[is_min][1:] != seg[is_min][:-1]]]
+    argmax = is_max[np.r_[True, seg[is_max][1:] != seg[is_max][:-1]]]
+
+    keep = np.unique(np.concatenate([starts, ends, argmin, argmax]))
+    return valid[keep]
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets：保留 n_out 个点，使相邻所选点构成的三角形面积最大，
+    折线形状最接近原始曲线。桶之间有依赖，只能逐桶循环，桶内计算是向量化的。
+
+    Returns:
+        升序的行号数组
+    """
+    xs = _as_numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if n_out >= n or n_out < 3:
+        return valid
+    xs = (xs[valid] - xs[valid][0]).astype(np.float64)
+    yv = y[valid]
+
+    # 第一个和最后一个点固定，中间 n_out - 2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一个桶的平均点（最后一个桶用最后一个点）
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = xs[nlo:nhi].mean(), yv[nlo:nhi].mean()
+        area = np.abs(
+            (xs[prev] - avg_x) * (yv[lo:hi] - yv[prev])
+            - (xs[prev] - xs[lo:hi]) * (avg_y - yv[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return valid[selected]
+
+
+def lod_indices(x, y, width_px=DEFAULT_WIDTH_PX, method="minmax"):
+    """
+    按图表像素宽度选择要画的点。时间范围越窄，每个桶里的原始点越少，细节自动变多，
+    直到不需要降采样时返回全部点。
+    """
+    if method == "lttb":
+        return lttb_indices(x, y, 2 * width_px)
+    return minmax_indices(x, y, width_px)
+
+
+def lod_trace(x, y, name, width_px=DEFAULT_WIDTH_PX, method="minmax", webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    """
+    返回降采样后的 plotly 折线 trace；降采样后点数仍然很多时使用 Scattergl（WebGL）。
+    """
+    import plotly.graph_objects as go
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    idx = lod_indices(x, y, width_px=width_px, method=method)
+    trace_cls = go.Scattergl if len(idx) > webgl_threshold else go.Scatter
+    return trace_cls(x=x[idx], y=y[idx], mode="lines", name=name, **kwargs)
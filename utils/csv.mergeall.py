@@ -1,45 +1,67 @@
 import os
+import sys
 import pandas as pd
 from natsort import natsorted  # 引入自然排序库
 
-def process_stock_data(stock_folder, stock_name):
+# 文件名带点，只能作为脚本运行，需要手动把仓库根目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.parallel import run_units, report_errors
+from utils.kway_merge import iter_merged_chunks
+from utils.timeparse import to_datetime
+
+def merge_stock_data(stock_folder, stock_name, streaming=False):
     """
-    合并一个股票文件夹中的所有 market_data，并基于 timestamp 合并。
+    合并一个股票文件夹中的所有 market_data，按 timestamp 排序，出错时直接抛出异常。
+    streaming=True 时对已排序的分片做 k 路归并，代替整体排序。
     """
-    try:
-        # 动态生成 market_data 文件路径
-        market_data_files = [
-            os.path.join(stock_folder, f) for f in os.listdir(stock_folder) if f.startswith(f'market_data_{stock_name}_')
-        ]
-
-        # 检查 market_data 文件是否存在
-        if not market_data_files:
-            print(f"No market data files in {stock_folder} for {stock_name}, skipping.")
-            return pd.DataFrame()
-
-        # 读取并合并所有 market_data
-        market_data_list = []
-        for file_path in market_data_files:
-            market_data = pd.read_csv(file_path, header=None)
-            if 'timestamp' not in market_data.columns and len(market_data.columns) == 5:
-                # 设置 market_data 的默认列名
-                market_data.columns = ['bidVolume', 'bidPrice', 'askVolume', 'askPrice', 'timestamp']
-            # 保持为 datetime64，但只保留时间部分
-            market_data['timestamp'] = pd.to_datetime(market_data['timestamp'], format='%H:%M:%S.%f', errors='coerce')
-            market_data.dropna(subset=['timestamp'], inplace=True)
-            market_data_list.append(market_data)
-
-        combined_market_data = pd.concat(market_data_list, ignore_index=True)
-        combined_market_data.sort_values('timestamp', inplace=True)
-
-        return combined_market_data
-    except Exception as e:
-        print(f"Error processing {stock_folder}: {e}")
+    # 动态生成 market_data 文件路径
+    market_data_files = [
+        os.path.join(stock_folder, f) for f in natsorted(os.listdir(stock_folder)) if f.startswith(f'market_data_{stock_name}_')
+    ]
+
+    # 检查 market_data 文件是否存在
+    if not market_data_files:
+        print(f"No market data files in {stock_folder} for {stock_name}, skipping.")
         return pd.DataFrame()
 
+    if streaming:
+        return pd.concat(iter_merged_chunks(market_data_files), ignore_index=True)
+
+    # 读取并合并所有 market_data
+    market_data_list = []
+    for file_path in market_data_files:
+        market_data = pd.read_csv(file_path, header=None)
+        if 'timestamp' not in market_data.columns and len(market_data.columns) == 5:
+            # 设置 market_data 的默认列名
+            market_data.columns = ['bidVolume', 'bidPrice', 'askVolume', 'askPrice', 'timestamp']
+        # 保持为 datetime64，但只保留时间部分
+        market_data['timestamp'] = to_datetime(market_data['timestamp'])
+        market_data.dropna(subset=['timestamp'], inplace=True)
+        market_data_list.append(market_data)
+
+    combined_market_data = pd.concat(market_data_list, ignore_index=True)
+    combined_market_data.sort_values('timestamp', inplace=True)
 
-def process_all_data(base_path):
-    all_data = []
+    return combined_market_data
+
+
+def process_unit(stock_path, period_folder, stock_folder, streaming=False):
+    """
+    处理一个 (Period, Stock) 单元，附加 period 和 stock 列。
+    """
+    merged_stock_data = merge_stock_data(stock_path, stock_folder, streaming)
+    if not merged_stock_data.empty:
+        merged_stock_data['period'] = period_folder
+        merged_stock_data['stock'] = stock_folder
+    return merged_stock_data
+
+
+def process_all_data(base_path, workers=1, streaming=False):
+    """
+    合并所有 Period × Stock 的数据。各单元相互独立，workers > 1 时在进程池中并行处理，
+    结果仍按自然排序后的 Period、Stock 顺序拼接，与串行结果一致。
+    """
+    units = []
     stock_names = ['A', 'B', 'C', 'D', 'E']
 
     # 使用 natsorted 进行自然排序
@@ -51,11 +73,11 @@ def process_all_data(base_path):
                 stock_path = os.path.join(period_path, stock_folder)
                 if os.path.isdir(stock_path) and stock_folder in stock_names:
                     print(f"  Processing stock folder: {stock_folder}")
-                    merged_stock_data = process_stock_data(stock_path, stock_folder)
-                    if not merged_stock_data.empty:
-                        merged_stock_data['period'] = period_folder
-                        merged_stock_data['stock'] = stock_folder
-                        all_data.append(merged_stock_data)
+                    units.append((stock_path, period_folder, stock_folder, streaming))
+
+    results, errors = run_units(process_unit, units, workers)
+    report_errors(errors)
+    all_data = [df for df in results if df is not None and not df.empty]
 
     if all_data:
         return pd.concat(all_data, ignore_index=True)
@@ -64,15 +86,22 @@ def process_all_data(base_path):
         return pd.DataFrame()
 
 
-# 基础路径
-base_path = 'TestData'  # 替换为实际的根路径
+if __name__ == "__main__":
+    # 用法: python utils/csv.mergeall.py [base_path] [--workers N]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="合并所有 Period × Stock 的 market_data")
+    parser.add_argument("base_path", nargs="?", default="TestData")  # 基础路径，替换为实际的根路径
+    parser.add_argument("--workers", type=int, default=1)            # 并行进程数
+    parser.add_argument("--streaming", action="store_true")         # 对已排序的分片做 k 路归并
+    args = parser.parse_args()
 
-# 合并所有数据
-final_dataset = process_all_data(base_path)
+    # 合并所有数据
+    final_dataset = process_all_data(args.base_path, args.workers, args.streaming)
 
-# 保存最终结果
-if not final_dataset.empty:
-    final_dataset.to_csv('merged_all_stock_data.csv', index=False)
-    print("所有数据合并完成，已保存为 'merged_all_stock_test_data.csv'")
-else:
-    print("最终数据集为空，未生成文件。")
+    # 保存最终结果
+    if not final_dataset.empty:
+        final_dataset.to_csv('merged_all_stock_data.csv', index=False)
+        print("所有数据合并完成，已保存为 'merged_all_stock_test_data.csv'")
+    else:
+        print("最终数据集为空，未生成文件。")
@@ -1,15 +1,32 @@
 import os
 import pandas as pd
+from utils.storage import write_table
+from utils.parallel import run_units, report_errors
+from utils.market_data import list_market_data_files
+from utils.kway_merge import merge_shards_to_file
+from utils.timeparse import to_datetime
+from utils.manifest import Manifest
 
-def merge_market_data_in_periods(root_path):
+def merge_market_data_in_periods(root_path, fmt="csv", workers=1, streaming=False, chunksize=100_000,
+                                 incremental=False):
     """
     遍历所有 Period 文件夹，对其中的 A, B, C, D, E 子文件夹执行数据合并操作。
+    每个 (Period, Stock) 文件夹相互独立，workers > 1 时在进程池中并行合并。
     
     Args:
     - root_path (str): 包含 Period 文件夹的根路径，例如 "TrainingData"。
+    - fmt (str): 输出格式，"csv" 或 "parquet"。
+    - workers (int): 并行进程数，1 为串行。
+    - streaming (bool): 使用分块 k 路归并，内存只与 chunksize × 分片数有关。
+    - chunksize (int): 流式归并时每个分片每次读取的行数。
+    - incremental (bool): 根据 {root_path}/.manifest.json 跳过原始文件未变化且输出已存在的单元。
+
+    Returns:
+    - errors (list): 处理失败的单元及错误信息。
     """
     periods = [f"Period{p}" for p in range(1, 21)]  # 动态生成 Period1 到 Period15
     stocks = ['A', 'B', 'C', 'D', 'E']  # 股票文件夹名称
+    units = []
     
     for period in periods:
         period_path = os.path.join(root_path, period)
@@ -26,69 +43,121 @@ def merge_market_data_in_periods(root_path):
                 continue
 
             # 动态生成输出文件路径
-            output_file = os.path.join(stock_path, f"merged_data_{stock}.csv")
-            merge_market_data(stock_path, output_file)
+            output_file = os.path.join(stock_path, f"merged_data_{stock}.{fmt}")
+            units.append((stock_path, output_file, streaming, chunksize))
+
+    manifest = Manifest(os.path.join(root_path, ".manifest.json")) if incremental else None
+    if manifest is not None:
+        units = [unit for unit in units if not _merge_is_fresh(manifest, unit, fmt)]
+        print(f"需要重新合并的单元: {len(units)}")
+
+    _, errors = run_units(merge_market_data, units, workers)
+    report_errors(errors)
+
+    if manifest is not None:
+        failed = {error["unit"] for error in errors}
+        for unit in units:
+            key, inputs, params = _merge_manifest_entry(unit, fmt)
+            if unit in failed:
+                manifest.discard(key)
+            else:
+                manifest.record(key, inputs, params)
+        manifest.save()
+    return errors
+
+
+def _merge_manifest_entry(unit, fmt):
+    stock_path, _, streaming, _ = unit
+    period_path, stock = os.path.split(stock_path)
+    key = f"{os.path.basename(period_path)}/{stock}/merge"
+    return key, list_market_data_files(stock_path, stock), {"fmt": fmt, "streaming": streaming}
+
+
+def _merge_is_fresh(manifest, unit, fmt):
+    # 合并结果之后会被 downsampling 原地覆盖，因此只检查输出是否存在，不比较其指纹
+    key, inputs, params = _merge_manifest_entry(unit, fmt)
+    return os.path.exists(unit[1]) and manifest.is_fresh(key, inputs, params)
 
 
-def merge_market_data(folder_path, output_file):
+def merge_market_data(folder_path, output_file, streaming=False, chunksize=100_000):
     """
     合并指定文件夹中符合命名规则的 market_data 文件，并按时间戳排序。
     
     Args:
     - folder_path (str): 包含 market_data 文件的文件夹路径。
-    - output_file (str): 合并后输出的文件名。
+    - output_file (str): 合并后输出的文件名（.csv 或 .parquet）。
+    - streaming (bool): 各分片已按时间排序时，分块 k 路归并并增量写出，不把全部数据读入内存。
+    - chunksize (int): 流式归并时每个分片每次读取的行数。
     """
     # 从路径中动态提取股票名称 (例如 "B")
     stock_name = os.path.basename(folder_path)  # 提取最后一级文件夹名
     if not stock_name:
         print("无法从路径中提取股票名称，请检查文件夹路径是否正确。")
         return
-    
-    # 动态匹配命名规则的文件，例如 market_data_B_0.csv
-    file_pattern = f"market_data_{stock_name}_"
-    all_data = []
-
-    # 遍历文件夹中的所有文件
-    for file in os.listdir(folder_path):
-        # 只处理符合动态命名规则的文件
-        if file.startswith(file_pattern) and file.endswith(".csv"):
-            file_path = os.path.join(folder_path, file)
-            
-            # 加载文件并设置列名
-            try:
-                data = pd.read_csv(file_path, header=None, names=["bidVolume", "bidPrice", "askVolume", "askPrice", "timestamp"])
-                all_data.append(data)
-                print(f"成功加载文件: {file}")
-            except Exception as e:
-                print(f"加载文件失败: {file}, 错误: {e}")
-    
-    # 合并所有数据
-    if all_data:
-        combined_data = pd.concat(all_data, ignore_index=True)
-        
-        # 确保时间戳格式一致
-        try:
-            combined_data['timestamp'] = pd.to_datetime(
-                combined_data['timestamp'],
-                format="%H:%M:%S.%f",  # 明确指定格式为时分秒和微秒
-                errors='coerce'
-            )
-        except Exception as e:
-            print(f"时间戳解析失败，错误信息: {e}")
-        
-        # 删除任何时间戳无效的行
-        combined_data = combined_data.dropna(subset=['timestamp'])
 
-        # 按时间戳排序
-        combined_data = combined_data.sort_values(by='timestamp')
+    if streaming:
+        files = list_market_data_files(folder_path, stock_name)
+        if not files:
+            print(f"没有符合条件的文件可供合并: {folder_path}")
+            return
+        n_rows = merge_shards_to_file(files, output_file, chunksize)
+        print(f"已流式合并 {len(files)} 个文件（{n_rows} 行）并保存为: {output_file}")
+        return
 
+    combined_data = load_market_data(folder_path)
+    if combined_data is not None:
         # 保存合并后的数据
-        combined_data.to_csv(output_file, index=False)
+        write_table(combined_data, output_file)
         print(f"数据已合并并保存为: {output_file}")
     else:
         print(f"没有符合条件的文件可供合并: {folder_path}")
 
 
+def load_market_data(folder_path):
+    """
+    读取文件夹中的 market_data_{stock}_*.csv，解析时间戳、删除无效行并按时间戳排序。
+
+    Returns:
+    - DataFrame，没有符合条件的文件时返回 None。
+    """
+    stock_name = os.path.basename(folder_path)
+
+    all_data = []
+
+    # 按自然顺序遍历 market_data_{stock}_*.csv（_2 在 _10 之前），时间戳相同的行按分片顺序排列，与流式归并一致
+    for file_path in list_market_data_files(folder_path, stock_name):
+        # 加载文件并设置列名（失败时抛出异常，由调用方按单元收集）
+        data = pd.read_csv(file_path, header=None, names=["bidVolume", "bidPrice", "askVolume", "askPrice", "timestamp"])
+        all_data.append(data)
+        print(f"成功加载文件: {os.path.basename(file_path)}")
+    
+    if not all_data:
+        return None
+
+    # 合并所有数据
+    combined_data = pd.concat(all_data, ignore_index=True)
+    
+    # 确保时间戳格式一致（时分秒和微秒，无法解析的为 NaT）
+    combined_data['timestamp'] = to_datetime(combined_data['timestamp'])
+    
+    # 删除任何时间戳无效的行
+    combined_data = combined_data.dropna(subset=['timestamp'])
+
+    # 按时间戳稳定排序
+    return combined_data.sort_values(by='timestamp', kind='stable')
+
+
 # 示例调用
-root_path = "TestData"  # 替换为你的根文件夹路径
-merge_market_data_in_periods(root_path)
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="合并每个 Period/Stock 文件夹中的 market_data 文件")
+    parser.add_argument("root_path", nargs="?", default="TestData")  # 替换为你的根文件夹路径
+    parser.add_argument("--fmt", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=1)             # 并行进程数
+    parser.add_argument("--streaming", action="store_true")          # 分块 k 路归并，适合超出内存的数据
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--incremental", action="store_true")        # 只合并原始文件有变化的单元
+    args = parser.parse_args()
+    merge_market_data_in_periods(args.root_path, args.fmt, args.workers, args.streaming, args.chunksize,
+                                 args.incremental)
@@ -1,13 +1,40 @@
 import os
 import pandas as pd
+from utils.storage import read_table, write_table, is_csv, PARTITION_COLS
 
-def process_and_merge_csv_files(base_folder, output_file):
+# 计算特征所需的原始列
+REQUIRED_COLUMNS = ['bidPrice', 'askPrice', 'bidVolume', 'askVolume']
+
+
+def add_features(df, period=None, stock=None):
+    """
+    原地计算 MidpointPrice、OrderFlowImbalance、WeightedSpread，并附加 period 和 stock 列。
+    """
+    # 计算 Midpoint Price
+    df['MidpointPrice'] = (df['bidPrice'] + df['askPrice']) / 2
+
+    # 计算 Order Flow Imbalance (OFI)
+    df['OrderFlowImbalance'] = df['bidVolume'] - df['askVolume']
+
+    # 计算 Weighted Spread
+    df['WeightedSpread'] = ((df['askPrice'] - df['bidPrice']) / df['MidpointPrice']) * 100
+
+    # 添加 period 和 stock 信息（可选，根据你的需求）
+    if period is not None:
+        df['period'] = period  # 添加 period 信息
+    if stock is not None:
+        df['stock'] = stock    # 添加 stock 信息
+    return df
+
+
+def process_and_merge_csv_files(base_folder, output_file, fmt="csv"):
     """
     遍历 Period1-Period15 文件夹内的所有 merged_data 文件，计算特征并合并为一个文件。
     
     Args:
         base_folder (str): 根文件夹路径，包含 Period1 到 Period15 文件夹。
-        output_file (str): 最终合并的输出文件路径。
+        output_file (str): 最终合并的输出文件路径；不是 .csv 时写成按 period/stock 分区的 Parquet 数据集。
+        fmt (str): 输入 merged_data 文件的格式，"csv" 或 "parquet"。
     """
     all_data = []  # 用于存储所有文件的数据
 
@@ -29,33 +56,21 @@ def process_and_merge_csv_files(base_folder, output_file):
                 continue
 
             # 确定子文件夹下的对应文件名
-            file_name = f"merged_data_{sub_folder}.csv"
+            file_name = f"merged_data_{sub_folder}.{fmt}"
             file_path = os.path.join(sub_folder_path, file_name)
 
             # 检查文件是否存在
             if os.path.exists(file_path):
                 try:
                     # 读取文件
-                    df = pd.read_csv(file_path)
+                    df = read_table(file_path)
 
                     # 检查必要的列是否存在
-                    if 'bidPrice' not in df.columns or 'askPrice' not in df.columns or \
-                       'bidVolume' not in df.columns or 'askVolume' not in df.columns:
+                    if any(col not in df.columns for col in REQUIRED_COLUMNS):
                         print(f"文件 {file_path} 缺少必要的列，跳过")
                         continue
 
-                    # 计算 Midpoint Price
-                    df['MidpointPrice'] = (df['bidPrice'] + df['askPrice']) / 2
-
-                    # 计算 Order Flow Imbalance (OFI)
-                    df['OrderFlowImbalance'] = df['bidVolume'] - df['askVolume']
-
-                    # 计算 Weighted Spread
-                    df['WeightedSpread'] = ((df['askPrice'] - df['bidPrice']) / df['MidpointPrice']) * 100
-
-                    # 添加 period 和 stock 信息（可选，根据你的需求）
-                    df['period'] = period_folder  # 添加 period 信息
-                    df['stock'] = sub_folder      # 添加 stock 信息
+                    add_features(df, period_folder, sub_folder)
 
                     # 收集数据
                     all_data.append(df)
@@ -72,12 +87,13 @@ def process_and_merge_csv_files(base_folder, output_file):
         merged_data = pd.concat(all_data, ignore_index=True)
 
         # 保存到输出文件
-        merged_data.to_csv(output_file, index=False)
+        write_table(merged_data, output_file, partition_cols=None if is_csv(output_file) else PARTITION_COLS)
         print(f"所有文件已合并并保存到: {output_file}")
     else:
         print("未找到任何有效数据，未生成输出文件")
 
 # 使用示例
-base_folder = "TestData"  # 替换为你的根目录路径
-output_file = "featured_test_data.csv"          # 替换为输出文件路径
-process_and_merge_csv_files(base_folder, output_file)
+if __name__ == "__main__":
+    base_folder = "TestData"  # 替换为你的根目录路径
+    output_file = "featured_test_data.csv"          # 替换为输出文件路径
+    process_and_merge_csv_files(base_folder, output_file)
@@ -0,0 +1,141 @@
+import heapq
+import numpy as np
+import pandas as pd
+
+from utils.market_data import MARKET_DATA_COLUMNS, has_header
+from utils.storage import is_csv, normalize_types
+from utils.timeparse import to_datetime, parse_datetime_ns, NAT_NS
+
+
+def read_shard_chunks(file_path, chunksize=100_000):
+    """
+    分块读取一个 market_data 分片，解析 timestamp 并丢弃无效行。
+    分片本身应按时间排序；块内乱序时会就地排序，跨块乱序只能给出警告。
+    """
+    header = 0 if has_header(file_path) else None
+    last_ts = None
+    for chunk in pd.read_csv(file_path, header=header, names=MARKET_DATA_COLUMNS, chunksize=chunksize):
+        chunk["timestamp"] = to_datetime(chunk["timestamp"])
+        chunk = chunk.dropna(subset=["timestamp"])
+        if chunk.empty:
+            continue
+        if not chunk["timestamp"].is_monotonic_increasing:
+            chunk = chunk.sort_values("timestamp", kind="stable")
+        if last_ts is not None and chunk["timestamp"].iloc[0] < last_ts:
+            print(f"警告: {file_path} 不是按时间排序的，合并结果可能不完全有序")
+        last_ts = chunk["timestamp"].iloc[-1]
+        yield chunk
+
+
+def iter_merged_chunks(file_paths, chunksize=100_000):
+    """
+    对多个各自按时间排序的分片做流式 k 路归并，按时间顺序逐块产出 DataFrame。
+
+    每个分片只缓存一个块，用堆维护各缓存块的最后一个时间戳：
+    堆顶分片的块尾时间戳 bound 之前（含）的行不可能再被后续数据超过，可以安全输出。
+    内存上限约为 chunksize × 分片数，总复杂度 O(N log k)。
+    时间戳相同的行按分片顺序输出。
+    """
+    iterators = [read_shard_chunks(p, chunksize) for p in file_paths]
+    buffers = [None] * len(iterators)
+    heap = []
+
+    def refill(idx):
+        chunk = next(iterators[idx], None)
+        buffers[idx] = chunk
+        if chunk is not None:
+            heapq.heappush(heap, (chunk["timestamp"].iloc[-1], idx))
+
+    for idx in range(len(iterators)):
+        refill(idx)
+
+    while heap:
+        bound, idx = heapq.heappop(heap)
+        if buffers[idx] is None or buffers[idx].empty:
+            # 该分片的缓存已在之前的输出中清空（时间戳相同的情况），直接补充
+            refill(idx)
+            continue
+
+        pieces = []
+        for j, buf in enumerate(buffers):
+            if buf is None or buf.empty:
+                continue
+            n_ready = buf["timestamp"].searchsorted(bound, side="right")
+            if n_ready:
+                pieces.append(buf.iloc[:n_ready])
+                buffers[j] = buf.iloc[n_ready:]
+        refill(idx)
+
+        if len(pieces) == 1:
+            yield pieces[0]
+        else:
+            # 各段本身有序，稳定排序（timsort）只需归并这些有序段
+            block = pd.concat(pieces, ignore_index=True)
+            yield block.sort_values("timestamp", kind="stable")
+
+
+# 由粗到细的时间精度，以及判断某个精度是否需要的步长（纳秒）：有值不是该步长的整数倍时需要更细一级
+_UNITS = ["D", "s", "ms", "us", "ns"]
+_UNIT_STEPS = [86_400_000_000_000, 1_000_000_000, 1_000_000, 1_000]
+
+
+def timestamp_unit(file_paths, chunksize=100_000):
+    """
+    所有分片中时间戳的最细精度（"D"、"s"、"ms"、"us" 或 "ns"）。
+
+    pandas 的 to_csv 按整列决定 datetime 的写法（全是整秒时不写小数，否则按毫秒 / 微秒 / 纳秒补齐位数），
+    流式写出时每块单独格式化会不一致，所以先只读 timestamp 列扫描一遍，整个文件统一使用这个精度。
+    """
+    finest = 0
+    for file_path in file_paths:
+        header = 0 if has_header(file_path) else None
+        for chunk in pd.read_csv(file_path, header=header, names=MARKET_DATA_COLUMNS, usecols=["timestamp"],
+                                 chunksize=chunksize):
+            ns = parse_datetime_ns(chunk["timestamp"].to_numpy())
+            ns = ns[ns != NAT_NS]
+            for level in range(len(_UNIT_STEPS), finest, -1):
+                if (ns % _UNIT_STEPS[level - 1] != 0).any():
+                    finest = level
+                    break
+    return _UNITS[finest]
+
+
+def format_timestamps(values, unit):
+    """按 pandas to_csv 的写法把 datetime64 格式化为字符串，例如 unit="ms" 时为 1900-01-01 09:30:00.000。"""
+    return np.char.replace(np.datetime_as_string(np.asarray(values, dtype="datetime64[ns]"), unit=unit), "T", " ")
+
+
+def merge_shards_to_file(file_paths, output_file, chunksize=100_000):
+    """
+    流式归并多个分片并增量写出到 output_file（.csv 或 .parquet），不在内存中保留全量数据。
+
+    Returns:
+        写出的总行数
+    """
+    n_rows = 0
+    if is_csv(output_file):
+        # 与一次性读入后 to_csv 的输出逐字节相同：整个文件使用同一个时间精度
+        unit = timestamp_unit(file_paths, chunksize)
+        first = True
+        for block in iter_merged_chunks(file_paths, chunksize):
+            block = block.assign(timestamp=format_timestamps(block["timestamp"], unit))
+            block.to_csv(output_file, mode="w" if first else "a", header=first, index=False)
+            first = False
+            n_rows += len(block)
+        return n_rows
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for block in iter_merged_chunks(file_paths, chunksize):
+            table = pa.Table.from_pandas(normalize_types(block), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_file, table.schema)
+            writer.write_table(table)
+            n_rows += len(block)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+
+def fingerprint(path, method="mtime"):
+    """
+    文件指纹。method="mtime" 用 (大小, 修改时间) 判断，开销几乎为零；
+    method="hash" 读取全部内容计算 sha1，适合 mtime 不可靠的场景（例如从别处拷贝过来的文件）。
+    """
+    if method == "hash":
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Manifest:
+    """
+    记录每个 (period, stock, stage) 单元的输入文件指纹、阶段参数和输出文件，
+    重跑时只处理输入或参数发生变化的单元。
+
+    条目保存在 JSON 文件中，文件路径相对于 manifest 所在目录，整个目录可以整体移动。
+    """
+
+    def __init__(self, path, method="mtime"):
+        self.path = path
+        self.method = method
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            # 指纹方式变化后旧条目不可比较，全部作废
+            if data.get("method") == method:
+                self.entries = data.get("entries", {})
+
+    def _rel(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def _fingerprints(self, paths):
+        return {self._rel(p): fingerprint(p, self.method) for p in paths}
+
+    def is_fresh(self, key, inputs, params=None):
+        """
+        单元是否可以跳过：输入文件集合与指纹、参数都和上次记录一致，且上次记录的输出文件仍然存在且未被改动。
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry.get("params") != (params or {}):
+            return False
+        try:
+            if entry["inputs"] != self._fingerprints(inputs):
+                return False
+            for rel_path, fp in entry["outputs"].items():
+                if fingerprint(os.path.join(self.root, rel_path), self.method) != fp:
+                    return False
+        except FileNotFoundError:
+            return False
+        return True
+
+    def record(self, key, inputs, params=None, outputs=()):
+        """在单元处理完成后记录其输入、参数和输出（指纹在调用时计算）。"""
+        self.entries[key] = {
+            "inputs": self._fingerprints(inputs),
+            "params": params or {},
+            "outputs": self._fingerprints(outputs),
+        }
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def save(self):
+        """先写临时文件再替换，中途中断不会留下损坏的 manifest。"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"method": self.method, "entries": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def concat_csv_files(paths, output_file, header=None):
+    """
+    按字节拼接多个表头相同的 CSV（只保留第一个文件的表头），不做解析，开销与文件大小成正比。
+    paths 为空时只写 header（列名列表）。
+    """
+    with open(output_file, "wb") as fout:
+        wrote_header = False
+        for path in paths:
+            with open(path, "rb") as fin:
+                first_line = fin.readline()
+                if not wrote_header:
+                    fout.write(first_line)
+                    wrote_header = True
+                while True:
+                    block = fin.read(1 << 20)
+                    if not block:
+                        break
+                    fout.write(block)
+        if not wrote_header and header is not None:
+            fout.write((",".join(header) + "\n").encode("utf-8"))
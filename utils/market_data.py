@@ -0,0 +1,59 @@
+import os
+import re
+import pandas as pd
+from natsort import natsorted
+
+# 原始 market_data_{stock}_{n}.csv 的列顺序
+MARKET_DATA_COLUMNS = ["bidVolume", "bidPrice", "askVolume", "askPrice", "timestamp"]
+
+# 数据根目录下的 Period 文件夹，例如 Period1、Period16
+PERIOD_PATTERN = re.compile(r"^Period(?P<period>\d+)$")
+
+
+def has_header(file_path):
+    """
+    判断 CSV 第一行是否是表头（原始数据有的带表头，有的不带）。
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        first_line = f.readline()
+    return "timestamp" in first_line or "bidVolume" in first_line
+
+
+def read_market_data(file_path, **kwargs):
+    """
+    读取一个原始 market_data 文件，无论是否带表头都统一成 MARKET_DATA_COLUMNS 列名。
+    """
+    header = 0 if has_header(file_path) else None
+    return pd.read_csv(file_path, header=header, names=MARKET_DATA_COLUMNS, **kwargs)
+
+
+def list_market_data_files(stock_folder, stock):
+    """
+    按自然顺序列出文件夹中的 market_data_{stock}_*.csv（_2 排在 _10 之前）。
+    """
+    if not os.path.isdir(stock_folder):
+        return []
+    prefix = f"market_data_{stock}_"
+    return [
+        os.path.join(stock_folder, f)
+        for f in natsorted(os.listdir(stock_folder))
+        if f.startswith(prefix) and f.endswith(".csv")
+    ]
+
+
+def list_periods(root_path):
+    """数据根目录下所有 Period{n} 文件夹的编号（按数字排序），不写死 Period 的个数。"""
+    if not os.path.isdir(root_path):
+        return []
+    return sorted(int(m.group("period")) for m in map(PERIOD_PATTERN.match, os.listdir(root_path))
+                  if m and os.path.isdir(os.path.join(root_path, m.group(0))))
+
+
+def list_stocks(period_folder):
+    """Period 文件夹下含有 market_data_{stock}_*.csv 的股票文件夹（按自然顺序）。"""
+    if not os.path.isdir(period_folder):
+        return []
+    return [
+        stock for stock in natsorted(os.listdir(period_folder))
+        if list_market_data_files(os.path.join(period_folder, stock), stock)
+    ]
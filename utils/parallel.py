@@ -0,0 +1,59 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _call(func, args):
+    """
+    在（子）进程中执行一个单元，把异常转换成可序列化的错误信息返回。
+    """
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, {"error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+
+
+def run_units(func, units, workers=1):
+    """
+    执行一组相互独立的单元（例如每个 Period × Stock 文件夹）。
+
+    Args:
+        func: 顶层函数（需要能被子进程 pickle），以 func(*unit) 方式调用。
+        units (list[tuple]): 每个单元的参数。
+        workers (int): 进程数；<= 1 时在当前进程内顺序执行。
+
+    Returns:
+        results: 与 units 一一对应的返回值（失败的单元为 None），顺序与串行执行相同
+        errors:  失败单元的列表 [{"unit": unit, "error": ..., "traceback": ...}]
+    """
+    units = list(units)
+    if workers is None:
+        workers = default_workers()
+
+    if workers <= 1 or len(units) <= 1:
+        outcomes = [_call(func, unit) for unit in units]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(units))) as executor:
+            futures = [executor.submit(_call, func, unit) for unit in units]
+            outcomes = [future.result() for future in futures]
+
+    results, errors = [], []
+    for unit, (result, error) in zip(units, outcomes):
+        results.append(result)
+        if error is not None:
+            error["unit"] = unit
+            errors.append(error)
+    return results, errors
+
+
+def report_errors(errors):
+    """打印失败单元的汇总。"""
+    if not errors:
+        return
+    print(f"共有 {len(errors)} 个单元处理失败:")
+    for error in errors:
+        print(f"  {error['unit']}: {error['error']}")
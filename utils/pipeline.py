@@ -0,0 +1,202 @@
+import os
+import pandas as pd
+
+from utils.csv_merge import load_market_data
+from utils.downsampling import downsample_frame
+from utils.feature_engineering import add_features, REQUIRED_COLUMNS
+from utils.kway_merge import iter_merged_chunks
+from utils.manifest import Manifest, concat_csv_files
+from utils.market_data import list_market_data_files
+from utils.parallel import run_units, report_errors
+from utils.storage import read_table, write_table, is_csv
+
+PERIODS = [f"Period{p}" for p in range(1, 21)]
+STOCKS = ['A', 'B', 'C', 'D', 'E']
+
+# featured_test_data.csv / {stock}_stock.csv 的列顺序
+FEATURED_COLUMNS = [
+    'timestamp', 'bidVolume', 'bidPrice', 'askVolume', 'askPrice',
+    'MidpointPrice', 'OrderFlowImbalance', 'WeightedSpread', 'period', 'stock',
+]
+
+
+def process_unit(stock_path, period, stock, freq='1s', streaming=False, chunksize=100_000):
+    """
+    在内存中对一个 (Period, Stock) 单元依次执行 合并 → 降采样 → 特征计算。
+    与 csv_merge → downsampling → feature_engineering 的结果一致，但不写中间文件。
+
+    Returns:
+        带特征的降采样 DataFrame；没有数据时返回 None
+    """
+    if streaming:
+        files = list_market_data_files(stock_path, stock)
+        data = pd.concat(iter_merged_chunks(files, chunksize), ignore_index=True) if files else None
+    else:
+        data = load_market_data(stock_path)
+    if data is None or data.empty:
+        return None
+
+    # 带表头的分片会让这些列被读成字符串，四步流程中写出再读回时才变成数值
+    for col in REQUIRED_COLUMNS:
+        data[col] = pd.to_numeric(data[col])
+
+    data = downsample_frame(data, freq)
+    return add_features(data, period, stock)
+
+
+def write_unit(stock_path, period, stock, freq, streaming, chunksize, unit_file):
+    """
+    处理一个单元并把结果写到缓存文件 unit_file（在子进程中写，不必把数据传回主进程）。
+    没有数据时删除旧的缓存文件。
+
+    Returns:
+        写出的行数
+    """
+    df = process_unit(stock_path, period, stock, freq, streaming, chunksize)
+    if df is None:
+        if os.path.exists(unit_file):
+            os.remove(unit_file)
+        return 0
+    os.makedirs(os.path.dirname(unit_file), exist_ok=True)
+    write_table(df, unit_file)
+    return len(df)
+
+
+def combine_unit_files(unit_files, output_file):
+    """
+    把按顺序排列的单元缓存文件合并成一个输出文件。CSV → CSV 时直接按字节拼接，不重新解析。
+    """
+    if is_csv(output_file) and all(is_csv(f) for f in unit_files):
+        concat_csv_files(unit_files, output_file, header=FEATURED_COLUMNS)
+        return
+    frames = [read_table(f) for f in unit_files]
+    write_table(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FEATURED_COLUMNS), output_file)
+
+
+def run_incremental(units, cache_dir, output_dir, fmt, workers, featured_file, stocks, method='mtime'):
+    """
+    增量运行：manifest 记录每个 (period, stock) 单元的原始文件指纹和参数，
+    只重新处理发生变化的单元，其结果缓存为 {cache_dir}/units/{period}/{stock}.{fmt}，
+    最终输出由各单元的缓存文件按 Period 顺序拼接而成。
+    """
+    manifest = Manifest(os.path.join(cache_dir, "manifest.json"), method)
+    todo, plan = [], []
+    for stock_path, period, stock, freq, streaming, chunksize in units:
+        key = f"{period}/{stock}/pipeline"
+        unit_file = os.path.join(cache_dir, "units", period, f"{stock}.{fmt}")
+        inputs = list_market_data_files(stock_path, stock)
+        params = {"freq": freq, "streaming": streaming}
+        plan.append((stock, unit_file))
+        if not manifest.is_fresh(key, inputs, params):
+            todo.append(((stock_path, period, stock, freq, streaming, chunksize, unit_file), key, inputs, params))
+
+    print(f"{len(units) - len(todo)} 个单元未变化，{len(todo)} 个单元需要重新处理")
+    _, errors = run_units(write_unit, [t[0] for t in todo], workers)
+    report_errors(errors)
+    failed = {error["unit"] for error in errors}
+    for unit, key, inputs, params in todo:
+        unit_file = unit[-1]
+        if unit in failed:
+            manifest.discard(key)
+        else:
+            manifest.record(key, inputs, params, outputs=[unit_file] if os.path.exists(unit_file) else [])
+    manifest.save()
+
+    os.makedirs(output_dir, exist_ok=True)
+    for stock in stocks:
+        files = [f for s, f in plan if s == stock and os.path.exists(f)]
+        output_file = os.path.join(output_dir, f"{stock}_stock.{fmt}")
+        combine_unit_files(files, output_file)
+        print(f"{stock}: 由 {len(files)} 个单元拼接并保存到 {output_file}")
+
+    if featured_file:
+        files = [f for _, f in plan if os.path.exists(f)]
+        if files:
+            combine_unit_files(files, featured_file)
+            print(f"featured 数据已保存到: {featured_file}")
+
+    return errors
+
+
+def run_pipeline(base_folder, output_dir='.', freq='1s', fmt='csv', workers=1,
+                 streaming=False, chunksize=100_000, featured_file=None, stocks=STOCKS,
+                 cache_dir=None, method='mtime'):
+    """
+    一次读取原始 market_data，直接写出每只股票的 {stock}_stock.csv（或 .parquet），
+    替代 csv_merge → downsampling → feature_engineering → seperate_data_by_stock 四个脚本。
+
+    Args:
+        base_folder (str): 包含 Period 文件夹的根路径，例如 "TestData"。
+        output_dir (str): 每只股票输出文件所在的目录。
+        freq (str): 降采样频率，默认与 downsampling 相同的 '1s'。
+        fmt (str): 输出格式，"csv" 或 "parquet"。
+        workers (int): 并行处理 Period × Stock 单元的进程数。
+        streaming (bool): 合并时对已排序的分片做 k 路归并。
+        featured_file (str): 同时写出合并后的 featured 文件（可选）。
+        cache_dir (str): 指定后增量运行，只处理输入或参数变化的单元，见 run_incremental。
+        method (str): 判断输入是否变化的方式，"mtime" 或 "hash"。
+
+    Returns:
+        errors (list): 处理失败的单元及错误信息。
+    """
+    units = []
+    for period in PERIODS:
+        period_path = os.path.join(base_folder, period)
+        if not os.path.exists(period_path):
+            continue
+        for stock in stocks:
+            stock_path = os.path.join(period_path, stock)
+            if not os.path.exists(stock_path):
+                print(f"路径不存在: {stock_path}，跳过...")
+                continue
+            units.append((stock_path, period, stock, freq, streaming, chunksize))
+
+    if cache_dir:
+        return run_incremental(units, cache_dir, output_dir, fmt, workers, featured_file, stocks, method)
+
+    # 降采样后的数据量很小，按 Period 顺序收集后每只股票只写一次
+    results, errors = run_units(process_unit, units, workers)
+    report_errors(errors)
+
+    per_stock = {stock: [] for stock in stocks}
+    for unit, df in zip(units, results):
+        if df is not None:
+            per_stock[unit[2]].append(df)
+
+    os.makedirs(output_dir, exist_ok=True)
+    for stock in stocks:
+        frames = per_stock[stock]
+        stock_data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FEATURED_COLUMNS)
+        output_file = os.path.join(output_dir, f"{stock}_stock.{fmt}")
+        write_table(stock_data, output_file)
+        print(f"{stock}: {len(stock_data)} 行已保存到 {output_file}")
+
+    if featured_file:
+        frames = [df for df in results if df is not None]
+        if frames:
+            write_table(pd.concat(frames, ignore_index=True), featured_file)
+            print(f"featured 数据已保存到: {featured_file}")
+
+    return errors
+
+
+if __name__ == "__main__":
+    # 用法: python -m utils.pipeline TestData --out-dir . --freq 1s --workers 4
+    #       python -m utils.pipeline TestData --cache-dir .pipeline_cache   # 增量运行
+    import argparse
+
+    parser = argparse.ArgumentParser(description="合并 → 降采样 → 特征 → 按股票拆分，一次完成")
+    parser.add_argument("base_folder", nargs="?", default="TestData")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--freq", default="1s")
+    parser.add_argument("--fmt", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--featured", default=None)                 # 例如 featured_test_data.csv
+    parser.add_argument("--cache-dir", default=None)                # 单元缓存和 manifest 所在目录
+    parser.add_argument("--method", choices=["mtime", "hash"], default="mtime")
+    args = parser.parse_args()
+
+    run_pipeline(args.base_folder, args.out_dir, args.freq, args.fmt, args.workers,
+                 args.streaming, args.chunksize, args.featured, cache_dir=args.cache_dir, method=args.method)
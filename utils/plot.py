@@ -1,12 +1,13 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from utils.timeparse import to_datetime
 
 # Load the CSV file
 # Replace 'your_file.csv' with the path to your CSV file
 data = pd.read_csv('csv.mergeall.py')
 
 # Convert the timestamp to a numeric or datetime format if necessary
-data['timestamp'] = pd.to_datetime(data['timestamp'])
+data['timestamp'] = to_datetime(data['timestamp'])
 
 # Plot the data
 plt.figure(figsize=(12, 6))
@@ -0,0 +1,166 @@
+import os
+import pandas as pd
+
+from utils.csv_merge import load_market_data
+from utils.kway_merge import iter_merged_chunks
+from utils.market_data import list_market_data_files, list_periods, list_stocks
+from utils.parallel import run_units, report_errors
+from utils.storage import read_table, write_table
+from utils.timeparse import to_datetime
+
+# 由细到粗的层级，每一层都由上一层聚合得到
+LEVELS = ["1s", "10s", "1min", "5min"]
+
+# 每层的列：MidpointPrice 的 OHLC、价格均值、成交量均值与总和、tick 数
+PYRAMID_COLUMNS = [
+    "timestamp", "open", "high", "low", "close",
+    "bidPrice", "askPrice", "bidVolume", "askVolume",
+    "bidVolume_sum", "askVolume_sum", "count",
+]
+
+# 均值按 tick 数加权后才能逐层聚合
+_MEAN_COLUMNS = ["bidPrice", "askPrice", "bidVolume", "askVolume"]
+
+
+def aggregate_ticks(ticks, freq):
+    """
+    把原始 tick（bidVolume, bidPrice, askVolume, askPrice, timestamp）聚合到 freq。
+    没有 tick 的时间桶不输出（不做前向填充）。
+    """
+    ticks = ticks.set_index("timestamp")
+    mid = (ticks["bidPrice"] + ticks["askPrice"]) / 2
+    grouped = mid.resample(freq)
+    level = pd.DataFrame({
+        "open": grouped.first(),
+        "high": grouped.max(),
+        "low": grouped.min(),
+        "close": grouped.last(),
+    })
+    sums = ticks[_MEAN_COLUMNS].resample(freq).sum()
+    level["count"] = ticks["bidPrice"].resample(freq).count()
+    for col in _MEAN_COLUMNS:
+        level[col] = sums[col] / level["count"]
+    level["bidVolume_sum"] = sums["bidVolume"]
+    level["askVolume_sum"] = sums["askVolume"]
+    level = level[level["count"] > 0]
+    return level.reset_index()[PYRAMID_COLUMNS]
+
+
+def aggregate_level(level, freq):
+    """
+    把某一层的聚合结果继续聚合到更粗的 freq（也用于合并同一时间桶的分块结果）。
+    """
+    level = level.set_index("timestamp")
+    weighted = level[_MEAN_COLUMNS].mul(level["count"], axis=0).resample(freq).sum()
+    coarse = pd.DataFrame({
+        "open": level["open"].resample(freq).first(),
+        "high": level["high"].resample(freq).max(),
+        "low": level["low"].resample(freq).min(),
+        "close": level["close"].resample(freq).last(),
+    })
+    coarse["count"] = level["count"].resample(freq).sum()
+    for col in _MEAN_COLUMNS:
+        coarse[col] = weighted[col] / coarse["count"]
+    coarse["bidVolume_sum"] = level["bidVolume_sum"].resample(freq).sum()
+    coarse["askVolume_sum"] = level["askVolume_sum"].resample(freq).sum()
+    coarse = coarse[coarse["count"] > 0]
+    return coarse.reset_index()[PYRAMID_COLUMNS]
+
+
+def pyramid_path(stock_path, freq, fmt="csv"):
+    """每层保存在原始数据旁边: {stock_path}/pyramid/{freq}.{fmt}"""
+    return os.path.join(stock_path, "pyramid", f"{freq}.{fmt}")
+
+
+def build_pyramid(stock_path, levels=LEVELS, fmt="csv", streaming=False, chunksize=100_000):
+    """
+    读取一次原始 market_data，依次生成各层聚合并保存，原始文件保持不变。
+
+    streaming=True 时按块 k 路归并读取：每块先聚合到最细一层，
+    跨块的时间桶再合并一次，内存只与最细一层的大小有关。
+
+    Returns:
+        {freq: 行数}
+    """
+    stock = os.path.basename(os.path.normpath(stock_path))
+    if streaming:
+        files = list_market_data_files(stock_path, stock)
+        partial = [aggregate_ticks(chunk, levels[0]) for chunk in iter_merged_chunks(files, chunksize)]
+        level = aggregate_level(pd.concat(partial, ignore_index=True), levels[0]) if partial else None
+    else:
+        ticks = load_market_data(stock_path)
+        if ticks is not None:
+            # 带表头的分片会让数值列被读成字符串（表头行本身已因时间戳无效被删掉），与 pipeline 中的处理相同
+            for col in ["bidVolume", "bidPrice", "askVolume", "askPrice"]:
+                ticks[col] = pd.to_numeric(ticks[col])
+        level = aggregate_ticks(ticks, levels[0]) if ticks is not None and not ticks.empty else None
+    if level is None:
+        print(f"没有符合条件的文件可供聚合: {stock_path}")
+        return {}
+
+    os.makedirs(os.path.join(stock_path, "pyramid"), exist_ok=True)
+    sizes = {}
+    for i, freq in enumerate(levels):
+        if i > 0:
+            level = aggregate_level(level, freq)
+        write_table(level, pyramid_path(stock_path, freq, fmt))
+        sizes[freq] = len(level)
+    print(f"{stock_path}: " + ", ".join(f"{freq}={n}" for freq, n in sizes.items()))
+    return sizes
+
+
+def build_all_pyramids(root_path, levels=LEVELS, fmt="csv", workers=1, streaming=False):
+    """
+    为 {root_path}/Period*/{stock} 下的每个单元生成金字塔，单元之间可以并行。
+    Period 和股票都从目录中发现。
+    """
+    units = []
+    for period in list_periods(root_path):
+        period_path = os.path.join(root_path, f"Period{period}")
+        for stock in list_stocks(period_path):
+            units.append((os.path.join(period_path, stock), levels, fmt, streaming))
+    _, errors = run_units(build_pyramid, units, workers)
+    report_errors(errors)
+    return errors
+
+
+def choose_level(span, max_points, levels=LEVELS):
+    """
+    给绘图用：在时间跨度 span 内点数不超过 max_points 的最细一层；都超过时返回最粗一层。
+    """
+    span = pd.Timedelta(span)
+    for freq in levels:
+        if span / pd.Timedelta(freq) <= max_points:
+            return freq
+    return levels[-1]
+
+
+def level_for_resolution(resolution, levels=LEVELS):
+    """
+    给训练用：能够精确重采样到 resolution 的最粗一层（层级的周期能整除 resolution）；
+    没有合适的层级时返回 None，需要使用原始 tick。
+    """
+    resolution = pd.Timedelta(resolution)
+    candidates = [freq for freq in levels if resolution % pd.Timedelta(freq) == pd.Timedelta(0)]
+    return candidates[-1] if candidates else None
+
+
+def read_level(stock_path, freq, fmt="csv"):
+    """读取某一层，timestamp 转换为 datetime64。"""
+    df = read_table(pyramid_path(stock_path, freq, fmt))
+    df["timestamp"] = to_datetime(df["timestamp"])
+    return df
+
+
+if __name__ == "__main__":
+    # 用法: python -m utils.pyramid TrainingData --levels 1s 10s 1min 5min --workers 4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="为每个 Period/Stock 生成多分辨率聚合金字塔（不覆盖原始数据）")
+    parser.add_argument("root_path", nargs="?", default="TestData")
+    parser.add_argument("--levels", nargs="+", default=LEVELS)
+    parser.add_argument("--fmt", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--streaming", action="store_true")
+    args = parser.parse_args()
+    build_all_pyramids(args.root_path, args.levels, args.fmt, args.workers, args.streaming)
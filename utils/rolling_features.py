@@ -0,0 +1,210 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# 默认窗口：OFI / 波动率 / 价差 z-score 按 tick 数，EWMA 按 span，tick 频率按秒
+DEFAULT_CONFIG = {
+    "ofi_window": 100,
+    "vol_window": 100,
+    "ewma_span": 50,
+    "zscore_window": 100,
+    "rate_seconds": 1.0,
+}
+
+
+def feature_names(config=None):
+    """滚动特征的列名（顺序与 RollingFeatures.update 的返回值一致）。"""
+    c = {**DEFAULT_CONFIG, **(config or {})}
+    return [
+        f"OFISum_{c['ofi_window']}",
+        f"RealizedVol_{c['vol_window']}",
+        f"EWMAMid_{c['ewma_span']}",
+        f"SpreadZ_{c['zscore_window']}",
+        f"TickRate_{c['rate_seconds']:g}s",
+    ]
+
+
+# ---- 批量版本：整段数组向量化计算 ----
+#
+# 窗口和都用"累积和之差"计算，增量版本按同样的顺序累加并保存最近 window + 1 个累积和，
+# 所以两边的浮点运算完全相同，结果逐位一致。窗口内不足 window 个 tick 时为 NaN。
+
+def _rolling_sum(x, window):
+    c = np.cumsum(np.concatenate([[0.0], np.asarray(x, dtype=np.float64)]))
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = c[window:] - c[:len(c) - window]
+    return out
+
+
+def rolling_ofi_sum(bid_volume, ask_volume, window):
+    """最近 window 个 tick 的 OrderFlowImbalance（bidVolume - askVolume）之和。"""
+    ofi = np.asarray(bid_volume, dtype=np.float64) - np.asarray(ask_volume, dtype=np.float64)
+    return _rolling_sum(ofi, window)
+
+
+def realized_volatility(mid, window):
+    """最近 window 个 tick 的已实现波动率 sqrt(Σ r²)，r 为中间价的对数收益率（第一个 tick 记为 0）。"""
+    log_mid = np.log(np.asarray(mid, dtype=np.float64))
+    r = np.concatenate([[0.0], log_mid[1:] - log_mid[:-1]])
+    return np.sqrt(_rolling_sum(r * r, window))
+
+
+def ewma(x, span):
+    """指数加权移动平均，alpha = 2 / (span + 1)，从第一个值开始递推（与 pandas adjust=False 相同）。"""
+    alpha = 2.0 / (span + 1.0)
+    return pd.Series(np.asarray(x, dtype=np.float64)).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def spread_zscore(bid_price, ask_price, window):
+    """当前价差相对最近 window 个 tick 价差均值的 z-score（总体标准差，标准差为 0 时记为 0）。"""
+    spread = np.asarray(ask_price, dtype=np.float64) - np.asarray(bid_price, dtype=np.float64)
+    mean = _rolling_sum(spread, window) / window
+    var = np.maximum(_rolling_sum(spread * spread, window) / window - mean * mean, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(var > 0, (spread - mean) / np.sqrt(var), 0.0)
+    z[np.isnan(mean)] = np.nan
+    return z
+
+
+def tick_rate(timestamps, seconds):
+    """最近 seconds 秒内（(t - seconds, t]）的 tick 数除以 seconds，单位为 tick/秒。"""
+    ts = _as_ns(timestamps)
+    window_ns = int(round(seconds * 1e9))
+    count = np.arange(1, len(ts) + 1) - np.searchsorted(ts, ts - window_ns, side="right")
+    return count / seconds
+
+
+def _as_ns(timestamps):
+    values = np.asarray(timestamps)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]").view(np.int64)
+    return values.astype(np.int64)
+
+
+def compute_rolling_features(df, config=None):
+    """
+    对一段按时间排序、同一只股票的 tick（bidVolume, bidPrice, askVolume, askPrice, timestamp）
+    计算所有滚动特征，返回与 df 行对齐的 DataFrame。
+    """
+    c = {**DEFAULT_CONFIG, **(config or {})}
+    mid = (df["bidPrice"].to_numpy(dtype=np.float64) + df["askPrice"].to_numpy(dtype=np.float64)) / 2
+    columns = [
+        rolling_ofi_sum(df["bidVolume"], df["askVolume"], c["ofi_window"]),
+        realized_volatility(mid, c["vol_window"]),
+        ewma(mid, c["ewma_span"]),
+        spread_zscore(df["bidPrice"], df["askPrice"], c["zscore_window"]),
+        tick_rate(df["timestamp"], c["rate_seconds"]),
+    ]
+    return pd.DataFrame(dict(zip(feature_names(c), columns)), index=df.index)
+
+
+def add_rolling_features(df, config=None, by=("period", "stock")):
+    """
+    原地给 df 添加滚动特征列。by 中存在的列作为分组键（每个 period × stock 单独计算，窗口不跨组），
+    组内保持原有行序。
+    """
+    keys = [col for col in by if col in df.columns]
+    if not keys:
+        features = compute_rolling_features(df, config)
+    else:
+        parts = [compute_rolling_features(df.iloc[positions], config)
+                 for positions in df.groupby(keys, sort=False).indices.values()]
+        features = pd.concat(parts).loc[df.index] if parts else compute_rolling_features(df, config)
+    for col in features.columns:
+        df[col] = features[col].to_numpy()
+    return df
+
+
+# ---- 增量版本：实时推理时每个 tick O(1) 更新 ----
+
+class _RollingSum:
+    """保存最近 window + 1 个累积和的环形缓冲，窗口和 = 当前累积和 - window 个 tick 之前的累积和。"""
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._cum = np.zeros(self.window + 1)
+        self._total = 0.0
+        self._n = 0
+
+    def push(self, x):
+        self._total += x
+        self._n += 1
+        self._cum[self._n % (self.window + 1)] = self._total
+        if self._n < self.window:
+            return np.nan
+        return self._total - self._cum[(self._n - self.window) % (self.window + 1)]
+
+
+class RollingFeatures:
+    """
+    单只股票的滚动特征增量计算器，与 compute_rolling_features 逐位一致。
+
+    每个 tick 调用一次 update，返回按 feature_names(config) 顺序排列的特征数组（复用同一块内存）。
+    """
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.names = feature_names(self.config)
+        self._ofi = _RollingSum(self.config["ofi_window"])
+        self._r2 = _RollingSum(self.config["vol_window"])
+        self._spread = _RollingSum(self.config["zscore_window"])
+        self._spread2 = _RollingSum(self.config["zscore_window"])
+        self._alpha = 2.0 / (self.config["ewma_span"] + 1.0)
+        self._rate_ns = int(round(self.config["rate_seconds"] * 1e9))
+        self._out = np.empty(len(self.names))
+        self.reset()
+
+    def reset(self):
+        for acc in (self._ofi, self._r2, self._spread, self._spread2):
+            acc.reset()
+        self._prev_log_mid = None
+        self._ewma = None
+        self._times = deque()
+
+    def update(self, bid_volume, bid_price, ask_volume, ask_price, timestamp):
+        """
+        timestamp 为 datetime64 / pd.Timestamp 或 int64 纳秒。
+        """
+        out = self._out
+        mid = (bid_price + ask_price) / 2
+
+        out[0] = self._ofi.push(float(bid_volume) - float(ask_volume))
+
+        log_mid = np.log(mid)
+        r = 0.0 if self._prev_log_mid is None else log_mid - self._prev_log_mid
+        self._prev_log_mid = log_mid
+        out[1] = np.sqrt(self._r2.push(r * r))
+
+        if self._ewma is None:
+            self._ewma = mid
+        else:
+            # 分母在数学上等于 1，但要保留：pandas adjust=False 正是这样计算的，去掉后与批量版本不再逐位相同
+            self._ewma = ((1.0 - self._alpha) * self._ewma + self._alpha * mid) / ((1.0 - self._alpha) + self._alpha)
+        out[2] = self._ewma
+
+        window = self._spread.window
+        spread = ask_price - bid_price
+        mean = self._spread.push(spread) / window
+        var = max(self._spread2.push(spread * spread) / window - mean * mean, 0.0)
+        if np.isnan(mean):
+            out[3] = np.nan
+        else:
+            out[3] = (spread - mean) / np.sqrt(var) if var > 0 else 0.0
+
+        t = _timestamp_ns(timestamp)
+        self._times.append(t)
+        while self._times[0] <= t - self._rate_ns:
+            self._times.popleft()
+        out[4] = len(self._times) / self.config["rate_seconds"]
+        return out
+
+
+def _timestamp_ns(timestamp):
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return pd.Timestamp(timestamp).value
@@ -1,40 +1,202 @@
-import csv
-
-def split_csv_by_stock(input_file):
-    # 打开输入 CSV 文件
-    with open(input_file, 'r', newline='', encoding='utf-8') as fin:
-        reader = csv.DictReader(fin)
-        
-        # 建立一个字典，用于存储不同 stock 对应的输出文件句柄和写入器
-        stock_symbols = ['A', 'B', 'C', 'D', 'E']
-        file_handles = {}
-        csv_writers = {}
-        
+import os
+import numpy as np
+import pandas as pd
+
+# 每次读取的字节数
+BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def _iter_blocks(fin, block_size):
+    """按块读取二进制文件，每块都在换行符处截断，剩下的半行拼到下一块。"""
+    rest = b""
+    while True:
+        data = fin.read(block_size)
+        if not data:
+            if rest:
+                yield rest if rest.endswith(b"\n") else rest + b"\n"
+            return
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            rest = data
+            continue
+        rest = data[cut:]
+        yield data[:cut]
+
+
+def _partition_block(block, key_index, n_fields):
+    """
+    在字节层面按 key 列对一个块的行分组，不解析其它字段。
+
+    用 numpy 找出所有换行符和逗号的位置，逗号数正好是 n_fields - 1 的行就能直接定位 key 字段；
+    已按分区列排序的数据按连续区间切片，交错的数据按分区值稳定排序后用一次 gather 取出字节。
+    有引号或逗号数不一致的块返回 None，由调用方走 pandas 解析。
+
+    Returns:
+        {分区值(bytes): (该分区所有行的字节, 行数)}，或 None
+    """
+    if b'"' in block:
+        return None
+    buf = np.frombuffer(block, dtype=np.uint8)
+    line_ends = np.flatnonzero(buf == ord("\n"))
+    line_starts = np.r_[0, line_ends[:-1] + 1]
+    lengths = line_ends + 1 - line_starts
+    nonempty = lengths > 1
+    line_starts, line_ends, lengths = line_starts[nonempty], line_ends[nonempty], lengths[nonempty]
+    n_lines = len(line_starts)
+    if n_lines == 0:
+        return {}
+
+    commas = np.flatnonzero(buf == ord(","))
+    if len(commas) != n_lines * (n_fields - 1):
+        return None
+    commas = commas.reshape(n_lines, n_fields - 1)
+    # 每行的逗号都应该落在本行之内
+    if n_fields > 1 and ((commas[:, 0] < line_starts).any() or (commas[:, -1] > line_ends).any()):
+        return None
+
+    key_start = line_starts if key_index == 0 else commas[:, key_index - 1] + 1
+    key_end = commas[:, key_index] if key_index < n_fields - 1 else line_ends
+    # 行尾的 \r 不属于 key
+    if key_index == n_fields - 1:
+        key_end = key_end - (buf[np.maximum(key_end - 1, 0)] == ord("\r"))
+    key_len = key_end - key_start
+
+    # key 转成定长字节矩阵（宽度补齐到 8 的倍数），按整行视为一个标量分组
+    width = -(-max(int(key_len.max()), 1) // 8) * 8
+    offsets = np.arange(width)
+    idx = np.minimum(key_start[:, None] + offsets, len(buf) - 1)
+    keys = np.where(offsets < key_len[:, None], buf[idx], 0).astype(np.uint8)
+    keys = keys.view(np.uint64 if width == 8 else np.dtype((np.void, width))).ravel()
+    uniq, group = np.unique(keys, return_inverse=True)
+    values = [key.tobytes().rstrip(b"\0") for key in uniq]
+
+    # 数据通常按分区列排好序：连续相同分区的行直接按区间切片，不必逐字节 gather
+    run_starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    if len(run_starts) * 64 <= n_lines:
+        run_ends = np.r_[run_starts[1:], n_lines]
+        pieces = {value: [] for value in values}
+        counts = dict.fromkeys(values, 0)
+        view = memoryview(block)
+        for lo, hi in zip(run_starts.tolist(), run_ends.tolist()):
+            value = values[group[lo]]
+            pieces[value].append(view[line_starts[lo]:line_ends[hi - 1] + 1])
+            counts[value] += hi - lo
+        return {value: (b"".join(pieces[value]), counts[value]) for value in values}
+
+    # 交错的数据：按分区稳定排序所有行，一次 gather 得到每个分区连续的字节
+    if len(uniq) <= 64:
+        order = np.concatenate([np.flatnonzero(group == g) for g in range(len(uniq))])
+    else:
+        order = np.argsort(group, kind="stable")
+    sorted_lengths = lengths[order]
+    ends = np.cumsum(sorted_lengths)
+    byte_index = np.repeat(line_starts[order] - (ends - sorted_lengths), sorted_lengths) + np.arange(ends[-1])
+    gathered = buf[byte_index]
+
+    counts = np.bincount(group, minlength=len(uniq))
+    bounds = np.r_[0, ends[np.cumsum(counts) - 1]]
+    result = {}
+    for g, value in enumerate(values):
+        result[value] = (gathered[bounds[g]:bounds[g + 1]].tobytes(), int(counts[g]))
+    return result
+
+
+def _partition_block_pandas(block, header, key):
+    """有引号等情况时的慢速路径：所有列按字符串读入，按 key 分组后写回 CSV 文本。"""
+    from io import BytesIO
+
+    chunk = pd.read_csv(BytesIO(header + block), dtype=str, keep_default_na=False)
+    result = {}
+    for value, positions in chunk.groupby(key, sort=False).indices.items():
+        data = chunk.iloc[positions].to_csv(index=False, header=False).encode("utf-8")
+        result[value.encode("utf-8")] = (data, len(positions))
+    return result
+
+
+def _output_path(output_dir, output_pattern, value, key):
+    """
+    分区值来自数据本身，拼进文件名之前先检查：空值、含路径分隔符或 ".." 的值会写到 output_dir 之外
+    或得到没有意义的文件名，直接报错。
+    """
+    text = value.decode("utf-8")
+    separators = [sep for sep in (os.sep, os.altsep, "/") if sep]
+    if not text.strip() or ".." in text or "\0" in text or any(sep in text for sep in separators):
+        raise ValueError(f"分区列 '{key}' 的值 {text!r} 不能用作文件名")
+    path = os.path.join(output_dir, output_pattern.format(value=text, key=key))
+    root = os.path.abspath(output_dir)
+    if os.path.commonpath([root, os.path.abspath(path)]) != root:
+        raise ValueError(f"分区列 '{key}' 的值 {text!r} 对应的路径 {path} 不在输出目录 {output_dir} 中")
+    return path
+
+
+def partition_csv(input_file, key="stock", output_dir=".", output_pattern="{value}_{key}.csv", block_size=BLOCK_SIZE):
+    """
+    按 key 列把一个大 CSV 拆分成多个分区文件。
+
+    每次读取 block_size 字节，只定位 key 字段，整行字节原样追加到对应的分区文件，
+    不做类型转换，输出内容（包括表头和行尾）与输入完全一致。
+    分区值从数据中动态发现，每个分区文件在第一次出现时写入表头；空值或含路径分隔符、".." 的分区值会抛出 ValueError。
+    字段中含引号的块改用 pandas 解析（字段内不能有换行）。
+
+    Args:
+        input_file (str): 输入 CSV 文件（带表头）。
+        key (str): 分区列，例如 "stock" 或 "period"。
+        output_dir (str): 输出目录。
+        output_pattern (str): 输出文件名模板，可以使用 {value} 和 {key}。
+        block_size (int): 每块读取的字节数。
+
+    Returns:
+        dict: {分区值: 行数}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    file_handles = {}
+    counts = {}
+    with open(input_file, "rb") as fin:
+        header = fin.readline()
+        columns = header.decode("utf-8").rstrip("\r\n").split(",")
+        columns = [c.strip('"') for c in columns]
+        if key not in columns:
+            raise ValueError(f"{input_file} 中没有分区列 '{key}'")
+        key_index = columns.index(key)
         try:
-            # 初始化输出文件（A_stock.csv, B_stock.csv, ...），并写入表头
-            for symbol in stock_symbols:
-                output_file_name = f"{symbol}_stock.csv"
-                fout = open(output_file_name, 'w', newline='', encoding='utf-8')
-                writer = csv.DictWriter(fout, fieldnames=reader.fieldnames)
-                
-                # 写入 CSV 表头
-                writer.writeheader()
-                
-                # 存储
-                file_handles[symbol] = fout
-                csv_writers[symbol] = writer
-            
-            # 逐行读取数据，并按照 stock 分类写入
-            for row in reader:
-                stock_symbol = row.get('stock', '')
-                if stock_symbol in csv_writers:
-                    csv_writers[stock_symbol].writerow(row)
+            for block in _iter_blocks(fin, block_size):
+                parts = _partition_block(block, key_index, len(columns))
+                if parts is None:
+                    parts = _partition_block_pandas(block, header, key)
+                for value, (data, n) in parts.items():
+                    fout = file_handles.get(value)
+                    if fout is None:
+                        fout = open(_output_path(output_dir, output_pattern, value, key), "wb")
+                        fout.write(header)
+                        file_handles[value] = fout
+                        counts[value] = 0
+                    fout.write(data)
+                    counts[value] += n
         finally:
-            # 确保脚本结束后关闭所有打开的输出文件
+            # 确保结束后关闭所有打开的输出文件
             for fout in file_handles.values():
                 fout.close()
+    return {value.decode("utf-8"): n for value, n in counts.items()}
+
+
+def split_csv_by_stock(input_file, output_dir="."):
+    """
+    按 stock 列拆分为 {stock}_stock.csv（A_stock.csv, B_stock.csv, ...），股票从数据中发现。
+    """
+    return partition_csv(input_file, key="stock", output_dir=output_dir)
+
 
 if __name__ == "__main__":
-    # 替换成你的实际 CSV 文件名
-    input_filename = 'featured_test_data.csv'
-    split_csv_by_stock(input_filename)
+    # 用法: python -m utils.seperate_data_by_stock featured_test_data.csv --key stock --out-dir .
+    import argparse
+
+    parser = argparse.ArgumentParser(description="按某一列把 CSV 拆分为多个分区文件")
+    parser.add_argument("input_file", nargs="?", default="featured_test_data.csv")
+    parser.add_argument("--key", default="stock")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--block-mb", type=int, default=BLOCK_SIZE // 1024 // 1024)
+    args = parser.parse_args()
+    counts = partition_csv(args.input_file, args.key, args.out_dir, block_size=args.block_mb * 1024 * 1024)
+    for value, n in counts.items():
+        print(f"{args.key}={value}: {n} 行")
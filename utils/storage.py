@@ -0,0 +1,214 @@
+import os
+import shutil
+import pandas as pd
+
+from utils.market_data import read_market_data, list_market_data_files
+from utils.timeparse import to_datetime
+
+# 默认的分区列：{root}/period=Period1/stock=A/part-0.parquet
+PARTITION_COLS = ["period", "stock"]
+
+# 列的存储类型；分区列在 Parquet 中以字典编码保存
+COLUMN_TYPES = {
+    "bidVolume": "float64",
+    "bidPrice": "float64",
+    "askVolume": "float64",
+    "askPrice": "float64",
+    "MidpointPrice": "float64",
+    "OrderFlowImbalance": "float64",
+    "WeightedSpread": "float64",
+    "shard": "int32",
+}
+
+
+def is_csv(path):
+    return str(path).lower().endswith(".csv")
+
+
+def _pyarrow():
+    try:
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("读写 Parquet 数据集需要安装 pyarrow: pip install pyarrow") from e
+    return ds, pq
+
+
+def _apply_filters(df, filters):
+    """
+    在 DataFrame 上应用与 pyarrow 相同格式的过滤条件: [(列, 操作符, 值), ...]，条件之间为 AND。
+    """
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        series = df[col]
+        if op in ("==", "="):
+            mask &= series == value
+        elif op == "!=":
+            mask &= series != value
+        elif op == "<":
+            mask &= series < value
+        elif op == "<=":
+            mask &= series <= value
+        elif op == ">":
+            mask &= series > value
+        elif op == ">=":
+            mask &= series >= value
+        elif op == "in":
+            mask &= series.isin(value)
+        elif op == "not in":
+            mask &= ~series.isin(value)
+        else:
+            raise ValueError(f"不支持的过滤操作符: {op}")
+    return df[mask].reset_index(drop=True)
+
+
+def read_table(path, columns=None, filters=None):
+    """
+    读取 CSV 文件或 Parquet 文件/分区数据集。
+
+    Args:
+        path (str): .csv 文件，或 .parquet 文件 / 按 period、stock 分区的数据集目录。
+        columns (list): 只读取这些列（不存在的列会被忽略）。
+        filters (list): [(列, 操作符, 值), ...]；对 Parquet 数据集会下推到分区裁剪和行组过滤。
+    """
+    if is_csv(path):
+        usecols = None
+        if columns is not None:
+            wanted = set(columns) | {f[0] for f in (filters or [])}
+            usecols = lambda c: c in wanted
+        df = pd.read_csv(path, usecols=usecols)
+        if filters:
+            df = _apply_filters(df, filters)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    ds, pq = _pyarrow()
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    expression = pq.filters_to_expression(filters) if filters else None
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+def normalize_types(df):
+    """
+    按 COLUMN_TYPES 统一列类型，timestamp 统一为 datetime64。
+    """
+    df = df.copy()
+    for col, dtype in COLUMN_TYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    if "timestamp" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        df["timestamp"] = to_datetime(df["timestamp"])
+    for col in PARTITION_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    return df
+
+
+def write_table(df, path, partition_cols=None):
+    """
+    写出 CSV 或 Parquet。
+
+    path 以 .csv 结尾时写 CSV；否则写 Parquet，给定 partition_cols 时写成分区数据集目录，
+    重写时只替换本次涉及到的分区。
+    """
+    if is_csv(path):
+        df.to_csv(path, index=False)
+        return
+
+    _pyarrow()
+    df = normalize_types(df)
+    if partition_cols:
+        df.to_parquet(path, engine="pyarrow", index=False, partition_cols=list(partition_cols),
+                      existing_data_behavior="delete_matching")
+    else:
+        df.to_parquet(path, engine="pyarrow", index=False)
+
+
+def csv_to_dataset(csv_path, root, partition_cols=PARTITION_COLS, chunksize=1_000_000):
+    """
+    把一个（可能很大的）CSV 分块导入为分区 Parquet 数据集。
+
+    先只读分区列找出 CSV 涉及的所有分区并删除这些分区的旧文件，再逐块追加写入；
+    分区无论第一次出现在哪个块，重复导入都不会留下上一次的数据。其它分区保持不变。
+    """
+    _pyarrow()
+    partition_cols = list(partition_cols)
+    touched = set()
+    for chunk in pd.read_csv(csv_path, usecols=partition_cols, dtype=str, chunksize=chunksize):
+        touched.update(chunk.drop_duplicates().itertuples(index=False, name=None))
+    for values in touched:
+        partition = os.path.join(root, *(f"{col}={value}" for col, value in zip(partition_cols, values)))
+        shutil.rmtree(partition, ignore_errors=True)
+
+    for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunksize)):
+        table_df = normalize_types(chunk)
+        table_df.to_parquet(root, engine="pyarrow", index=False, partition_cols=partition_cols,
+                            existing_data_behavior="overwrite_or_ignore", basename_template=f"part-{i}-{{i}}.parquet")
+
+
+def dataset_to_csv(root, csv_path, columns=None, filters=None):
+    """
+    把 Parquet 数据集（可带过滤条件）导出为 CSV。
+    """
+    read_table(root, columns=columns, filters=filters).to_csv(csv_path, index=False)
+
+
+def import_market_data(raw_root, dataset_root, periods=None, stocks=("A", "B", "C", "D", "E")):
+    """
+    把原始目录 {raw_root}/Period{p}/{stock}/market_data_{stock}_{n}.csv 导入为
+    按 period/stock 分区的 Parquet 数据集，额外保存 shard 列（文件编号 n）。
+    """
+    if periods is None:
+        periods = sorted(
+            int(name[len("Period"):]) for name in os.listdir(raw_root)
+            if name.startswith("Period") and name[len("Period"):].isdigit()
+        )
+    for period in periods:
+        for stock in stocks:
+            stock_folder = os.path.join(raw_root, f"Period{period}", stock)
+            frames = []
+            for file_path in list_market_data_files(stock_folder, stock):
+                df = read_market_data(file_path)
+                df["timestamp"] = to_datetime(df["timestamp"])
+                df = df.dropna(subset=["timestamp"])
+                df["shard"] = int(os.path.splitext(file_path)[0].rsplit("_", 1)[-1])
+                frames.append(df)
+            if not frames:
+                continue
+            unit = pd.concat(frames, ignore_index=True)
+            unit["period"] = f"Period{period}"
+            unit["stock"] = stock
+            write_table(unit, dataset_root, partition_cols=PARTITION_COLS)
+            print(f"已导入 Period{period}/{stock}: {len(unit)} 行")
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python -m utils.storage import-raw TrainingData TrainingData.parquet
+    #   python -m utils.storage from-csv featured_test_data.csv featured_test_data.parquet
+    #   python -m utils.storage to-csv featured_test_data.parquet A_stock.csv --stock A
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CSV 与分区 Parquet 数据集互相转换")
+    parser.add_argument("command", choices=["import-raw", "from-csv", "to-csv"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--stock", default=None)
+    parser.add_argument("--period", default=None)
+    args = parser.parse_args()
+
+    if args.command == "import-raw":
+        import_market_data(args.source, args.target)
+    elif args.command == "from-csv":
+        csv_to_dataset(args.source, args.target)
+    else:
+        filters = []
+        if args.stock:
+            filters.append(("stock", "==", args.stock))
+        if args.period:
+            filters.append(("period", "==", args.period))
+        dataset_to_csv(args.source, args.target, filters=filters or None)
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pandas as pd
+
+STOCKS = ["A", "B", "C", "D", "E"]
+
+
+def format_timestamps(micros):
+    """
+    把距午夜的微秒数格式化为 HH:MM:SS.ffffff 字符串（向量化）。
+    """
+    micros = np.asarray(micros, dtype=np.int64)
+    hours = micros // 3_600_000_000
+    minutes = micros // 60_000_000 % 60
+    seconds = micros // 1_000_000 % 60
+    frac = micros % 1_000_000
+    return np.char.add(
+        np.char.add(
+            np.char.add(np.char.zfill(hours.astype(str), 2), ":"),
+            np.char.add(np.char.zfill(minutes.astype(str), 2), ":"),
+        ),
+        np.char.add(np.char.add(np.char.zfill(seconds.astype(str), 2), "."), np.char.zfill(frac.astype(str), 6)),
+    )
+
+
+def generate_market_data(root, periods=2, stocks=STOCKS, files_per_stock=3, rows_per_file=10000,
+                         start_time="09:30:00", seed=0):
+    """
+    生成确定性的合成行情数据，目录结构与 TrainingData / TestData 相同：
+        {root}/Period{p}/{stock}/market_data_{stock}_{n}.csv
+
+    每个文件无表头，5 列依次为 bidVolume,bidPrice,askVolume,askPrice,timestamp。
+    同一只股票的多个文件在时间上首尾相接，文件内部按时间排序。
+
+    Returns:
+        生成的文件路径列表
+    """
+    rng = np.random.default_rng(seed)
+    h, m, s = (int(x) for x in start_time.split(":"))
+    start_us = ((h * 60 + m) * 60 + s) * 1_000_000
+    # 平均每 100ms 一个 tick；数据量很大时缩小间隔，保证不会跨过午夜
+    max_step = max(2, min(200_000, int(2 * 12 * 3600 * 1_000_000 / (files_per_stock * rows_per_file))))
+    written = []
+
+    for p in range(1, periods + 1):
+        for k, stock in enumerate(stocks):
+            stock_path = os.path.join(root, f"Period{p}", stock)
+            os.makedirs(stock_path, exist_ok=True)
+            price = 50.0 + 25.0 * k
+            t = start_us
+            for n in range(files_per_stock):
+                t = t + np.cumsum(rng.integers(1, max_step, rows_per_file))
+                mid = price + np.cumsum(rng.normal(0, 0.01, rows_per_file))
+                spread = rng.integers(1, 6, rows_per_file) * 0.01
+                bid_price = np.round(mid - spread / 2, 2)
+                ask_price = np.round(bid_price + spread, 2)
+                bid_volume = rng.integers(1, 500, rows_per_file)
+                ask_volume = rng.integers(1, 500, rows_per_file)
+                timestamps = format_timestamps(t)
+
+                file_path = os.path.join(stock_path, f"market_data_{stock}_{n}.csv")
+                pd.DataFrame({
+                    "bidVolume": bid_volume, "bidPrice": bid_price,
+                    "askVolume": ask_volume, "askPrice": ask_price,
+                    "timestamp": timestamps,
+                }).to_csv(file_path, header=False, index=False, float_format="%.2f")
+                written.append(file_path)
+
+                price = mid[-1]
+                t = t[-1]
+    return written
+
+
+if __name__ == "__main__":
+    # 用法: python -m utils.synthetic_data SyntheticData --periods 2 --files 3 --rows 10000
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成合成 market_data 文件")
+    parser.add_argument("root")
+    parser.add_argument("--periods", type=int, default=2)
+    parser.add_argument("--stocks", nargs="+", default=STOCKS)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    files = generate_market_data(args.root, args.periods, args.stocks, args.files, args.rows, seed=args.seed)
+    print(f"已生成 {len(files)} 个文件到 {args.root}")
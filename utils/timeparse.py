@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+# 无效时间戳的取值，与 NaT 的底层 int64 相同，view 成 datetime64 后直接变成 NaT
+NAT_NS = np.iinfo(np.int64).min
+
+# 只有时分秒的时间戳按 pd.to_datetime 的习惯落在 1900-01-01
+EPOCH_1900_NS = np.datetime64("1900-01-01", "ns").astype(np.int64)
+
+# 最长支持的布局 "YYYY-MM-DD HH:MM:SS.ffffff"
+_WIDTH = 26
+_ZERO, _NINE, _COLON, _DOT, _DASH, _SPACE, _T = (ord(c) for c in "09:.- T")
+
+
+def _as_byte_matrix(values):
+    """
+    把字符串数组转换成 (_WIDTH, n) 的 uint8 矩阵（第 i 行是所有字符串的第 i 个字节，右侧以 0 字节填充），
+    以及每个字符串是否超长。
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind == "S":
+        width = arr.dtype.itemsize
+        codes = arr.view(np.uint8).reshape(len(arr), width)
+    else:
+        try:
+            arr = arr.astype("S")
+            width = arr.dtype.itemsize
+            codes = arr.view(np.uint8).reshape(len(arr), width)
+        except UnicodeEncodeError:
+            # 含非 ASCII 字符时按 UCS4 码位处理，非 ASCII 字符替换成一个不可能合法的字节
+            arr = arr.astype(str)
+            width = arr.dtype.itemsize // 4
+            codes = arr.view(np.uint32).reshape(len(arr), width)
+            codes = np.where(codes > 127, 1, codes).astype(np.uint8)
+
+    too_long = np.zeros(len(arr), dtype=bool)
+    if width > _WIDTH:
+        too_long = (codes[:, _WIDTH:] != 0).any(axis=1)
+    m = np.zeros((_WIDTH, len(arr)), dtype=np.uint8)
+    # 转置后同一字节位置连续存储，逐位置运算时是连续内存访问
+    m[:min(width, _WIDTH)] = codes[:, :_WIDTH].T
+    return m, too_long
+
+
+def _digits(m, cols):
+    """把若干位置上的数字字符拼成整数，同时返回这些位置是否全是数字。"""
+    value = np.zeros(m.shape[1], dtype=np.int64)
+    ok = np.ones(m.shape[1], dtype=bool)
+    for c in cols:
+        col = m[c]
+        ok &= (col >= _ZERO) & (col <= _NINE)
+        value = value * 10 + (col.astype(np.int64) - _ZERO)
+    return value, ok
+
+
+def _clock_ns(m, offset):
+    """
+    解析从第 offset 个字节开始的 HH:MM:SS[.f{1,6}]，之后必须全是 0 字节。
+
+    Returns:
+        (距午夜的纳秒数, 是否有效)
+    """
+    hours, ok_h = _digits(m, (offset, offset + 1))
+    minutes, ok_m = _digits(m, (offset + 3, offset + 4))
+    seconds, ok_s = _digits(m, (offset + 6, offset + 7))
+    valid = ok_h & ok_m & ok_s & (m[offset + 2] == _COLON) & (m[offset + 5] == _COLON)
+    valid &= (hours < 24) & (minutes < 60) & (seconds < 60)
+
+    # 小数部分 1~6 位，不足 6 位时右侧的 0 字节按 0 计，正好对应微秒
+    has_dot = m[offset + 8] == _DOT
+    frac = np.zeros(m.shape[1], dtype=np.int64)
+    frac_ok = m[offset + 9] != 0
+    padded = np.zeros(m.shape[1], dtype=bool)
+    for c in range(offset + 9, offset + 15):
+        col = m[c]
+        is_pad = col == 0
+        frac_ok &= ~padded | is_pad          # 填充之后不能再出现字符
+        frac_ok &= is_pad | ((col >= _ZERO) & (col <= _NINE))
+        padded |= is_pad
+        frac = frac * 10 + np.where(is_pad, 0, col.astype(np.int64) - _ZERO)
+    valid &= np.where(has_dot, frac_ok, m[offset + 8] == 0)
+    if offset + 15 < m.shape[0]:
+        valid &= (m[offset + 15:] == 0).all(axis=0)
+
+    ns = ((hours * 60 + minutes) * 60 + seconds) * 1_000_000_000 + frac * 1000
+    return ns, valid
+
+
+def _date_ns(m):
+    """解析前 10 个字节的 YYYY-MM-DD，返回 (1970 纪元以来的纳秒数, 是否有效)。"""
+    year, ok_y = _digits(m, (0, 1, 2, 3))
+    month, ok_mo = _digits(m, (5, 6))
+    day, ok_d = _digits(m, (8, 9))
+    valid = ok_y & ok_mo & ok_d & (m[4] == _DASH) & (m[7] == _DASH)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (year >= 1678) & (year <= 2261)
+    year, month, day = np.where(valid, year, 1970), np.where(valid, month, 1), np.where(valid, day, 1)
+    months = (year - 1970) * 12 + (month - 1)
+    days = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + (day - 1)
+    return days * 86_400_000_000_000, valid
+
+
+def _fallback(values, time_only):
+    """
+    快速路径解析不了的行交给 pandas（例如单位数小时、省略秒、时区等少见写法）。
+
+    先在前面补上 1900-01-01 再解析，只有时分秒的值因此落在 1900-01-01，而不是 pandas 默认的当天日期；
+    本身带日期的值补上日期后无法解析，再按原样解析。
+    """
+    values = pd.Series(values, dtype=object)
+    text = values.astype(str).str.strip()
+    ts = pd.to_datetime("1900-01-01 " + text, format="mixed", errors="coerce")
+    rest = ts.isna() & values.notna()
+    if rest.any():
+        ts[rest] = pd.to_datetime(text[rest], format="mixed", errors="coerce")
+    if time_only:
+        ts = ts - ts.dt.normalize()
+    return ts.to_numpy().view(np.int64)
+
+
+def _parse(values, time_only):
+    arr = np.asarray(values)
+    if arr.dtype.kind == "M":
+        ns = arr.astype("datetime64[ns]")
+        if time_only:
+            ns = ns - ns.astype("datetime64[D]")
+        return ns.view(np.int64).copy()
+    if len(arr) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    m, too_long = _as_byte_matrix(arr)
+
+    # 两种布局：HH:MM:SS.ffffff 与 YYYY-MM-DD HH:MM:SS.ffffff（分隔符也可以是 T）
+    dated = (m[4] == _DASH) & (m[7] == _DASH) & ((m[10] == _SPACE) | (m[10] == _T))
+    clock, valid = _clock_ns(m, 0)
+    if dated.any():
+        clock_d, valid_d = _clock_ns(m[:, dated], 11)
+        clock[dated], valid[dated] = clock_d, valid_d
+        if not time_only:
+            date_ns, valid_date = _date_ns(m[:, dated])
+            clock[dated] += date_ns
+            valid[dated] &= valid_date
+    if not time_only:
+        clock[~dated] += EPOCH_1900_NS
+    valid &= ~too_long
+
+    ns = np.where(valid, clock, NAT_NS)
+    if not valid.all():
+        # 只有少数非标准写法的行需要回退；"nan"、表头等本来就无效的行回退后仍是 NaT
+        bad = np.flatnonzero(~valid)
+        ns[bad] = _fallback(arr[bad], time_only)
+    return ns
+
+
+def parse_time_ns(values):
+    """
+    把 HH:MM:SS.ffffff 字符串（也接受带日期前缀的写法或 datetime64）向量化地解析为距午夜的纳秒数。
+    直接在字符串的原始字节上按固定位置取数，小数部分可以省略，无法解析的值为 NAT_NS。
+
+    Returns:
+        np.ndarray[int64]
+    """
+    return _parse(values, time_only=True)
+
+
+def parse_datetime_ns(values):
+    """
+    与 parse_time_ns 相同，但返回 1970 纪元以来的纳秒数；只有时分秒的值落在 1900-01-01。
+    """
+    return _parse(values, time_only=False)
+
+
+def to_datetime(values):
+    """
+    代替 pd.to_datetime(values, format='%H:%M:%S.%f', errors='coerce')，返回 datetime64[ns]。
+    输入是 Series 时保留原索引。
+
+    比原来的固定格式宽松：没有小数部分的 HH:MM:SS、带日期前缀的写法以及 pandas format="mixed" 能识别的值
+    也会被解析，原来这些值得到 NaT。没有日期部分的值一律落在 1900-01-01，结果与运行当天无关。
+    """
+    ns = parse_datetime_ns(values).view("datetime64[ns]")
+    index = values.index if isinstance(values, pd.Series) else None
+    return pd.Series(ns, index=index, name=getattr(values, "name", None))
+
+
+def time_ns_to_datetime(ns):
+    """把距午夜的纳秒数转换成 1900-01-01 当天的 datetime64[ns]（NAT_NS 保持为 NaT）。"""
+    ns = np.asarray(ns, dtype=np.int64)
+    return np.where(ns == NAT_NS, NAT_NS, ns + EPOCH_1900_NS).view("datetime64[ns]")
+
+
+def seconds_since_midnight(values):
+    """距午夜的秒数（float64），无法解析的值为 NaN。"""
+    ns = parse_time_ns(values)
+    return np.where(ns == NAT_NS, np.nan, ns / 1e9)
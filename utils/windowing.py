@@ -0,0 +1,99 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+def sliding_windows(data, seq_length, flatten=True):
+    """
+    基于 stride 的零拷贝滑动窗口。
+
+    第 j 个窗口是 data[j : j + seq_length]，共 N - seq_length + 1 个窗口。
+    返回的是 data 的只读视图，不复制任何数据。
+
+    Args:
+        data (np.ndarray): shape (N, n_features) 的二维数组。
+        seq_length (int): 窗口长度。
+        flatten (bool): True 时返回 (num_windows, seq_length * n_features)，
+            与原来 x_i = data[i-seq_length:i].flatten() 的布局完全一致；
+            False 时返回 (num_windows, seq_length, n_features)。
+    """
+    data = np.ascontiguousarray(data)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    n_rows, n_features = data.shape
+    num_windows = max(n_rows - seq_length + 1, 0)
+    row_stride, col_stride = data.strides
+
+    if flatten:
+        # C 连续数组中相邻的 seq_length 行在内存里本身就是连续的一段，
+        # 所以展平后的窗口可以直接用 (行步长, 元素步长) 表示
+        shape = (num_windows, seq_length * n_features)
+        strides = (row_stride, col_stride)
+    else:
+        shape = (num_windows, seq_length, n_features)
+        strides = (row_stride, row_stride, col_stride)
+    return as_strided(data, shape=shape, strides=strides, writeable=False)
+
+
+def supervised_windows(data_combined, seq_length, target_idx=6):
+    """
+    构造单步预测的 (X, y)，与 inference / XGBoost 训练中的 create_supervised_data 一致：
+      X[j] = data_combined[j : j + seq_length].flatten()
+      y[j] = data_combined[j + seq_length, target_idx]
+
+    X 是只读视图 (N - seq_length, seq_length * n_features)，y 是目标列的视图。
+    """
+    data_combined = np.ascontiguousarray(data_combined)
+    num_samples = max(len(data_combined) - seq_length, 0)
+    X = sliding_windows(data_combined, seq_length, flatten=True)[:num_samples]
+    y = data_combined[seq_length:, target_idx]
+    return X, y
+
+
+def sequence_windows(data, seq_length, pred_length=10, target_idx=6):
+    """
+    多步预测版本，与 LSTM notebook 中的 create_sequences 一致：
+      X[i] = data[i : i + seq_length]                                   (seq_length, n_features)
+      Y[i] = data[i + seq_length : i + seq_length + pred_length, target_idx]  (pred_length, 1)
+
+    X 和 Y 都是只读视图。
+    """
+    data = np.ascontiguousarray(data)
+    num_samples = max(len(data) - seq_length - pred_length + 1, 0)
+    X = sliding_windows(data, seq_length, flatten=False)[:num_samples]
+    target = np.ascontiguousarray(data[seq_length:, target_idx])
+    Y = sliding_windows(target, pred_length, flatten=False)[:num_samples]
+    return X, Y
+
+
+def fill_windows(data, seq_length, out=None, start=0, stop=None, chunk_size=4096):
+    """
+    把第 [start, stop) 个展平窗口写入预分配的缓冲区 out，按 chunk_size 分块复制，
+    适合需要可写、连续内存的下游（例如某些只接受 C 连续输入的库）。
+
+    Returns:
+        out: shape (stop - start, seq_length * n_features)
+    """
+    windows = sliding_windows(data, seq_length, flatten=True)
+    if stop is None:
+        stop = len(windows)
+    if out is None:
+        out = np.empty((stop - start, windows.shape[1]), dtype=windows.dtype)
+    if out.shape != (stop - start, windows.shape[1]):
+        raise ValueError(f"缓冲区形状不匹配: {out.shape}, 需要 {(stop - start, windows.shape[1])}")
+
+    for lo in range(start, stop, chunk_size):
+        hi = min(lo + chunk_size, stop)
+        out[lo - start:hi - start] = windows[lo:hi]
+    return out
+
+
+def iter_window_chunks(data_combined, seq_length, chunk_size=4096, target_idx=6):
+    """
+    按块迭代单步预测的 (X_chunk, y_chunk)，每块都是只读视图。
+
+    Yields:
+        (start, X_chunk, y_chunk)，start 是该块第一个样本的下标。
+    """
+    X, y = supervised_windows(data_combined, seq_length, target_idx)
+    for start in range(0, len(X), chunk_size):
+        yield start, X[start:start + chunk_size], y[start:start + chunk_size]